@@ -0,0 +1,199 @@
+"""
+Book catalog search
+
+MySQL backend: exact ISBN hits go through the unique isbn index, everything
+else through a FULLTEXT index on title/author/publisher/category (see
+migrations.py) with prefix matching and relevance ranking. InvertedIndex is a pure-Python
+equivalent; BookSearch falls back to one built from the books table while
+the FULLTEXT index is missing (its migration has not run). Both return
+results one page at a time as (rows, has_more), and raise on database
+errors so they can run on a worker thread.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from mysql.connector import errorcode, Error
+
+from validators import ISBN_RE
+
+SEARCH_PAGE_SIZE = 50
+FALLBACK_INDEX_TTL = 60    # seconds before the in-memory fallback index is rebuilt
+FULLTEXT_INDEX = "ft_books_search"
+FULLTEXT_COLUMNS = ("title", "author", "publisher", "category")
+
+# InnoDB ignores shorter tokens (innodb_ft_min_token_size)
+MIN_TOKEN_LENGTH = 3
+
+# Field weights for the in-memory ranking
+FIELD_WEIGHTS = {"title": 3, "author": 2, "publisher": 1, "category": 1}
+
+TOKEN_RE = re.compile(r"[0-9A-Za-z]+")
+
+
+def tokenize(text):
+    return [t.lower() for t in TOKEN_RE.findall(str(text or ""))]
+
+
+def normalize_isbn(keyword):
+    """Return the bare ISBN if `keyword` is one (dashes/spaces allowed), else None"""
+    isbn = re.sub(r"[\s-]", "", keyword).upper()
+    return isbn if ISBN_RE.fullmatch(isbn) else None
+
+
+class BookSearch:
+    """MySQL-backed search"""
+
+    def __init__(self, database, page_size=SEARCH_PAGE_SIZE):
+        self.db = database
+        self.page_size = page_size
+
+        # InvertedIndex used while the FULLTEXT index is missing
+        self.fallback = None
+        self.fallback_built = None
+        self._lock = threading.Lock()
+
+    def search(self, keyword, page=0):
+        keyword = keyword.strip()
+        if not keyword:
+            return [], False
+
+        isbn = normalize_isbn(keyword)
+        if isbn:
+            rows = self.db.fetch("SELECT * FROM books WHERE isbn=%s", (isbn,))
+            if rows or page:
+                return rows, False
+
+        # One extra row tells us whether another page exists
+        limit = self.page_size + 1
+        offset = page * self.page_size
+
+        terms = [t for t in tokenize(keyword) if len(t) >= MIN_TOKEN_LENGTH]
+        if terms:
+            boolean_query = " ".join(f"+{t}*" for t in terms)
+            match = f"MATCH({', '.join(FULLTEXT_COLUMNS)}) AGAINST (%s IN BOOLEAN MODE)"
+            try:
+                rows = self.db.fetch(f"""
+                    SELECT *, {match} AS score
+                    FROM books
+                    WHERE {match}
+                    ORDER BY score DESC, book_id DESC
+                    LIMIT %s OFFSET %s
+                """, (boolean_query, boolean_query, limit, offset))
+            except Error as e:
+                if e.errno != errorcode.ER_FT_MATCHING_KEY_NOT_FOUND:
+                    raise
+                return self.fallback_index().search(keyword, page)
+        else:
+            # Too short for the FULLTEXT index: prefix match on title only,
+            # a range read of idx_books_title already in ORDER BY order
+            rows = self.db.fetch("""
+                SELECT * FROM books
+                WHERE title LIKE %s
+                ORDER BY title
+                LIMIT %s OFFSET %s
+            """, (f"{keyword}%", limit, offset))
+
+        return rows[:self.page_size], len(rows) > self.page_size
+
+    def fallback_index(self):
+        """InvertedIndex over every book, reused for FALLBACK_INDEX_TTL seconds"""
+        with self._lock:
+            if self.fallback_built is None or time.monotonic() - self.fallback_built > FALLBACK_INDEX_TTL:
+                print(f"Search: no {FULLTEXT_INDEX} index, searching an in-memory index instead")
+                self.fallback = InvertedIndex.from_rows(self.db.fetch("SELECT * FROM books"), self.page_size)
+                self.fallback_built = time.monotonic()
+            return self.fallback
+
+
+class InvertedIndex:
+    """Pure-Python fallback with the same search() contract as BookSearch"""
+
+    def __init__(self, page_size=SEARCH_PAGE_SIZE):
+        self.page_size = page_size
+        self.books = {}                          # book_id -> row
+        self.by_isbn = {}                        # isbn -> book_id
+        self.postings = defaultdict(dict)        # token -> {book_id: weight}
+        self._tokens = []                        # sorted, for prefix lookups
+        self._dirty = False
+
+    @classmethod
+    def from_rows(cls, rows, page_size=SEARCH_PAGE_SIZE):
+        index = cls(page_size)
+        for row in rows:
+            index.add(row)
+        return index
+
+    def add(self, row):
+        book_id = row["book_id"]
+        if book_id in self.books:
+            self.remove(book_id)
+
+        self.books[book_id] = row
+        if row.get("isbn"):
+            self.by_isbn[str(row["isbn"]).upper()] = book_id
+
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(row.get(field)):
+                postings = self.postings[token]
+                postings[book_id] = postings.get(book_id, 0) + weight
+        self._dirty = True
+
+    def remove(self, book_id):
+        row = self.books.pop(book_id, None)
+        if row is None:
+            return
+
+        self.by_isbn.pop(str(row.get("isbn") or "").upper(), None)
+        for field in FIELD_WEIGHTS:
+            for token in tokenize(row.get(field)):
+                postings = self.postings.get(token)
+                if postings:
+                    postings.pop(book_id, None)
+                    if not postings:
+                        del self.postings[token]
+        self._dirty = True
+
+    def _prefix_matches(self, prefix):
+        if self._dirty:
+            self._tokens = sorted(self.postings)
+            self._dirty = False
+
+        start = bisect_left(self._tokens, prefix)
+        for token in self._tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            yield token
+
+    def search(self, keyword, page=0):
+        keyword = keyword.strip()
+        if not keyword:
+            return [], False
+
+        isbn = normalize_isbn(keyword)
+        if isbn and isbn in self.by_isbn:
+            return ([self.books[self.by_isbn[isbn]]], False) if page == 0 else ([], False)
+
+        scores = None
+        for term in tokenize(keyword):
+            term_scores = defaultdict(int)
+            for token in self._prefix_matches(term):
+                for book_id, weight in self.postings[token].items():
+                    term_scores[book_id] += weight
+
+            # Every term must match (same as "+term*" in boolean mode)
+            if scores is None:
+                scores = dict(term_scores)
+            else:
+                scores = {b: s + term_scores[b] for b, s in scores.items() if b in term_scores}
+
+            if not scores:
+                return [], False
+
+        ranked = sorted((scores or {}).items(), key=lambda item: (-item[1], -item[0]))
+        start = page * self.page_size
+        hits = ranked[start:start + self.page_size]
+        rows = [dict(self.books[book_id], score=score) for book_id, score in hits]
+        return rows, len(ranked) > start + self.page_size
@@ -6,6 +6,11 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from database import db
 from validators import validate_book_fields
+from book_search import BookSearch, normalize_isbn
+from live_search import LiveSearch
+from tree_sync import TreeSync
+from exporter import open_export
+from mysql.connector import Error
 from datetime import date
 
 
@@ -79,16 +84,29 @@ class BookmanagementWindow:
                   command=self.delete_book).pack(side=tk.LEFT, padx=5)
 
         tk.Button(actions, text="Refresh", width=15, bg="#3498db", fg="white",
-                  command=self.load_books).pack(side=tk.LEFT, padx=5)
+                  command=self.refresh_books).pack(side=tk.LEFT, padx=5)
+
+        tk.Button(actions, text="Export", width=15, bg="#8e44ad", fg="white",
+                  command=lambda: open_export(self.root, "books")).pack(side=tk.LEFT, padx=5)
 
         # SEARCH BAR
         search = tk.Frame(content, bg="#ecf0f1")
         search.pack(fill=tk.X, pady=10)
 
         tk.Label(search, text="Search:", bg="#ecf0f1").pack(side=tk.LEFT, padx=5)
-        self.search_entry = ttk.Entry(search, width=30)
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(search, width=30, textvariable=self.search_var)
         self.search_entry.pack(side=tk.LEFT, padx=5)
 
+        # Search as you type; the button just skips the debounce
+        self.live_search = LiveSearch(
+            self.root, self.search_var,
+            query=lambda term: self.searcher.search(term, 0),
+            on_results=self.show_search_results,
+            on_clear=self.load_books,
+            on_error=self.show_search_error
+        )
+
         tk.Button(search, text="Search", bg="#95a5a6", fg="white",
                   command=self.search_books).pack(side=tk.LEFT)
 
@@ -96,12 +114,23 @@ class BookmanagementWindow:
         table_frame = tk.Frame(content)
         table_frame.pack(fill=tk.BOTH, expand=True, pady=10)
 
+        self.paging = False
+        self.has_more_above = False
+        self.has_more_below = False
+        self.search_keyword = None
+        self.searcher = BookSearch(db)
+
+        self.vsb = ttk.Scrollbar(table_frame, orient=tk.VERTICAL)
+        self.vsb.pack(side=tk.RIGHT, fill=tk.Y)
+
         self.tree = ttk.Treeview(
             table_frame,
             columns=("isbn", "title", "author", "publisher", "year", "category",
                      "location", "qty", "status", "added", "created"),
-            show="headings"
+            show="headings",
+            yscrollcommand=self.on_tree_scroll
         )
+        self.vsb.config(command=self.tree.yview)
         self.tree.pack(fill=tk.BOTH, expand=True)
 
         headers = ["ISBN", "Title", "Author", "Publisher", "Year",
@@ -113,52 +142,216 @@ class BookmanagementWindow:
         self.status_label = tk.Label(content, text="Ready", bg="#ecf0f1")
         self.status_label.pack(fill=tk.X)
 
+        # Refresh only re-reads rows changed since the last load
+        self.sync = TreeSync(self.tree, "books", self.fetch_changed_books, self.book_values,
+                             matches=self.in_loaded_window, insert_at=0)
+
         self.load_books()
 
     # --------------------------------------------
     # DATABASE ACTIONS
     # --------------------------------------------
 
+    # Catalog is paged by book_id (keyset) and only a window of rows is kept
+    PAGE_SIZE = 200
+    MAX_LOADED_ROWS = 1000
+
+    def book_values(self, row):
+        return (
+            row["isbn"] or "", row["title"], row["author"], row["publisher"], row["publication_year"],
+            row["category"], row["location"], row["quantity"], row["status"],
+            row["date_added"], row["created_at"]
+        )
+
     def load_books(self):
         self.tree.delete(*self.tree.get_children())
-        rows = db.execute_query("SELECT * FROM books ORDER BY book_id DESC")
+        self.search_keyword = None
+        self.has_more_above = False
+        self.has_more_below = True
+        self.paging = False
 
-        if rows:
-            for row in rows:
-                self.tree.insert("", tk.END, iid=row["book_id"], values=(
-                    row["isbn"], row["title"], row["author"], row["publisher"], row["publication_year"],
-                    row["category"], row["location"], row["quantity"], row["status"],
-                    row["date_added"], row["created_at"]
-                ))
-
-            self.status_label.config(text=f"Loaded {len(rows)} book(s).")
+        self.sync.start()
+
+        total = db.execute_query_one("SELECT COUNT(*) AS total FROM books")
+        self.total_books = total["total"] if total else 0
+
+        self.fetch_page_below()
+
+        if self.tree.get_children():
+            self.update_page_status()
         else:
             self.status_label.config(text="⚠ No books found.")
 
+    def fetch_changed_books(self, since):
+        return db.fetch("SELECT * FROM books WHERE updated_at >= %s", (since,))
+
+    def in_loaded_window(self, row):
+        """Only patch rows inside the page window currently held by the tree"""
+        children = self.tree.get_children()
+        if not children:
+            return True
+        if self.has_more_above and row["book_id"] > int(children[0]):
+            return False
+        if self.has_more_below and row["book_id"] < int(children[-1]):
+            return False
+        return True
+
+    def refresh_books(self):
+        """Refresh button: patch only the rows changed since the last load"""
+        if self.search_keyword:
+            return self.load_books()
+
+        changes = self.sync.refresh()
+        if changes is None:
+            return self.load_books()
+
+        total = db.execute_query_one("SELECT COUNT(*) AS total FROM books")
+        self.total_books = total["total"] if total else 0
+
+        updated, added, removed = changes
+        self.status_label.config(
+            text=f"Refreshed: {updated} updated, {added} added, {removed} removed. "
+                 f"Showing {len(self.tree.get_children())} of {self.total_books} book(s)."
+        )
+
+    def update_page_status(self):
+        self.status_label.config(
+            text=f"Showing {len(self.tree.get_children())} of {self.total_books} book(s)."
+        )
+
+    def on_tree_scroll(self, first, last):
+        """Scrollbar callback: fetch another page when the view nears either end"""
+        self.vsb.set(first, last)
+
+        if self.paging:
+            return
+
+        if float(last) > 0.95 and self.has_more_below:
+            self.paging = True
+            self.root.after_idle(self.fetch_search_page if self.search_keyword else self.fetch_page_below)
+        elif float(first) < 0.05 and self.has_more_above:
+            self.paging = True
+            self.root.after_idle(self.fetch_page_above)
+
+    def fetch_page_below(self):
+        """Append the next (older) page and trim rows scrolled far above"""
+        children = self.tree.get_children()
+        anchor = self.tree.identify_row(1)
+
+        if children:
+            rows = db.execute_query(
+                "SELECT * FROM books WHERE book_id < %s ORDER BY book_id DESC LIMIT %s",
+                (int(children[-1]), self.PAGE_SIZE)
+            ) or []
+        else:
+            rows = db.execute_query(
+                "SELECT * FROM books ORDER BY book_id DESC LIMIT %s", (self.PAGE_SIZE,)
+            ) or []
+
+        for row in rows:
+            self.tree.insert("", tk.END, iid=row["book_id"], values=self.book_values(row))
+        self.has_more_below = len(rows) == self.PAGE_SIZE
+
+        children = self.tree.get_children()
+        excess = len(children) - self.MAX_LOADED_ROWS
+        if excess > 0:
+            self.tree.delete(*children[:excess])
+            self.has_more_above = True
+
+        self.keep_in_view(anchor)
+        self.paging = False
+        if rows:
+            self.update_page_status()
+
+    def fetch_page_above(self):
+        """Prepend the previous (newer) page and trim rows far below"""
+        children = self.tree.get_children()
+        if not children:
+            self.paging = False
+            return
+
+        anchor = self.tree.identify_row(1)
+
+        rows = db.execute_query(
+            "SELECT * FROM books WHERE book_id > %s ORDER BY book_id ASC LIMIT %s",
+            (int(children[0]), self.PAGE_SIZE)
+        ) or []
+
+        for row in rows:
+            self.tree.insert("", 0, iid=row["book_id"], values=self.book_values(row))
+        self.has_more_above = len(rows) == self.PAGE_SIZE
+
+        children = self.tree.get_children()
+        excess = len(children) - self.MAX_LOADED_ROWS
+        if excess > 0:
+            self.tree.delete(*children[-excess:])
+            self.has_more_below = True
+
+        self.keep_in_view(anchor)
+        self.paging = False
+        if rows:
+            self.update_page_status()
+
+    def keep_in_view(self, item):
+        """Scroll so `item` stays at the top after rows were added/removed around it"""
+        if item and self.tree.exists(item):
+            children = self.tree.get_children()
+            self.tree.yview_moveto(self.tree.index(item) / max(len(children), 1))
+
     def search_books(self):
-        keyword = self.search_entry.get().strip()
-        if not keyword:
+        """Search button: run the current term now instead of waiting for the debounce"""
+        if not self.search_var.get().strip():
             return messagebox.showwarning("Missing Input", "Please enter a search term.")
 
+        self.live_search.search_now()
+
+    def show_search_results(self, keyword, result):
+        """First page of a live search (called on the Tk thread)"""
+        rows, has_more = result
+
         self.tree.delete(*self.tree.get_children())
 
-        like = f"%{keyword}%"
-        query = """SELECT * FROM books WHERE title LIKE %s OR author LIKE %s OR isbn LIKE %s OR publisher LIKE %s OR category LIKE %s"""
+        # Results are ranked, so page by relevance instead of book_id
+        self.search_keyword = keyword
+        self.search_page = 1
+        self.has_more_above = False
+        self.has_more_below = has_more
+        self.paging = False
 
-        rows = db.execute_query(query, (like, like, like, like, like))
+        self.insert_search_rows(rows)
 
         if rows:
-            for row in rows:
-                self.tree.insert("", tk.END, values=(
-                    row["isbn"], row["title"], row["author"], row["publisher"], row["publication_year"],
-                    row["category"], row["location"], row["quantity"], row["status"],
-                    row["date_added"], row["created_at"]
-                ))
-
-            self.status_label.config(text=f"🔍 Found {len(rows)} result(s).")
+            self.update_search_status()
         else:
             self.status_label.config(text="❌ No results.")
 
+    def show_search_error(self, keyword, error):
+        self.status_label.config(text=f"⚠ Search failed: {error}")
+
+    def fetch_search_page(self):
+        """Next page of the current search, loaded on scroll"""
+        try:
+            rows, self.has_more_below = self.searcher.search(self.search_keyword, self.search_page)
+        except Error as e:
+            self.paging = False
+            return self.show_search_error(self.search_keyword, e)
+
+        self.search_page += 1
+        self.insert_search_rows(rows)
+
+        self.paging = False
+        if rows:
+            self.update_search_status()
+
+    def insert_search_rows(self, rows):
+        for row in rows:
+            if not self.tree.exists(row["book_id"]):
+                self.tree.insert("", tk.END, iid=row["book_id"], values=self.book_values(row))
+
+    def update_search_status(self):
+        more = "+" if self.has_more_below else ""
+        self.status_label.config(text=f"🔍 Found {len(self.tree.get_children())}{more} result(s).")
+
     # --------------------------------------------
     # ADD / EDIT / DELETE
     # --------------------------------------------
@@ -214,22 +407,38 @@ class BookmanagementWindow:
             if not qty.get().isdigit():
                 return messagebox.showwarning("Invalid Entry", "Quantity must be numeric.")
 
+            # Stored bare (no dashes/spaces) so barcode scans match; blank means no ISBN
+            isbn_value = None
+            if isbn.get().strip():
+                isbn_value = normalize_isbn(isbn.get())
+                if not isbn_value:
+                    return messagebox.showwarning("Invalid Entry", "ISBN must be a valid ISBN-10 or ISBN-13.")
+
+                taken = db.execute_query_one(
+                    "SELECT book_id, title FROM books WHERE isbn=%s AND book_id <> %s",
+                    (isbn_value, book_id or 0)
+                )
+                if taken:
+                    return messagebox.showwarning(
+                        "Duplicate ISBN", f"ISBN {isbn_value} already belongs to '{taken['title']}'."
+                    )
+
             if mode == "add":
                 today = str(date.today())
                 query = """INSERT INTO books (isbn,title,author,publisher,publication_year,category,
                            location,quantity,status,date_added,created_at)
                            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)"""
-                params = (isbn.get(), title.get(), author.get(), publisher.get(), year.get(),
+                params = (isbn_value, title.get(), author.get(), publisher.get(), year.get(),
                           category.get(), location.get(), qty.get(), status.get(), today, today)
             else:
                 query = """UPDATE books SET isbn=%s,title=%s,author=%s,publisher=%s,publication_year=%s,
                            category=%s,location=%s,quantity=%s,status=%s WHERE book_id=%s"""
-                params = (isbn.get(), title.get(), author.get(), publisher.get(), year.get(),
+                params = (isbn_value, title.get(), author.get(), publisher.get(), year.get(),
                           category.get(), location.get(), qty.get(), status.get(), book_id)
 
             db.execute_query(query, params)
             dialog.destroy()
-            self.load_books()
+            self.refresh_books()
             messagebox.showinfo("Success", "Record saved successfully.")
 
         tk.Button(button_frame, text="Save", width=10, bg="#27ae60", fg="white", command=save).grid(row=0, column=0, padx=10)
@@ -245,5 +454,5 @@ class BookmanagementWindow:
 
         if messagebox.askyesno("Confirm Delete", f"Delete book '{title}'?"):
             db.execute_query("DELETE FROM books WHERE book_id=%s", (selected[0],))
-            self.load_books()
+            self.refresh_books()
             messagebox.showinfo("Deleted", "Book removed successfully.")
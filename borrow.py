@@ -1,7 +1,14 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from datetime import datetime, timedelta
 from database import db
+from mysql.connector import Error
+from overdue import overdue_sweep
+from ledger import get_balance
+from checkout import BatchCheckoutDialog, CheckoutError, CheckoutStation, checkout_book
+from live_search import LiveSearch
+from tree_sync import TreeSync
+from table_loader import TableLoader
+from exporter import open_export
 
 # Email utils (safe import: will not break even if empty)
 try:
@@ -40,6 +47,12 @@ class BorrowManagementWindow:
         tk.Button(control_frame, text="Add Borrow Record", bg="#27ae60", fg="white",
                   command=self.borrow_dialog, width=18).pack(side="left", padx=5)
 
+        tk.Button(control_frame, text="Batch Checkout", bg="#27ae60", fg="white",
+                  command=self.open_batch_checkout, width=14).pack(side="left", padx=5)
+
+        tk.Button(control_frame, text="Scan Checkout", bg="#16a085", fg="white",
+                  command=self.open_checkout_station, width=14).pack(side="left", padx=5)
+
         tk.Label(control_frame, text="Search:", font=("Arial", 10)).pack(side="left", padx=10)
         self.search_var = tk.StringVar()
         tk.Entry(control_frame, textvariable=self.search_var, width=35).pack(side="left")
@@ -48,7 +61,10 @@ class BorrowManagementWindow:
                   command=self.search_records).pack(side="left", padx=8)
 
         tk.Button(control_frame, text="Refresh", bg="#1abc9c", fg="white",
-                  command=self.load_records).pack(side="right", padx=10)
+                  command=self.refresh_records).pack(side="right", padx=10)
+
+        tk.Button(control_frame, text="Export", bg="#8e44ad", fg="white",
+                  command=lambda: open_export(self.master, "borrow")).pack(side="right")
 
         # ===== TABLE =====
         columns = ("id", "student", "book", "borrow", "due", "status")
@@ -62,8 +78,31 @@ class BorrowManagementWindow:
 
         self.tree.tag_configure("overdue", foreground="red")
 
+        # Big result sets are inserted in batches between Tk events
+        self.loader = TableLoader(self.tree)
+
+        # Refresh only re-reads rows changed since the last load
+        self.sync = TreeSync(self.tree, "borrow_transactions", self.fetch_changed_records,
+                             self.record_values, self.record_tags, insert_at=0)
+
+        # Search as you type (debounced, queried off the UI thread)
+        self.live_search = LiveSearch(master, self.search_var, self.query_records,
+                                      on_results=self.show_search_results,
+                                      on_clear=self.load_records)
+
         self.load_records()
 
+    # ================= Scan Checkout =================
+    def open_checkout_station(self):
+        librarian_id = self.user_data.get("librarian_id") or self.user_data.get("id")
+        CheckoutStation(self.master, db, librarian_id,
+                        on_close=lambda count: self.refresh_records() if count else None)
+
+    def open_batch_checkout(self):
+        librarian_id = self.user_data.get("librarian_id") or self.user_data.get("id")
+        BatchCheckoutDialog(self.master, db, librarian_id,
+                            on_done=lambda count: self.refresh_records())
+
     # ================= Borrow Dialog =================
     def borrow_dialog(self):
         dialog = tk.Toplevel(self.master)
@@ -104,101 +143,92 @@ class BorrowManagementWindow:
             student_id = cb_student.get().split(" - ")[0]
             book_id = cb_book.get().split(" - ")[0]
 
-            # Check if book is reserved for someone else
-            active_res = db.execute_query("""
-                SELECT r.student_id
-                FROM reservations r
-                WHERE r.book_id=%s AND r.status='Ready'
-                ORDER BY r.reservation_date ASC
-                LIMIT 1
-            """, (book_id,))
-
-            if active_res:
-                reserved_for = str(active_res[0]["student_id"])
-                if reserved_for != student_id:
-                    messagebox.showerror(
-                        "Book Reserved",
-                        "This book is reserved and ready for another student.\n"
-                        "You cannot borrow it until the reservation expires."
-                    )
-                    return
-
-            borrow_date = datetime.now().date()
-            due_date = borrow_date + timedelta(days=7)
-
             librarian_id = self.user_data.get("librarian_id") or self.user_data.get("id")
 
-            # Insert borrow
-            db.execute_query("""
-                INSERT INTO borrow_transactions(student_id, book_id, librarian_id, borrow_date, due_date, status)
-                VALUES(%s, %s, %s, %s, %s, 'Active')
-            """, (student_id, book_id, librarian_id, borrow_date, due_date))
-
-            # Reduce quantity
-            db.execute_query("UPDATE books SET quantity = quantity - 1 WHERE book_id=%s", (book_id,))
+            # Unpaid fines (one primary-key read of the student's balance)
+            try:
+                balance = get_balance(db, student_id)
+            except Error as e:
+                print("BALANCE CHECK ERROR:", e)
+                balance = None
+
+            if balance and balance["outstanding"] > 0 and not messagebox.askyesno(
+                    "Unpaid Fines",
+                    f"This student owes ₱{balance['outstanding']} in {balance['unpaid_fines']} unpaid fine(s).\n"
+                    "Lend the book anyway?"):
+                return
 
-            # Mark reservation as completed if used
-            if active_res:
-                db.execute_query("""
-                    UPDATE reservations
-                    SET status='Completed'
-                    WHERE book_id=%s AND student_id=%s
-                """, (book_id, student_id))
+            # Stock + reservation check, insert and stock update commit together
+            try:
+                checkout_book(db, student_id, librarian_id, book_id=book_id)
+            except CheckoutError as e:
+                messagebox.showerror("Cannot Borrow", str(e))
+                return
+            except Error as e:
+                messagebox.showerror("Database Error", f"Borrow failed, nothing was saved:\n{e}")
+                return
 
             messagebox.showinfo("Success", "Book Borrowed Successfully!")
             dialog.destroy()
-            self.load_records()
+            self.refresh_records()
 
         tk.Button(dialog, text="Save", bg="#27ae60", fg="white", width=15,
                   command=save_borrow).pack(pady=20)
 
     # ================= Table Loader =================
+    RECORDS_QUERY = """
+        SELECT bt.transaction_id,
+            CONCAT(s.first_name, ' ', s.last_name) AS student,
+            b.title AS book,
+            bt.borrow_date,
+            bt.due_date,
+            bt.status
+        FROM borrow_transactions bt
+        JOIN students s ON bt.student_id = s.student_id
+        JOIN books b ON bt.book_id = b.book_id
+    """
+
+    def record_values(self, row):
+        status_value = row.get("status") or row.get("borrow_status") or "Active"
+        return (row["transaction_id"], row["student"], row["book"],
+                row["borrow_date"], row["due_date"], status_value)
+
+    def record_tags(self, row):
+        return ("overdue",) if row.get("status") == "Overdue" else ("",)
+
     def load_records(self):
         self.tree.delete(*self.tree.get_children())
 
-        query = """
-            SELECT bt.transaction_id,
-                CONCAT(s.first_name, ' ', s.last_name) AS student,
-                b.title AS book,
-                bt.borrow_date,
-                bt.due_date,
-                bt.status
-            FROM borrow_transactions bt
-            JOIN students s ON bt.student_id = s.student_id
-            JOIN books b ON bt.book_id = b.book_id
-            ORDER BY bt.transaction_id DESC
-        """
+        # Flip late loans once per day in a single UPDATE; the rest is a pure read
+        overdue_sweep.run_if_due()
 
-        data = db.execute_query(query)
+        self.sync.start()
+        data = db.execute_query(self.RECORDS_QUERY + " ORDER BY bt.transaction_id DESC") or []
 
-        for row in data:
-            status_value = row.get("status") or row.get("borrow_status") or "Active"
+        # Inserted in batches so the window stays responsive
+        self.loader.load(data, self.insert_record)
 
-            # Auto-mark overdue
-            if status_value == "Active" and row["due_date"] < datetime.now().date():
-                status_value = "Overdue"
-                db.execute_query(
-                    "UPDATE borrow_transactions SET status='Overdue' WHERE transaction_id=%s",
-                    (row["transaction_id"],)
-                )
+    def insert_record(self, row, idx=None):
+        self.tree.insert("", "end", iid=row["transaction_id"],
+                         values=self.record_values(row),
+                         tags=self.record_tags(row))
 
-            tag = "overdue" if status_value == "Overdue" else ""
+    def fetch_changed_records(self, since):
+        return db.fetch(self.RECORDS_QUERY + " WHERE bt.updated_at >= %s", (since,))
 
-            self.tree.insert("", "end",
-                             values=(row["transaction_id"], row["student"], row["book"],
-                                     row["borrow_date"], row["due_date"], status_value),
-                             tags=(tag,))
+    def refresh_records(self):
+        """Refresh button: patch only the rows changed since the last load"""
+        overdue_sweep.run_if_due()
+        if self.loader.busy or self.sync.refresh() is None:
+            self.load_records()
 
     # ================= Search =================
     def search_records(self):
-        keyword = self.search_var.get().lower()
-        if not keyword:
-            self.load_records()
-            return
-
-        for row in self.tree.get_children():
-            self.tree.delete(row)
+        """Search button: run the current term now instead of waiting for the debounce"""
+        self.live_search.search_now()
 
+    def query_records(self, keyword):
+        """Runs on the live-search worker thread"""
         query = """
             SELECT bt.transaction_id,
                    CONCAT(s.first_name, ' ', s.last_name) AS student,
@@ -209,17 +239,19 @@ class BorrowManagementWindow:
             WHERE s.first_name LIKE %s OR s.last_name LIKE %s OR b.title LIKE %s
         """
 
-        key = f"%{keyword}%"
-        results = db.execute_query(query, (key, key, key))
+        key = f"%{keyword.lower()}%"
+        return db.fetch(query, (key, key, key))
 
-        for row in results:
-            status_value = row.get("status") or "Active"
-            tag = "overdue" if status_value == "Overdue" else ""
+    def show_search_results(self, keyword, results):
+        self.loader.cancel()
+        for row in self.tree.get_children():
+            self.tree.delete(row)
 
-            self.tree.insert("", "end", values=(
-                row["transaction_id"], row["student"], row["book"],
-                row["borrow_date"], row["due_date"], status_value
-            ), tags=(tag,))
+        # Filtered view: the next Refresh does a full load
+        self.sync.reset()
+
+        for row in results:
+            self.insert_record(row)
 
     # ================= Back =================
     def go_back(self):
@@ -0,0 +1,430 @@
+"""
+Book checkout
+
+checkout_book() lends one copy in a single transaction: lock the book row
+(by primary key or by the unique ISBN index), check stock and any Ready
+reservation, insert the loan, decrement stock. It is shared by the borrow
+dialog and the scan station. checkout_books() does the same for N books
+and one student with a fixed number of statements: one locking read of
+the books, one of their reservations, a multi-row INSERT, a single
+quantity UPDATE, one COMMIT.
+
+CheckoutStation is the desk's fast path: scan a student ID, then scan
+ISBNs. Every scan is one indexed lookup (or one checkout transaction) and
+the result is logged with its time, so the desk never waits on a
+Combobox of every student and book.
+"""
+import time
+import tkinter as tk
+from collections import Counter
+from datetime import datetime, timedelta
+from tkinter import messagebox
+
+from mysql.connector import Error
+
+from book_search import normalize_isbn
+from ledger import get_balance
+
+LOAN_DAYS = 7
+
+
+class CheckoutError(Exception):
+    """Checkout refused (no stock, reserved for someone else...); nothing was written"""
+
+
+def find_student(database, student_id):
+    rows = database.fetch("""
+        SELECT student_id, CONCAT(first_name, ' ', last_name) AS name, email
+        FROM students
+        WHERE student_id=%s
+    """, (student_id,))
+    return rows[0] if rows else None
+
+
+def lock_available_book(tx, book_id=None, isbn=None):
+    """Inside a checkout's transaction: lock the book row (by `book_id` or
+    `isbn`) and make sure a copy is on the shelf. Raises CheckoutError."""
+    if isbn is not None:
+        book = tx.execute_query_one(
+            "SELECT book_id, title, quantity FROM books WHERE isbn=%s FOR UPDATE", (isbn,)
+        )
+    else:
+        book = tx.execute_query_one(
+            "SELECT book_id, title, quantity FROM books WHERE book_id=%s FOR UPDATE", (book_id,)
+        )
+
+    if not book:
+        raise CheckoutError("No book found with that ISBN." if isbn else "Book not found.")
+    if book["quantity"] <= 0:
+        raise CheckoutError(f"No copies of '{book['title']}' are available.")
+    return book
+
+
+def checkout_book(database, student_id, librarian_id, book_id=None, isbn=None):
+    """Lend one copy of a book (by `book_id` or `isbn`) in one transaction.
+
+    Returns the book row plus its due_date; raises CheckoutError (or a
+    database Error) with nothing saved.
+    """
+    borrow_date = datetime.now().date()
+    due_date = borrow_date + timedelta(days=LOAN_DAYS)
+
+    with database.transaction() as tx:
+        book = lock_available_book(tx, book_id, isbn)
+
+        # Check if book is reserved for someone else
+        ready = tx.execute_query_one("""
+            SELECT r.student_id
+            FROM reservations r
+            WHERE r.book_id=%s AND r.status='Ready'
+            ORDER BY r.reservation_date ASC
+            LIMIT 1
+            FOR UPDATE
+        """, (book["book_id"],))
+
+        if ready and str(ready["student_id"]) != str(student_id):
+            raise CheckoutError(
+                f"'{book['title']}' is reserved and ready for another student.\n"
+                "It cannot be borrowed until the reservation expires."
+            )
+
+        tx.execute_query("""
+            INSERT INTO borrow_transactions(student_id, book_id, librarian_id, borrow_date, due_date, status)
+            VALUES(%s, %s, %s, %s, %s, 'Active')
+        """, (student_id, book["book_id"], librarian_id, borrow_date, due_date))
+
+        tx.execute_query("UPDATE books SET quantity = quantity - 1 WHERE book_id=%s", (book["book_id"],))
+
+        # Mark reservation as completed if used
+        if ready:
+            tx.execute_query("""
+                UPDATE reservations
+                SET status='Completed'
+                WHERE book_id=%s AND student_id=%s AND status='Ready'
+            """, (book["book_id"], student_id))
+
+    return dict(book, due_date=due_date)
+
+
+def find_book(database, code):
+    """Book by scanned/typed ISBN, or by book ID"""
+    isbn = normalize_isbn(code)
+    if isbn:
+        rows = database.fetch("SELECT book_id, title, quantity FROM books WHERE isbn=%s", (isbn,))
+    elif code.isdigit():
+        rows = database.fetch("SELECT book_id, title, quantity FROM books WHERE book_id=%s", (int(code),))
+    else:
+        return None
+    return rows[0] if rows else None
+
+
+def checkout_books(database, student_id, librarian_id, book_ids):
+    """Lend every book in `book_ids` (repeats = several copies) to one student, all or nothing.
+
+    Returns the book rows with their due_date; raises CheckoutError listing
+    every problem, or a database Error, with nothing saved.
+    """
+    wanted = Counter(int(b) for b in book_ids)
+    if not wanted:
+        return []
+
+    borrow_date = datetime.now().date()
+    due_date = borrow_date + timedelta(days=LOAN_DAYS)
+    ids = sorted(wanted)
+    placeholders = ", ".join(["%s"] * len(ids))
+
+    with database.transaction() as tx:
+        books = {b["book_id"]: b for b in tx.execute_query(f"""
+            SELECT book_id, title, quantity FROM books
+            WHERE book_id IN ({placeholders})
+            FOR UPDATE
+        """, ids)}
+
+        # First Ready reservation per book, all books in one query
+        ready = {}
+        for r in tx.execute_query(f"""
+            SELECT r.book_id, r.student_id
+            FROM reservations r
+            WHERE r.book_id IN ({placeholders}) AND r.status='Ready'
+            ORDER BY r.book_id, r.reservation_date ASC
+            FOR UPDATE
+        """, ids):
+            ready.setdefault(r["book_id"], r["student_id"])
+
+        problems = []
+        for book_id in ids:
+            book = books.get(book_id)
+            if not book:
+                problems.append(f"Book {book_id} not found.")
+            elif book["quantity"] < wanted[book_id]:
+                problems.append(f"'{book['title']}': only {book['quantity']} available.")
+            elif book_id in ready and str(ready[book_id]) != str(student_id):
+                problems.append(f"'{book['title']}' is reserved and ready for another student.")
+        if problems:
+            raise CheckoutError("\n".join(problems))
+
+        loans = [
+            (student_id, book_id, librarian_id, borrow_date, due_date)
+            for book_id in ids for _ in range(wanted[book_id])
+        ]
+        tx.execute_query(
+            "INSERT INTO borrow_transactions(student_id, book_id, librarian_id, borrow_date, due_date, status) "
+            "VALUES " + ", ".join(["(%s, %s, %s, %s, %s, 'Active')"] * len(loans)),
+            [value for loan in loans for value in loan]
+        )
+
+        cases = " ".join(["WHEN %s THEN %s"] * len(ids))
+        tx.execute_query(
+            f"UPDATE books SET quantity = quantity - CASE book_id {cases} END "
+            f"WHERE book_id IN ({placeholders})",
+            [value for book_id in ids for value in (book_id, wanted[book_id])] + ids
+        )
+
+        # Mark this student's own Ready reservations as completed
+        used = [book_id for book_id in ids if book_id in ready]
+        if used:
+            used_placeholders = ", ".join(["%s"] * len(used))
+            tx.execute_query(f"""
+                UPDATE reservations
+                SET status='Completed'
+                WHERE student_id=%s AND book_id IN ({used_placeholders}) AND status='Ready'
+            """, [student_id] + used)
+
+    return [dict(books[book_id], due_date=due_date) for book_id in ids for _ in range(wanted[book_id])]
+
+
+class CheckoutStation:
+    """Scan-driven checkout: student ID first, then any number of ISBNs"""
+
+    def __init__(self, parent, database, librarian_id, on_close=None):
+        self.db = database
+        self.librarian_id = librarian_id
+        self.on_close = on_close
+        self.student = None
+        self.checked_out = 0
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("Scan Checkout")
+        self.window.geometry("620x480")
+        self.window.configure(bg="#ecf0f1")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.prompt = tk.Label(self.window, text="", font=("Arial", 13, "bold"), bg="#ecf0f1", anchor="w")
+        self.prompt.pack(fill=tk.X, padx=15, pady=(15, 0))
+
+        self.notice = tk.Label(self.window, text="", font=("Arial", 10), bg="#ecf0f1", fg="#c0392b", anchor="w")
+        self.notice.pack(fill=tk.X, padx=15)
+
+        self.scan_var = tk.StringVar()
+        self.entry = tk.Entry(self.window, textvariable=self.scan_var, font=("Consolas", 16))
+        self.entry.pack(fill=tk.X, padx=15, pady=10)
+        self.entry.bind("<Return>", self.on_scan)
+        self.entry.bind("<Escape>", lambda e: self.finish_student())
+
+        buttons = tk.Frame(self.window, bg="#ecf0f1")
+        buttons.pack(fill=tk.X, padx=15)
+        tk.Button(buttons, text="Next Student (Esc)", bg="#3498db", fg="white",
+                  command=self.finish_student).pack(side=tk.LEFT)
+        tk.Button(buttons, text="Close", bg="#7f8c8d", fg="white", width=10,
+                  command=self.close).pack(side=tk.RIGHT)
+
+        self.log = tk.Listbox(self.window, font=("Consolas", 10))
+        self.log.pack(fill=tk.BOTH, expand=True, padx=15, pady=10)
+
+        self.finish_student()
+
+    # ---------------- Scans ----------------
+    def on_scan(self, event=None):
+        scan = self.scan_var.get().strip()
+        self.scan_var.set("")
+        if not scan:
+            # Enter on an empty box ends the current student
+            return self.finish_student() if self.student else None
+
+        started = time.perf_counter()
+        isbn = normalize_isbn(scan)
+
+        if self.student and isbn:
+            self.scan_book(isbn, started)
+        elif scan.isdigit() and not isbn:
+            self.scan_student(int(scan), started)
+        elif isbn:
+            self.add_log("✖", f"Scan a student ID before books ({scan})", started)
+        else:
+            self.add_log("✖", f"Not a student ID or ISBN: {scan}", started)
+
+    def scan_student(self, student_id, started):
+        try:
+            student = find_student(self.db, student_id)
+            balance = get_balance(self.db, student_id) if student else None
+        except Error as e:
+            return self.add_log("✖", f"Database error: {e}", started)
+
+        if not student:
+            return self.add_log("✖", f"No student with ID {student_id}", started)
+
+        self.student = student
+        self.prompt.config(text=f"Student: {student['name']} ({student_id})  —  scan books")
+        if balance and balance["outstanding"] > 0:
+            self.notice.config(text=f"Owes ₱{balance['outstanding']} in {balance['unpaid_fines']} unpaid fine(s)")
+        else:
+            self.notice.config(text="")
+        self.add_log("👤", f"{student['name']} ({student_id})", started)
+
+    def scan_book(self, isbn, started):
+        try:
+            book = checkout_book(self.db, self.student["student_id"], self.librarian_id, isbn=isbn)
+        except CheckoutError as e:
+            self.window.bell()
+            return self.add_log("✖", str(e).replace("\n", " "), started)
+        except Error as e:
+            self.window.bell()
+            return self.add_log("✖", f"Database error, nothing saved: {e}", started)
+
+        self.checked_out += 1
+        self.add_log("✔", f"{book['title']}  — due {book['due_date']}", started)
+
+    def finish_student(self):
+        self.student = None
+        self.prompt.config(text="Scan student ID")
+        self.notice.config(text="")
+        self.entry.focus_set()
+
+    def add_log(self, mark, text, started):
+        elapsed = (time.perf_counter() - started) * 1000
+        self.log.insert(0, f"{mark} {datetime.now():%H:%M:%S}  {text}  ({elapsed:.0f} ms)")
+
+    def close(self):
+        self.window.destroy()
+        if self.on_close:
+            self.on_close(self.checked_out)
+
+
+class BatchCheckoutDialog:
+    """One student, a list of books, one Check Out for all of them"""
+
+    def __init__(self, parent, database, librarian_id, on_done=None):
+        self.db = database
+        self.librarian_id = librarian_id
+        self.on_done = on_done
+        self.student = None
+        self.cart = []      # book rows, in the order added
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("Batch Checkout")
+        self.window.geometry("520x460")
+        self.window.configure(bg="#ecf0f1")
+        self.window.transient(parent)
+        self.window.grab_set()
+
+        form = tk.Frame(self.window, bg="#ecf0f1", padx=20, pady=15)
+        form.pack(fill=tk.BOTH, expand=True)
+
+        tk.Label(form, text="Student ID", bg="#ecf0f1", font=("Arial", 10, "bold")).grid(row=0, column=0, sticky="w")
+        self.student_var = tk.StringVar()
+        student_entry = tk.Entry(form, textvariable=self.student_var, width=15)
+        student_entry.grid(row=0, column=1, sticky="w", padx=5)
+        student_entry.bind("<Return>", lambda e: self.lookup_student())
+        student_entry.bind("<FocusOut>", lambda e: self.lookup_student())
+        self.student_label = tk.Label(form, text="", bg="#ecf0f1", anchor="w")
+        self.student_label.grid(row=1, column=0, columnspan=3, sticky="w", pady=(2, 10))
+
+        tk.Label(form, text="ISBN / Book ID", bg="#ecf0f1", font=("Arial", 10, "bold")).grid(row=2, column=0, sticky="w")
+        self.book_var = tk.StringVar()
+        book_entry = tk.Entry(form, textvariable=self.book_var, width=25)
+        book_entry.grid(row=2, column=1, sticky="w", padx=5)
+        book_entry.bind("<Return>", lambda e: self.add_book())
+        tk.Button(form, text="Add", width=8, command=self.add_book).grid(row=2, column=2, sticky="w")
+
+        self.cart_list = tk.Listbox(form, height=12, selectmode=tk.EXTENDED)
+        self.cart_list.grid(row=3, column=0, columnspan=3, sticky="nsew", pady=10)
+        form.grid_rowconfigure(3, weight=1)
+        form.grid_columnconfigure(1, weight=1)
+
+        buttons = tk.Frame(form, bg="#ecf0f1")
+        buttons.grid(row=4, column=0, columnspan=3, sticky="ew")
+        tk.Button(buttons, text="Remove Selected", command=self.remove_selected).pack(side=tk.LEFT)
+        self.submit_btn = tk.Button(buttons, text="Check Out All", bg="#27ae60", fg="white", width=15,
+                                    command=self.submit)
+        self.submit_btn.pack(side=tk.RIGHT)
+
+        student_entry.focus_set()
+
+    def lookup_student(self):
+        text = self.student_var.get().strip()
+        if self.student and str(self.student["student_id"]) == text:
+            return self.student
+        self.student = None
+
+        if not text.isdigit():
+            self.student_label.config(text="Enter a numeric student ID." if text else "", fg="#c0392b")
+            return None
+
+        try:
+            self.student = find_student(self.db, int(text))
+        except Error as e:
+            self.student_label.config(text=f"Database error: {e}", fg="#c0392b")
+            return None
+
+        if self.student:
+            self.student_label.config(text=self.student["name"], fg="#27ae60")
+        else:
+            self.student_label.config(text="No student with that ID.", fg="#c0392b")
+        return self.student
+
+    def add_book(self):
+        code = self.book_var.get().strip()
+        if not code:
+            return
+
+        try:
+            book = find_book(self.db, code)
+        except Error as e:
+            return messagebox.showerror("Database Error", str(e), parent=self.window)
+
+        if not book:
+            self.window.bell()
+            return messagebox.showwarning("Not Found", f"No book matches '{code}'.", parent=self.window)
+
+        self.cart.append(book)
+        self.cart_list.insert(tk.END, f"{book['book_id']} - {book['title']}  (in stock: {book['quantity']})")
+        self.book_var.set("")
+
+    def remove_selected(self):
+        for index in reversed(self.cart_list.curselection()):
+            self.cart_list.delete(index)
+            del self.cart[index]
+
+    def submit(self):
+        student = self.lookup_student()
+        if not student:
+            return messagebox.showwarning("Missing Student", "Enter a valid student ID.", parent=self.window)
+        if not self.cart:
+            return messagebox.showwarning("No Books", "Add at least one book.", parent=self.window)
+
+        try:
+            balance = get_balance(self.db, student["student_id"])
+        except Error as e:
+            print("BALANCE CHECK ERROR:", e)
+            balance = None
+
+        if balance and balance["outstanding"] > 0 and not messagebox.askyesno(
+                "Unpaid Fines",
+                f"{student['name']} owes ₱{balance['outstanding']} in {balance['unpaid_fines']} unpaid fine(s).\n"
+                f"Lend {len(self.cart)} book(s) anyway?", parent=self.window):
+            return
+
+        try:
+            loans = checkout_books(self.db, student["student_id"], self.librarian_id,
+                                   [book["book_id"] for book in self.cart])
+        except CheckoutError as e:
+            return messagebox.showerror("Cannot Check Out", f"Nothing was borrowed:\n{e}", parent=self.window)
+        except Error as e:
+            return messagebox.showerror("Database Error", f"Checkout failed, nothing was saved:\n{e}",
+                                        parent=self.window)
+
+        self.window.destroy()
+        messagebox.showinfo("Success", f"{len(loans)} book(s) borrowed by {student['name']}.\n"
+                                       f"Due: {loans[0]['due_date']}")
+        if self.on_done:
+            self.on_done(len(loans))
@@ -0,0 +1,107 @@
+"""
+Bounded, thread-safe connection pool
+
+Kept apart from database.py (which connects at import) so it can be used
+and tested with any connect() callable.
+"""
+import threading
+import time
+
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+POOL_SIZE = 5          # max open connections
+POOL_TIMEOUT = 10      # seconds to wait for a free connection
+POOL_IDLE_CHECK = 30   # ping a connection only if it sat idle longer than this
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of MySQL connections"""
+
+    def __init__(self, connect, size=POOL_SIZE, timeout=POOL_TIMEOUT, idle_check=POOL_IDLE_CHECK):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.idle_check = idle_check
+
+        self._idle = []        # [(connection, last_used)]
+        self._created = 0
+        self._cond = threading.Condition()
+
+    def checkout(self):
+        """Borrow a connection, waiting up to `timeout` seconds for one to free up"""
+        deadline = time.monotonic() + self.timeout
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+
+                if self._created < self.size:
+                    self._created += 1
+                    conn, last_used = None, None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolError(f"No free database connection after {self.timeout}s "
+                                    f"(pool size {self.size})")
+                self._cond.wait(remaining)
+
+        if conn is None:
+            return self._open()
+
+        # Only validate connections that have been idle for a while
+        if time.monotonic() - last_used > self.idle_check:
+            try:
+                conn.ping(reconnect=False)
+            except Error:
+                self._close_quietly(conn)
+                return self._open()
+
+        return conn
+
+    def checkin(self, conn):
+        """Return a healthy connection to the pool"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Error:
+            return self.discard(conn)
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def discard(self, conn):
+        """Drop a broken connection and free its slot"""
+        self._close_quietly(conn)
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def _open(self):
+        try:
+            return self._connect()
+        except Error:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Error:
+            pass
@@ -1,51 +1,161 @@
 """Database connection and operations handler"""
+from contextlib import contextmanager
+
 import mysql.connector
-from mysql.connector.locales.eng import client_error 
+from mysql.connector.locales.eng import client_error
 from mysql.connector import Error
+from mysql.connector.errors import InterfaceError, OperationalError
 from tkinter import messagebox
 
+from connection_pool import ConnectionPool, POOL_SIZE, POOL_TIMEOUT, POOL_IDLE_CHECK
+
+DB_CONFIG = {
+    "host": "127.0.0.1",
+    "database": "library_management",
+    "user": "libadmin",
+    "password": "7548",
+}
+
+STREAM_BATCH_SIZE = 1000
+
+
+class Transaction:
+    """Cursor wrapper handed out by Database.transaction()"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute_query(self, query, params=None):
+        """Run a statement; SELECTs return all rows, writes return the row count"""
+        self.cursor.execute(query, params or ())
+        if self.cursor.with_rows:
+            return self.cursor.fetchall()
+        return self.cursor.rowcount
+
+    def execute_query_one(self, query, params=None):
+        """Fetch exactly one row"""
+        self.cursor.execute(query, params or ())
+        return self.cursor.fetchone()
+
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+
+
 class Database:
-    def __init__(self):
-        self.connection = None
-        self.connect()
-    
-    def connect(self):
-        """Connect to MySQL database with fallback"""
+    def __init__(self, pool_size=POOL_SIZE, pool_timeout=POOL_TIMEOUT, idle_check=POOL_IDLE_CHECK,
+                 warm_up=True):
+        self.pool = ConnectionPool(self.connect, pool_size, pool_timeout, idle_check)
+
+        if not warm_up:
+            return
+
+        # Open the first connection up front so a bad config is reported at startup
         try:
-            self.connection = mysql.connector.connect(
-                host='127.0.0.1',
-                database='library_management',
-                user='libadmin',
-                password='7548'
-            )
-            if self.connection.is_connected():
-                print("Successfully connected to database")
-                return self.connection
+            self.pool.checkin(self.pool.checkout())
+            print("Successfully connected to database")
         except Error as e:
             messagebox.showerror("Database Error", f"Error connecting to database: {e}")
-            return None
 
-    def get_connection(self):
-        """Ensure connection is alive, reconnect if needed"""
-        if not self.connection or not self.connection.is_connected():
-            self.connect()
-        return self.connection
+    def connect(self):
+        """Open a new, unpooled MySQL connection"""
+        return mysql.connector.connect(**DB_CONFIG)
 
-    def execute_query(self, query, params=None, fetch=True):
-        """Execute SELECT or INSERT/UPDATE/DELETE automatically"""
+    @contextmanager
+    def pooled_connection(self):
+        """Check out a connection for the duration of a `with` block"""
+        conn = self.pool.checkout()
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute(query, params or ())
-            is_select = query.strip().lower().startswith("select")
+            yield conn
+        except (InterfaceError, OperationalError):
+            self.pool.discard(conn)
+            conn = None
+            raise
+        finally:
+            if conn is not None:
+                self.pool.checkin(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Run many statements on one connection with a single COMMIT.
 
-            if is_select:
-                result = cursor.fetchall()
+        Rolls back and re-raises on any error, so callers either see every
+        write applied or none of them.
+        """
+        with self.pooled_connection() as conn:
+            cursor = conn.cursor(dictionary=True, buffered=True)
+            try:
+                yield Transaction(cursor)
+                conn.commit()
+            except BaseException:
+                try:
+                    conn.rollback()
+                except Error:
+                    pass
+                raise
+            finally:
                 cursor.close()
-                return result
-            else:
-                self.connection.commit()
+
+    def fetch(self, query, params=None):
+        """Run a SELECT and return all rows. Raises on error instead of
+        showing a dialog, so it is safe to call off the UI thread."""
+        with self.pooled_connection() as conn:
+            cursor = conn.cursor(dictionary=True, buffered=True)
+            try:
+                cursor.execute(query, params or ())
+                return cursor.fetchall()
+            finally:
                 cursor.close()
-                return True
+
+    def execute_stream(self, query, params=None, batch_size=STREAM_BATCH_SIZE, dictionary=True):
+        """Yield the result of a SELECT in lists of up to `batch_size` rows.
+
+        Rows are read from an unbuffered cursor, so memory stays flat no
+        matter how big the result is. The stream uses its own connection
+        (outside the pool) for as long as the generator is alive; close
+        the generator or run it to the end to release it. Raises on error.
+        """
+        conn = self.connect()
+        cursor = conn.cursor(dictionary=dictionary)
+        finished = False
+
+        try:
+            cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+            finished = True
+            cursor.close()
+
+        finally:
+            # An abandoned unbuffered result can't be closed cleanly; just drop the socket
+            if not finished:
+                try:
+                    conn.disconnect()
+                except Error:
+                    pass
+            else:
+                conn.close()
+
+    def execute_query(self, query, params=None, fetch=True):
+        """Execute SELECT or INSERT/UPDATE/DELETE automatically"""
+        try:
+            with self.pooled_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(query, params or ())
+                is_select = query.strip().lower().startswith("select")
+
+                if is_select:
+                    result = cursor.fetchall()
+                    cursor.close()
+                    return result
+                else:
+                    conn.commit()
+                    cursor.close()
+                    return True
 
         except Error as e:
             messagebox.showerror("Database Error", f"Error executing query:\n{e}")
@@ -54,19 +164,20 @@ class Database:
     def execute_query_one(self, query, params=None):
         """Fetch exactly one row"""
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute(query, params or ())
-            result = cursor.fetchone()
-            cursor.close()
-            return result
+            with self.pooled_connection() as conn:
+                # buffered so leftover rows never leak into the next borrower
+                cursor = conn.cursor(dictionary=True, buffered=True)
+                cursor.execute(query, params or ())
+                result = cursor.fetchone()
+                cursor.close()
+                return result
         except Error as e:
             messagebox.showerror("Database Error", f"Error executing query:\n{e}")
             return None
 
     def close(self):
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            print("Database connection closed")
+        self.pool.close_all()
+        print("Database connection closed")
 
 # Global database instance
-db = Database()
\ No newline at end of file
+db = Database()
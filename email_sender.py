@@ -1,21 +1,59 @@
 import smtplib
 import json
 import os
+import socket
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+SMTP_HOST = "smtp.gmail.com"
+SMTP_PORT = 587
+SMTP_TIMEOUT = 30         # socket timeout, seconds
+SMTP_IDLE_TIMEOUT = 240   # drop the session ourselves before the server does
+
+# The session is gone: reconnect and retry once
+CONNECTION_LOST = (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout)
+# The server refused this one message; the session is still good
+MESSAGE_REFUSED = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+# send_email results: FAILED is worth retrying later, REFUSED never is
+SENT, FAILED, REFUSED = "sent", "failed", "refused"
+
+
+def is_permanent(error):
+    """A 5xx refusal is final; 4xx ones (greylisting, mailbox busy) may pass later"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+    else:
+        codes = [getattr(error, "smtp_code", 0)]
+    return bool(codes) and all(code >= 500 for code in codes)
+
 
 class EmailSender:
-    def __init__(self):
-        self.credentials_path = "credentials.json"
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, use_tls=True, login_required=True,
+                 idle_timeout=SMTP_IDLE_TIMEOUT, credentials_path="credentials.json"):
+        self.credentials_path = credentials_path
         self.email = None
         self.password = None
+
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.login_required = login_required
+        self.idle_timeout = idle_timeout
+
+        # Long-lived authenticated session, shared by every send
+        self.server = None
+        self.last_used = 0
+        self._lock = threading.RLock()
+
         self.load_credentials()
 
     def load_credentials(self):
         """Load Gmail credentials from credentials.json"""
         print("Looking for credentials.json in:", os.getcwd())
-        
+
         if not os.path.exists(self.credentials_path):
             print("❌ ERROR: credentials.json not found.")
 
@@ -33,30 +71,125 @@ class EmailSender:
             print("❌ Failed to read credentials.json:", e)
             return False
 
-    def send_email(self, to_email, subject, body):
-        """Send an email using Gmail SMTP. Safe even if credentials missing."""
+    def has_credentials(self):
+        return bool(self.email) and (bool(self.password) or not self.login_required)
 
-        if not self.email or not self.password:
-            print("⚠️ Email NOT sent — missing credentials.")
-            return False
+    # ---------------- Session ----------------
+    def connect(self):
+        """Open a fresh SMTP session (STARTTLS + AUTH as configured)"""
+        self.disconnect()
 
+        server = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
         try:
-            msg = MIMEMultipart()
-            msg["From"] = self.email
-            msg["To"] = to_email
-            msg["Subject"] = subject
+            if self.use_tls:
+                server.starttls()
+            if self.password:
+                server.login(self.email, self.password)
+        except Exception:
+            server.close()
+            raise
+
+        self.server = server
+        self.last_used = time.monotonic()
+        return server
+
+    def disconnect(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+        self.server = None
+
+    def get_session(self):
+        """Reuse the open session if it is fresh and answers NOOP, else reconnect"""
+        if self.server is not None:
+            if time.monotonic() - self.last_used > self.idle_timeout:
+                self.disconnect()
+            else:
+                try:
+                    code, _ = self.server.noop()
+                    if code == 250:
+                        return self.server
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self.disconnect()
+
+        return self.connect()
+
+    close = disconnect
 
-            msg.attach(MIMEText(body, "plain"))
+    # ---------------- Sending ----------------
+    def build_message(self, to_email, subject, body):
+        msg = MIMEMultipart()
+        msg["From"] = self.email
+        msg["To"] = to_email
+        msg["Subject"] = subject
 
-            server = smtplib.SMTP("smtp.gmail.com", 587)
-            server.starttls()
-            server.login(self.email, self.password)
-            server.send_message(msg)
-            server.quit()
+        msg.attach(MIMEText(body, "plain"))
+        return msg
+
+    def _send(self, msg):
+        """Send over the shared session, reconnecting once if the server dropped us.
+
+        Refusals (recipient, sender, data) are raised as-is: the message
+        reached the server, so resending it could deliver it twice.
+        """
+        try:
+            self.get_session().send_message(msg)
+        except CONNECTION_LOST:
+            self.connect().send_message(msg)
+        self.last_used = time.monotonic()
+
+    def send_email(self, to_email, subject, body):
+        """Send an email using Gmail SMTP. Safe even if credentials missing.
+
+        Returns SENT, FAILED (worth retrying later) or REFUSED (the server
+        permanently rejected this message; sending it again won't help).
+        """
+
+        if not self.has_credentials():
+            print("⚠️ Email NOT sent — missing credentials.")
+            return FAILED
+
+        try:
+            with self._lock:
+                self._send(self.build_message(to_email, subject, body))
 
             print(f"📨 Email sent to {to_email}")
-            return True
+            return SENT
+
+        except MESSAGE_REFUSED as e:
+            print("❌ Email refused:", e)
+            return REFUSED if is_permanent(e) else FAILED
 
         except Exception as e:
             print("❌ Email sending failed:", e)
-            return False
+            with self._lock:
+                self.disconnect()
+            return FAILED
+
+    def send_many(self, messages):
+        """Send [(to_email, subject, body), ...] over one session. Returns a send_email result per message."""
+
+        if not self.has_credentials():
+            print("⚠️ Email NOT sent — missing credentials.")
+            return [FAILED] * len(messages)
+
+        results = []
+        with self._lock:
+            for to_email, subject, body in messages:
+                try:
+                    self._send(self.build_message(to_email, subject, body))
+                    results.append(SENT)
+                except MESSAGE_REFUSED as e:
+                    print(f"❌ Email to {to_email} refused:", e)
+                    results.append(REFUSED if is_permanent(e) else FAILED)
+                except Exception as e:
+                    print(f"❌ Email to {to_email} failed:", e)
+                    self.disconnect()
+                    results.append(FAILED)
+
+        print(f"📨 Sent {results.count(SENT)}/{len(results)} email(s)")
+        return results
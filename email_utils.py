@@ -1,6 +1,7 @@
-from email_sender import EmailSender
+from mail_queue import outbox
 
-mailer = EmailSender()
+# Messages are spooled and sent by the queue's worker thread
+mailer = outbox.sender
 
 
 # ---------------- Reservation Email ----------------
@@ -30,6 +31,21 @@ def generate_ready_email(student_name, book_title):
     return subject, body
 
 
+# ---------------- Late Return Fine Email ----------------
+def generate_fine_email(student_name, book_title, days_late, fine_amount):
+    subject = "💸 Late Return Fine"
+    body = (
+        f"Hello {student_name},\n\n"
+        f"The book:\n"
+        f"📖 {book_title}\n\n"
+        f"was returned {days_late} day(s) late.\n"
+        f"A fine of ₱{fine_amount:.2f} has been added to your account.\n\n"
+        f"Please settle it at the library front desk.\n"
+        f"\nThank you!"
+    )
+    return subject, body
+
+
 # ---------------- Reminder Email ----------------
 def send_gmail_reminder(to_email, student_name, book_title, due_date):
     subject = "🔔 Book Return Reminder"
@@ -41,7 +57,22 @@ def send_gmail_reminder(to_email, student_name, book_title, due_date):
         f"Please return it on time to avoid penalties.\n"
         f"\nThank you!"
     )
-    return mailer.send_email(to_email, subject, body)
+    return outbox.enqueue(to_email, subject, body)
+
+
+# ---------------- Due Soon Digest ----------------
+def generate_due_digest_email(student_name, loans):
+    """One reminder listing every loan (dicts with title/due_date) due soon"""
+    lines = "\n".join(f"📖 {loan['title']} — due {loan['due_date']}" for loan in loans)
+    subject = "🔔 Books Due Soon"
+    body = (
+        f"Hello {student_name},\n\n"
+        f"The following book(s) are due soon:\n"
+        f"{lines}\n\n"
+        f"Please return them on time to avoid penalties.\n"
+        f"\nThank you!"
+    )
+    return subject, body
 
 
 # ---------------- Book Available Notification ----------------
@@ -54,4 +85,4 @@ def send_book_available_notification(to_email, student_name, book_title):
         f"You may reserve or borrow it anytime.\n\n"
         f"Thank you!"
     )
-    return mailer.send_email(to_email, subject, body)
+    return outbox.enqueue(to_email, subject, body)
@@ -0,0 +1,312 @@
+"""
+Streaming CSV / XLSX export
+
+Exports read their query through Database.execute_stream (an unbuffered
+cursor on a connection of its own) and write each batch to disk as it
+arrives, so memory stays flat whether the table has a hundred rows or
+millions. XLSX goes through openpyxl's write-only mode (optional
+dependency) and continues on a new sheet whenever one fills up. Output is
+written to a ".part" file and renamed at the end, so a failed or cancelled
+export never leaves a half-written file behind.
+
+ExportDialog runs an export on a worker thread with progress and a Cancel
+button; the same engine is available from the command line:
+
+    python exporter.py borrow borrow_history.csv
+"""
+import argparse
+import csv
+import os
+import queue
+import sys
+import threading
+import tkinter as tk
+from datetime import date
+from tkinter import filedialog, messagebox
+
+from database import db
+
+try:
+    from openpyxl import Workbook
+except ImportError:      # XLSX export unavailable, CSV still works
+    Workbook = None
+
+XLSX_MAX_ROWS = 1048576   # Excel's per-sheet row limit, header included
+POLL_MS = 100
+
+# name -> (title, column headings, query)
+EXPORTS = {
+    "students": (
+        "Students",
+        ["ID", "First Name", "Last Name", "Email", "Phone", "Registration Date"],
+        """
+        SELECT student_id, first_name, last_name, email, phone, registration_date
+        FROM students
+        ORDER BY student_id
+        """,
+    ),
+    "books": (
+        "Books",
+        ["ID", "ISBN", "Title", "Author", "Publisher", "Year", "Category",
+         "Location", "Qty", "Status", "Added", "Created"],
+        """
+        SELECT book_id, isbn, title, author, publisher, publication_year, category,
+               location, quantity, status, date_added, created_at
+        FROM books
+        ORDER BY book_id
+        """,
+    ),
+    "borrow": (
+        "Borrow History",
+        ["Transaction ID", "Student ID", "Student", "Book ID", "Book", "Borrow Date",
+         "Due Date", "Return Date", "Status"],
+        """
+        SELECT bt.transaction_id, bt.student_id, CONCAT(s.first_name, ' ', s.last_name),
+               bt.book_id, b.title, bt.borrow_date, bt.due_date, bt.return_date, bt.status
+        FROM borrow_transactions bt
+        LEFT JOIN students s ON s.student_id = bt.student_id
+        LEFT JOIN books b ON b.book_id = bt.book_id
+        ORDER BY bt.transaction_id
+        """,
+    ),
+    "fines": (
+        "Fines",
+        ["Fine ID", "Transaction ID", "Student", "Book", "Amount", "Calculated",
+         "Paid", "Status"],
+        """
+        SELECT f.fine_id, f.transaction_id, CONCAT(s.first_name, ' ', s.last_name), b.title,
+               f.fine_amount, f.calculated_date, f.paid_date, f.payment_status
+        FROM fines f
+        LEFT JOIN borrow_transactions bt ON bt.transaction_id = f.transaction_id
+        LEFT JOIN students s ON s.student_id = bt.student_id
+        LEFT JOIN books b ON b.book_id = bt.book_id
+        ORDER BY f.fine_id
+        """,
+    ),
+    "reservations": (
+        "Reservations",
+        ["Reservation ID", "Book", "Student", "Reserved", "Expires", "Status"],
+        """
+        SELECT r.reservation_id, b.title, CONCAT(s.first_name, ' ', s.last_name),
+               r.reservation_date, r.expires_at, r.status
+        FROM reservations r
+        LEFT JOIN books b ON b.book_id = r.book_id
+        LEFT JOIN students s ON s.student_id = r.student_id
+        ORDER BY r.reservation_id
+        """,
+    ),
+}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def write_csv(path, headings, rows):
+    # utf-8-sig so Excel shows names and the peso sign correctly
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(headings)
+        writer.writerows(rows)
+
+
+def write_xlsx(path, title, headings, rows):
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = XLSX_MAX_ROWS
+    sheets = 0
+
+    for row in rows:
+        if sheet_rows >= XLSX_MAX_ROWS:
+            sheets += 1
+            sheet = workbook.create_sheet(title if sheets == 1 else f"{title} {sheets}")
+            sheet.append(headings)
+            sheet_rows = 1
+
+        sheet.append(row)
+        sheet_rows += 1
+
+    if sheet is None:
+        workbook.create_sheet(title).append(headings)
+
+    workbook.save(path)
+
+
+def export_table(database, name, path, progress=None, cancel_event=None):
+    """Stream export `name` to `path` (.csv or .xlsx). Returns the number of rows written.
+
+    progress(count) is called after every batch (on the exporting thread);
+    setting `cancel_event` stops the export with ExportCancelled.
+    """
+    title, headings, query = EXPORTS[name]
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in (".csv", ".xlsx"):
+        raise ValueError("Export file must end in .csv or .xlsx")
+    if ext == ".xlsx" and Workbook is None:
+        raise RuntimeError("XLSX export needs openpyxl (pip install openpyxl)")
+
+    batches = database.execute_stream(query, dictionary=False)
+    count = 0
+
+    def rows():
+        nonlocal count
+        for batch in batches:
+            if cancel_event is not None and cancel_event.is_set():
+                raise ExportCancelled()
+
+            yield from batch
+            count += len(batch)
+            if progress:
+                progress(count)
+
+    partial = path + ".part"
+    try:
+        if ext == ".csv":
+            write_csv(partial, headings, rows())
+        else:
+            write_xlsx(partial, title[:31], headings, rows())
+
+        os.replace(partial, path)
+        return count
+
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+    finally:
+        # Releases the stream's connection if we stopped early
+        batches.close()
+
+
+# ======================================================================
+#                                  UI
+# ======================================================================
+
+def open_export(parent, name, database=db):
+    """Ask where to save, then run the export with a progress dialog"""
+    title = EXPORTS[name][0]
+    filetypes = [("CSV file", "*.csv")]
+    if Workbook is not None:
+        filetypes.append(("Excel workbook", "*.xlsx"))
+
+    path = filedialog.asksaveasfilename(
+        parent=parent,
+        title=f"Export {title}",
+        defaultextension=".csv",
+        initialfile=f"{name}_{date.today():%Y%m%d}.csv",
+        filetypes=filetypes
+    )
+    if not path:
+        return None
+
+    if path.lower().endswith(".xlsx") and Workbook is None:
+        messagebox.showerror("Export", "XLSX export needs openpyxl (pip install openpyxl).", parent=parent)
+        return None
+
+    return ExportDialog(parent, database, name, path)
+
+
+class ExportDialog:
+    """Runs one export on a worker thread; shows progress and can cancel it"""
+
+    def __init__(self, parent, database, name, path):
+        self.parent = parent
+        self.path = path
+        self.cancel_event = threading.Event()
+        self.messages = queue.Queue()
+
+        self.window = tk.Toplevel(parent)
+        self.window.title(f"Exporting {EXPORTS[name][0]}")
+        self.window.geometry("380x130")
+        self.window.resizable(False, False)
+        self.window.transient(parent)
+        self.window.protocol("WM_DELETE_WINDOW", self.cancel)
+
+        tk.Label(self.window, text=os.path.basename(path), font=("Arial", 10, "bold")).pack(pady=(15, 5))
+        self.progress_label = tk.Label(self.window, text="Starting...", font=("Arial", 10))
+        self.progress_label.pack()
+
+        self.cancel_btn = tk.Button(self.window, text="Cancel", width=12, bg="#e74c3c", fg="white",
+                                    command=self.cancel)
+        self.cancel_btn.pack(pady=12)
+
+        threading.Thread(target=self._worker, args=(database, name, path),
+                         name="export", daemon=True).start()
+        self.window.after(POLL_MS, self._poll)
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.cancel_btn.config(state=tk.DISABLED)
+        self.progress_label.config(text="Cancelling...")
+
+    # ---------------- Worker thread ----------------
+    def _worker(self, database, name, path):
+        try:
+            count = export_table(database, name, path,
+                                 progress=lambda n: self.messages.put(("progress", n)),
+                                 cancel_event=self.cancel_event)
+            self.messages.put(("done", count))
+        except ExportCancelled:
+            self.messages.put(("cancelled", None))
+        except Exception as e:
+            self.messages.put(("error", e))
+
+    # ---------------- Tk thread ----------------
+    def _poll(self):
+        try:
+            if not self.window.winfo_exists():
+                return
+        except tk.TclError:
+            return
+
+        while True:
+            try:
+                kind, value = self.messages.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "progress":
+                if not self.cancel_event.is_set():
+                    self.progress_label.config(text=f"Exported {value:,} rows...")
+                continue
+
+            self.window.destroy()
+            if kind == "done":
+                messagebox.showinfo("Export", f"Exported {value:,} rows to\n{self.path}", parent=self.parent)
+            elif kind == "error":
+                messagebox.showerror("Export Failed", str(value), parent=self.parent)
+            return
+
+        self.window.after(POLL_MS, self._poll)
+
+
+# ======================================================================
+#                                  CLI
+# ======================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a library table to CSV or XLSX.")
+    parser.add_argument("table", choices=sorted(EXPORTS))
+    parser.add_argument("path", help="output file, .csv or .xlsx")
+    args = parser.parse_args(argv)
+
+    try:
+        count = export_table(db, args.table, args.path,
+                             progress=lambda n: print(f"\r{n:,} rows", end="", flush=True))
+    except KeyboardInterrupt:
+        print("\nExport cancelled.")
+        return 1
+    except Exception as e:
+        print("\nEXPORT ERROR:", e)
+        return 1
+    finally:
+        db.close()
+
+    print(f"\nExported {count:,} rows to {args.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
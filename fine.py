@@ -1,9 +1,19 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from database import db
-from reportlab.pdfgen import canvas
-from datetime import datetime
+from mysql.connector import Error
+from tree_sync import TreeSync
+from table_loader import TableLoader
+from exporter import open_export
+from ledger import fetch_ledger, get_balance, students_owing
+from fine_accrual import STILL_ACCRUING
+from receipts import RECEIPTS_DIR, ReceiptsCancelled, fetch_receipt_rows, generate_batch
 import os
+import queue
+import threading
+
+
+FINE_UPDATE_CHUNK = 1000   # fine IDs per UPDATE ... IN (...)
 
 
 class FineManagementWindow:
@@ -20,6 +30,13 @@ class FineManagementWindow:
         self.build_table()
         self.build_actions()
 
+        # Big result sets are inserted in batches between Tk events
+        self.loader = TableLoader(self.tree)
+
+        # Refresh only re-reads rows changed since the last load
+        self.sync = TreeSync(self.tree, "fines", self.fetch_changed_fines,
+                             self.fine_values, insert_at=0)
+
         self.load_fines()
 
     # ================= HEADER =================
@@ -64,18 +81,19 @@ class FineManagementWindow:
 
         self.tree = ttk.Treeview(
             table_frame,
-            columns=("fine_id", "transaction_id", "amount", "calc_date",
+            columns=("fine_id", "transaction_id", "student", "amount", "calc_date",
                      "paid_date", "status"),
             show="headings",
+            selectmode="extended",   # ctrl/shift-click for bulk actions
             height=20
         )
         self.tree.pack(fill=tk.BOTH, expand=True)
 
-        headers = ["Fine ID", "Transaction ID", "Amount",
+        headers = ["Fine ID", "Transaction ID", "Student", "Amount",
                    "Calculated", "Paid", "Status"]
         for c, t in zip(self.tree["columns"], headers):
             self.tree.heading(c, text=t)
-            self.tree.column(c, width=150, anchor=tk.CENTER)
+            self.tree.column(c, width=135, anchor=tk.CENTER)
 
     # ================= ACTION BUTTONS =================
     def build_actions(self):
@@ -88,114 +106,377 @@ class FineManagementWindow:
         tk.Button(actions, text="Waive Fine", bg="#e67e22", fg="white",
                   width=15, command=self.waive_fine).pack(side=tk.LEFT, padx=5)
 
-        tk.Button(actions, text="Generate Receipt", bg="#2980b9", fg="white",
+        tk.Button(actions, text="Generate Receipts", bg="#2980b9", fg="white",
                   width=18, command=self.generate_receipt).pack(side=tk.LEFT, padx=5)
 
+        tk.Button(actions, text="Student Ledger", bg="#34495e", fg="white",
+                  width=15, command=self.open_ledger).pack(side=tk.LEFT, padx=5)
+
+        tk.Button(actions, text="Refresh", bg="#1abc9c", fg="white",
+                  width=12, command=self.refresh_fines).pack(side=tk.LEFT, padx=5)
+
+        tk.Button(actions, text="Export", bg="#8e44ad", fg="white",
+                  width=12, command=lambda: open_export(self.root, "fines")).pack(side=tk.LEFT, padx=5)
+
     # ================= LOAD FINES =================
+    FINES_QUERY = """
+        SELECT f.fine_id, f.transaction_id, bt.student_id,
+               CONCAT(s.first_name, ' ', s.last_name) AS student, f.fine_amount,
+               f.calculated_date, f.paid_date, f.payment_status
+        FROM fines f
+        LEFT JOIN borrow_transactions bt ON bt.transaction_id = f.transaction_id
+        LEFT JOIN students s ON s.student_id = bt.student_id
+    """
+
+    def fine_values(self, r):
+        return (
+            r["fine_id"],
+            r["transaction_id"],
+            r["student"] or "",
+            f"₱{r['fine_amount']}",
+            r["calculated_date"],
+            r["paid_date"] if r["paid_date"] else "",
+            r["payment_status"]
+        )
+
     def load_fines(self):
         self.tree.delete(*self.tree.get_children())
 
-        rows = db.execute_query("""
-            SELECT fine_id, transaction_id, fine_amount,
-                   calculated_date, paid_date, payment_status
-            FROM fines
-            ORDER BY fine_id DESC
-        """)
+        self.sync.start()
+        rows = db.execute_query(self.FINES_QUERY + " ORDER BY f.fine_id DESC")
 
         if not rows:
-            return
+            return self.loader.cancel()
 
-        for r in rows:
-            self.tree.insert("", tk.END, values=(
-                r["fine_id"],
-                r["transaction_id"],
-                f"₱{r['fine_amount']}",
-                r["calculated_date"],
-                r["paid_date"] if r["paid_date"] else "",
-                r["payment_status"]
-            ))
+        # Inserted in batches so the window stays responsive
+        self.loader.load(rows, self.insert_fine)
+
+    def insert_fine(self, r, idx):
+        self.tree.insert("", tk.END, iid=r["fine_id"], values=self.fine_values(r))
+
+    def fetch_changed_fines(self, since):
+        return db.fetch(self.FINES_QUERY + " WHERE f.updated_at >= %s", (since,))
+
+    def refresh_fines(self):
+        """Patch only the rows changed since the last load"""
+        if self.loader.busy or self.sync.refresh() is None:
+            self.load_fines()
+
+    def refresh_rows(self, fine_ids):
+        """Re-read just these fines and patch their rows in place"""
+        for i in range(0, len(fine_ids), FINE_UPDATE_CHUNK):
+            chunk = fine_ids[i:i + FINE_UPDATE_CHUNK]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            rows = db.execute_query(self.FINES_QUERY + f" WHERE f.fine_id IN ({placeholders})", chunk) or []
+
+            for r in rows:
+                if self.tree.exists(str(r["fine_id"])):
+                    self.tree.item(str(r["fine_id"]), values=self.fine_values(r))
 
     # ================= HELPERS =================
-    def get_selected(self):
+    def get_selected_ids(self):
         sel = self.tree.selection()
         if not sel:
-            messagebox.showwarning("Select Fine", "Please select a fine.")
-            return None
-        return self.tree.item(sel)["values"]
+            messagebox.showwarning("Select Fine", "Please select at least one fine.")
+            return []
+        return [int(iid) for iid in sel]
+
+    def update_fines(self, fine_ids, set_clause, skip_status):
+        """One UPDATE per chunk of IDs, all in one transaction. Returns rows changed.
+
+        Fines still accruing on a book that is out are left alone.
+        """
+        changed = 0
+        with db.transaction() as tx:
+            for i in range(0, len(fine_ids), FINE_UPDATE_CHUNK):
+                chunk = fine_ids[i:i + FINE_UPDATE_CHUNK]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                changed += tx.execute_query(f"""
+                    UPDATE fines
+                    SET {set_clause}
+                    WHERE fine_id IN ({placeholders}) AND payment_status <> %s
+                      AND NOT {STILL_ACCRUING}
+                """, (*chunk, skip_status))
+        return changed
+
+    def bulk_action(self, set_clause, new_status, done_message):
+        fine_ids = self.get_selected_ids()
+        if not fine_ids:
+            return
 
-    # ================= ACTIONS =================
-    def mark_paid(self):
-        values = self.get_selected()
-        if not values:
+        if len(fine_ids) > 1 and not messagebox.askyesno(
+                "Confirm", f"Set {len(fine_ids)} selected fines to {new_status}?"):
             return
-        fine_id = values[0]
 
-        db.execute_query("""
-            UPDATE fines
-            SET payment_status='Paid', paid_date=CURDATE()
-            WHERE fine_id=%s
-        """, (fine_id,))
+        try:
+            changed = self.update_fines(fine_ids, set_clause, new_status)
+        except Error as e:
+            return messagebox.showerror("Database Error", f"No fines were changed:\n{e}")
 
-        messagebox.showinfo("Success", "Fine marked as PAID.")
-        self.load_fines()
+        self.refresh_rows(fine_ids)
 
-    def waive_fine(self):
-        values = self.get_selected()
-        if not values:
-            return
-        fine_id = values[0]
+        if len(fine_ids) == 1 and changed:
+            messagebox.showinfo("Success", done_message)
+        elif len(fine_ids) == 1:
+            messagebox.showwarning("Not Changed", f"This fine is already {new_status}, or its book is "
+                                                  "still out and the fine is still accruing.")
+        else:
+            skipped = len(fine_ids) - changed
+            note = (f"\n{skipped} skipped: already {new_status}, or the book is still out."
+                    if skipped else "")
+            messagebox.showinfo("Success", f"{changed} of {len(fine_ids)} fines set to {new_status}.{note}")
 
-        db.execute_query("""
-            UPDATE fines
-            SET payment_status='Waived', paid_date=NULL
-            WHERE fine_id=%s
-        """, (fine_id,))
+    # ================= ACTIONS =================
+    def mark_paid(self):
+        self.bulk_action("payment_status='Paid', paid_date=CURDATE()", "Paid",
+                         "Fine marked as PAID.")
 
-        messagebox.showinfo("Success", "Fine has been waived.")
-        self.load_fines()
+    def waive_fine(self):
+        self.bulk_action("payment_status='Waived', paid_date=NULL", "Waived",
+                         "Fine has been waived.")
 
-    # ================= PDF RECEIPT =================
+    # ================= STUDENT LEDGER =================
+    def open_ledger(self):
+        """Ledger of the selected fine's student, or the list of students who owe"""
+        student_id = None
+        sel = self.tree.selection()
+        if sel:
+            rows = db.execute_query(
+                "SELECT bt.student_id FROM fines f "
+                "JOIN borrow_transactions bt ON bt.transaction_id = f.transaction_id "
+                "WHERE f.fine_id=%s", (sel[0],)
+            )
+            if rows:
+                student_id = rows[0]["student_id"]
+
+        StudentLedgerDialog(self.root, student_id)
+
+    # ================= PDF RECEIPTS =================
     def generate_receipt(self):
-        values = self.get_selected()
-        if not values:
-            return
-
-        fine_id, trans_id, amount, calc_date, paid_date, status = values
-
-        save_dir = "D:/IT5_Screenshots/Receipts"
-        os.makedirs(save_dir, exist_ok=True)
+        """Receipts for the selected fines, or every fine with a status"""
+        ReceiptBatchDialog(self.root, self.tree.selection())
 
-        file_path = f"{save_dir}/fine_receipt_{fine_id}.pdf"
+    # ================= BACK BUTTON =================
+    def go_back(self):
+        self.root.destroy()
+        self.dashboard_root.deiconify()
 
-        c = canvas.Canvas(file_path)
-        c.setFont("Helvetica", 12)
 
-        y = 800
-        c.drawString(50, y, "Library Management System - Fine Receipt")
-        y -= 40
+class StudentLedgerDialog:
+    """Students who owe (left) and one student's fines and balance (right)"""
+
+    def __init__(self, parent, student_id=None):
+        self.window = tk.Toplevel(parent)
+        self.window.title("Student Ledger")
+        self.window.geometry("1000x500")
+        self.window.transient(parent)
+
+        # ---- Students with a balance ----
+        left = tk.Frame(self.window, padx=10, pady=10)
+        left.pack(side=tk.LEFT, fill=tk.Y)
+
+        tk.Label(left, text="Outstanding Balances", font=("Arial", 11, "bold")).pack(anchor="w")
+        self.owing = ttk.Treeview(left, columns=("student", "balance", "unpaid"), show="headings",
+                                  selectmode="browse", height=18)
+        for col, text, width in (("student", "Student", 170), ("balance", "Balance", 90), ("unpaid", "Unpaid", 60)):
+            self.owing.heading(col, text=text)
+            self.owing.column(col, width=width, anchor=tk.W if col == "student" else tk.CENTER)
+        self.owing.pack(fill=tk.Y, expand=True)
+        self.owing.bind("<<TreeviewSelect>>", self.on_student_selected)
+
+        # ---- One student's fines ----
+        right = tk.Frame(self.window, padx=10, pady=10)
+        right.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.balance_label = tk.Label(right, text="Select a student", font=("Arial", 12, "bold"), anchor="w")
+        self.balance_label.pack(fill=tk.X)
+
+        columns = ("fine_id", "book", "due", "returned", "amount", "status", "paid")
+        headers = ("Fine ID", "Book", "Due", "Returned", "Amount", "Status", "Paid")
+        self.ledger = ttk.Treeview(right, columns=columns, show="headings")
+        for col, text in zip(columns, headers):
+            self.ledger.heading(col, text=text)
+            self.ledger.column(col, width=180 if col == "book" else 80, anchor=tk.CENTER)
+        self.ledger.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
+
+        self.load_owing()
+        if student_id is not None:
+            self.show_student(student_id)
+
+    def load_owing(self):
+        try:
+            rows = students_owing(db)
+        except Error as e:
+            return messagebox.showerror("Database Error", str(e), parent=self.window)
+
+        self.owing.delete(*self.owing.get_children())
+        for r in rows:
+            self.owing.insert("", tk.END, iid=r["student_id"],
+                              values=(r["student"], f"₱{r['outstanding']}", r["unpaid_fines"]))
+
+    def on_student_selected(self, event=None):
+        sel = self.owing.selection()
+        if sel:
+            self.show_student(int(sel[0]))
+
+    def show_student(self, student_id):
+        try:
+            balance = get_balance(db, student_id)
+            fines = fetch_ledger(db, student_id)
+            names = db.fetch("SELECT CONCAT(first_name, ' ', last_name) AS name FROM students WHERE student_id=%s",
+                             (student_id,))
+        except Error as e:
+            return messagebox.showerror("Database Error", str(e), parent=self.window)
+
+        name = names[0]["name"] if names else f"Student {student_id}"
+        self.balance_label.config(
+            text=f"{name}  —  Outstanding: ₱{balance['outstanding']}  ({balance['unpaid_fines']} unpaid)"
+        )
 
-        c.drawString(50, y, f"Receipt Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        y -= 30
+        self.ledger.delete(*self.ledger.get_children())
+        for f in fines:
+            self.ledger.insert("", tk.END, values=(
+                f["fine_id"], f["book"] or "", f["due_date"], f["return_date"] or "",
+                f"₱{f['fine_amount']}", f["payment_status"], f["paid_date"] or ""
+            ))
 
-        c.drawString(50, y, f"Fine ID: {fine_id}")
-        y -= 25
-        c.drawString(50, y, f"Transaction ID: {trans_id}")
-        y -= 25
-        c.drawString(50, y, f"Fine Amount: {amount}")
-        y -= 25
-        c.drawString(50, y, f"Calculated Date: {calc_date}")
-        y -= 25
-        c.drawString(50, y, f"Paid Date: {paid_date if paid_date else 'Not Paid'}")
-        y -= 25
-        c.drawString(50, y, f"Status: {status}")
 
-        y -= 40
-        c.drawString(50, y, "Thank you!")
-        c.save()
+class ReceiptBatchDialog:
+    """Choose fines, layout and folder, then render the PDFs off the UI thread"""
+
+    POLL_MS = 100
+
+    def __init__(self, parent, selected):
+        self.parent = parent
+        self.selected = list(selected)
+        self.cancel_event = threading.Event()
+        self.messages = queue.Queue()
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("Generate Receipts")
+        self.window.geometry("460x330")
+        self.window.resizable(False, False)
+        self.window.transient(parent)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.scope = tk.StringVar(value="selected" if self.selected else "status")
+        self.status = tk.StringVar(value="Paid")
+        self.layout = tk.StringVar(value="combined")
+        self.output_dir = tk.StringVar(value=RECEIPTS_DIR)
+
+        body = tk.Frame(self.window, padx=20, pady=15)
+        body.pack(fill=tk.BOTH, expand=True)
+
+        tk.Label(body, text="Fines", font=("Arial", 10, "bold")).pack(anchor="w")
+        tk.Radiobutton(body, text=f"Selected fines ({len(self.selected)})", variable=self.scope,
+                       value="selected", state=tk.NORMAL if self.selected else tk.DISABLED).pack(anchor="w")
+        status_row = tk.Frame(body)
+        status_row.pack(anchor="w")
+        tk.Radiobutton(status_row, text="All fines with status", variable=self.scope,
+                       value="status").pack(side=tk.LEFT)
+        ttk.Combobox(status_row, textvariable=self.status, values=("Paid", "Unpaid", "Waived", "All"),
+                     state="readonly", width=10).pack(side=tk.LEFT, padx=5)
+
+        tk.Label(body, text="Layout", font=("Arial", 10, "bold")).pack(anchor="w", pady=(10, 0))
+        tk.Radiobutton(body, text="One PDF, a receipt per page", variable=self.layout,
+                       value="combined").pack(anchor="w")
+        tk.Radiobutton(body, text="One statement per student", variable=self.layout,
+                       value="per_student").pack(anchor="w")
+
+        tk.Label(body, text="Save to", font=("Arial", 10, "bold")).pack(anchor="w", pady=(10, 0))
+        folder_row = tk.Frame(body)
+        folder_row.pack(fill=tk.X)
+        tk.Entry(folder_row, textvariable=self.output_dir).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        tk.Button(folder_row, text="Browse...", command=self.browse).pack(side=tk.LEFT, padx=(5, 0))
+
+        self.progress_label = tk.Label(body, text="", fg="#7f8c8d")
+        self.progress_label.pack(anchor="w", pady=(10, 0))
+
+        self.action_btn = tk.Button(body, text="Generate", width=14, bg="#2980b9", fg="white",
+                                    command=self.start)
+        self.action_btn.pack(pady=5)
+
+    def browse(self):
+        folder = filedialog.askdirectory(parent=self.window, initialdir=self.output_dir.get())
+        if folder:
+            self.output_dir.set(folder)
+
+    def start(self):
+        output_dir = self.output_dir.get().strip()
+        if not output_dir:
+            return messagebox.showwarning("Generate Receipts", "Choose a folder to save to.", parent=self.window)
+
+        if self.scope.get() == "selected":
+            fine_ids, status = self.selected, None
+        else:
+            fine_ids, status = None, None if self.status.get() == "All" else self.status.get()
+
+        self.action_btn.config(text="Cancel", bg="#e74c3c", command=self.cancel)
+        self.progress_label.config(text="Fetching fines...")
+
+        threading.Thread(target=self._worker,
+                         args=(fine_ids, status, self.layout.get() == "per_student", output_dir),
+                         name="receipts", daemon=True).start()
+        self.window.after(self.POLL_MS, self._poll)
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.action_btn.config(state=tk.DISABLED)
+        self.progress_label.config(text="Cancelling...")
+
+    def close(self):
+        self.cancel_event.set()
+        self.window.destroy()
+
+    # ---------------- Worker thread ----------------
+    def _worker(self, fine_ids, status, per_student, output_dir):
+        try:
+            fines = fetch_receipt_rows(db, fine_ids, status)
+            if not fines:
+                return self.messages.put(("done", []))
+
+            self.messages.put(("progress", (0, None)))
+            paths = generate_batch(fines, output_dir, per_student,
+                                   progress=lambda done, total: self.messages.put(("progress", (done, total))),
+                                   cancel_event=self.cancel_event)
+            self.messages.put(("done", paths))
+        except ReceiptsCancelled:
+            self.messages.put(("cancelled", None))
+        except Exception as e:
+            self.messages.put(("error", e))
+
+    # ---------------- Tk thread ----------------
+    def _poll(self):
+        try:
+            if not self.window.winfo_exists():
+                return
+        except tk.TclError:
+            return
 
-        messagebox.showinfo("Receipt Saved", f"PDF saved to:\n{file_path}")
+        while True:
+            try:
+                kind, value = self.messages.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "progress":
+                done, total = value
+                if not self.cancel_event.is_set():
+                    self.progress_label.config(
+                        text="Rendering..." if total is None else f"Rendered {done} of {total} fine(s)..."
+                    )
+                continue
+
+            self.window.destroy()
+            if kind == "done":
+                if value:
+                    messagebox.showinfo("Receipts Saved",
+                                        f"{len(value)} PDF file(s) saved to:\n{os.path.dirname(value[0])}",
+                                        parent=self.parent)
+                else:
+                    messagebox.showinfo("Generate Receipts", "No fines matched.", parent=self.parent)
+            elif kind == "error":
+                messagebox.showerror("Receipts Failed", str(value), parent=self.parent)
+            return
 
-    # ================= BACK BUTTON =================
-    def go_back(self):
-        self.root.destroy()
-        self.dashboard_root.deiconify()
+        self.window.after(self.POLL_MS, self._poll)
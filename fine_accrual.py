@@ -0,0 +1,152 @@
+"""
+Nightly fine accrual - keeps an Unpaid fine on every overdue loan
+
+One INSERT ... SELECT ... ON DUPLICATE KEY UPDATE per batch of loans,
+keyed on the unique fines.transaction_id, so running it again the same
+day changes nothing and running it the next day just moves each fine to
+the new days-late amount. Lost books keep their flat lost-book fine.
+returns.return_loans finalizes the amount on the day the book comes back.
+Without that unique key (its migration waits while a loan has two fines)
+every upsert would add another fine, so both refuse to run until it exists.
+
+A loan has a single fine, so a fine cannot be paid or waived while it is
+still accruing (book out, not lost): its amount is only final on return
+or loss. Paid and waived fines are therefore never touched by accrual.
+"""
+import threading
+from datetime import datetime
+
+from mysql.connector import Error
+
+FINE_PER_DAY = 5           # ₱ per day late
+LOST_BOOK_FINE = 300       # ₱, flat, replaces the accrued late fine
+ACCRUAL_BATCH_SIZE = 1000  # transaction IDs per statement
+FINE_KEY = "uq_fines_transaction"
+
+# Unpaid fines follow the days-late count; paid or waived ones are left alone.
+# calculated_date stays the day the fine first accrued.
+UPSERT_FINE = """
+    ON DUPLICATE KEY UPDATE
+        fine_amount = IF(payment_status = 'Unpaid', VALUES(fine_amount), fine_amount)
+"""
+
+OPEN_OVERDUE = """
+    return_date IS NULL AND NOT (status <=> 'Lost') AND due_date < CURDATE()
+"""
+
+# Fines that may not be paid or waived yet (for UPDATE fines ... WHERE NOT ...)
+STILL_ACCRUING = """
+    EXISTS (SELECT 1 FROM borrow_transactions bt
+            WHERE bt.transaction_id = fines.transaction_id
+              AND bt.return_date IS NULL AND NOT (bt.status <=> 'Lost'))
+"""
+
+
+class FineKeyMissing(Error):
+    """fines.transaction_id is not unique yet, so fines cannot be upserted"""
+
+
+_fine_key_found = False
+
+
+def require_fine_key(tx):
+    """Raise FineKeyMissing unless the unique fines.transaction_id key exists"""
+    global _fine_key_found
+    if _fine_key_found:
+        return
+
+    if not tx.execute_query_one("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'fines' AND INDEX_NAME = %s
+        LIMIT 1
+    """, (FINE_KEY,)):
+        raise FineKeyMissing(msg=(
+            "Fines cannot be recorded yet: some loans have more than one fine, so the "
+            "'unique fine per transaction' migration is waiting. Merge the duplicate "
+            "fines listed at startup and restart the application."
+        ))
+    _fine_key_found = True
+
+
+class LostBookError(Exception):
+    """Loss refused (loan closed, fine already settled); nothing was written"""
+
+
+def charge_lost_book(tx, transaction_id):
+    """Inside a loss's transaction: record the flat lost-book fine. Returns it.
+
+    It replaces the accrued Unpaid late fine. A loan has one fine, so a
+    late fine already paid or waived (settled before fines were blocked
+    on open loans) cannot take the charge without erasing the payment:
+    the loss is refused with LostBookError instead.
+    """
+    require_fine_key(tx)
+
+    loan = tx.execute_query_one(
+        "SELECT return_date, status FROM borrow_transactions WHERE transaction_id=%s FOR UPDATE",
+        (transaction_id,)
+    )
+    if not loan or loan["return_date"] is not None or loan["status"] == "Lost":
+        raise LostBookError("This loan is no longer open.")
+
+    fine = tx.execute_query_one(
+        "SELECT payment_status FROM fines WHERE transaction_id=%s FOR UPDATE", (transaction_id,)
+    )
+    if fine and fine["payment_status"] != "Unpaid":
+        raise LostBookError(
+            f"This loan's late fine is already {fine['payment_status'] or 'settled'}.\n"
+            "The lost-book fine cannot replace it without erasing that record."
+        )
+
+    tx.execute_query("""
+        INSERT INTO fines(transaction_id, fine_amount, calculated_date, payment_status)
+        VALUES (%s, %s, CURDATE(), 'Unpaid')
+        ON DUPLICATE KEY UPDATE
+            fine_amount = VALUES(fine_amount), calculated_date = VALUES(calculated_date)
+    """, (transaction_id, LOST_BOOK_FINE))
+    return LOST_BOOK_FINE
+
+
+class FineAccrual:
+    def __init__(self, batch_size=ACCRUAL_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.last_run = None
+        self.last_count = 0
+        self._lock = threading.Lock()
+
+    def run(self, database):
+        """Accrue fines on every overdue loan still out.
+
+        Returns MySQL's affected-row count: 1 per new fine, 2 per fine whose amount changed.
+        """
+        with self._lock:
+            with database.transaction() as tx:
+                require_fine_key(tx)
+
+            bounds = database.fetch(
+                f"SELECT MIN(transaction_id) AS low, MAX(transaction_id) AS high "
+                f"FROM borrow_transactions WHERE {OPEN_OVERDUE}"
+            )
+            low, high = bounds[0]["low"], bounds[0]["high"]
+
+            count = 0
+            if low is not None:
+                # ID ranges keep each statement (and its locks) small
+                for start in range(low, high + 1, self.batch_size):
+                    with database.transaction() as tx:
+                        count += tx.execute_query(f"""
+                            INSERT INTO fines(transaction_id, fine_amount, calculated_date, payment_status)
+                            SELECT transaction_id, DATEDIFF(CURDATE(), due_date) * %s, CURDATE(), 'Unpaid'
+                            FROM borrow_transactions
+                            WHERE transaction_id >= %s AND transaction_id < %s
+                              AND {OPEN_OVERDUE}
+                        """ + UPSERT_FINE, (FINE_PER_DAY, start, start + self.batch_size))
+
+            self.last_run = datetime.now()
+            self.last_count = count
+            print(f"Fine accrual: {count} row(s) affected")
+            return count
+
+
+# Shared accrual instance
+fine_accrual = FineAccrual()
@@ -0,0 +1,78 @@
+"""
+Background maintenance jobs run by the scheduler
+"""
+from mysql.connector import errorcode, Error
+
+from fine_accrual import fine_accrual
+from ledger import reconcile_balances
+from overdue import overdue_sweep
+from reminders import REMINDER_DAYS, run_reminder_campaign
+from rollups import run_rollups
+from scheduler import JobScheduler
+
+# Job intervals, in seconds
+OVERDUE_INTERVAL = 60 * 60
+FINE_ACCRUAL_INTERVAL = 24 * 60 * 60
+RESERVATION_EXPIRY_INTERVAL = 10 * 60
+REMINDER_INTERVAL = 24 * 60 * 60
+STATS_RECONCILE_INTERVAL = 24 * 60 * 60
+ROLLUP_INTERVAL = 6 * 60 * 60    # a no-op until a new day has finished
+JOB_JITTER = 60
+
+
+def sweep_overdue(database):
+    return overdue_sweep.run(database)
+
+
+def accrue_fines(database):
+    return fine_accrual.run(database)
+
+
+def expire_reservations(database):
+    """Cancel every Active reservation past its expiry in one statement"""
+    with database.transaction() as tx:
+        return tx.execute_query("""
+            UPDATE reservations
+            SET status='Cancelled'
+            WHERE status='Active' AND expires_at < NOW()
+        """)
+
+
+def send_due_reminders(database, days=REMINDER_DAYS):
+    """Queue a digest email for every student with an active loan due in the next `days` days"""
+    return run_reminder_campaign(database, days)
+
+
+def reconcile_stats(database):
+    """Recompute student balances in case anything bypassed the triggers"""
+    try:
+        return reconcile_balances(database)
+    except Error as e:
+        # Not migrated yet: readers compute live instead
+        if e.errno != errorcode.ER_NO_SUCH_TABLE:
+            raise
+        return 0
+
+
+def roll_up_days(database):
+    """Fold every finished day since the last run into the trend rollups"""
+    return run_rollups(database)
+
+
+def build_scheduler(overdue_interval=OVERDUE_INTERVAL,
+                    fine_interval=FINE_ACCRUAL_INTERVAL,
+                    reservation_interval=RESERVATION_EXPIRY_INTERVAL,
+                    reminder_interval=REMINDER_INTERVAL,
+                    stats_interval=STATS_RECONCILE_INTERVAL,
+                    rollup_interval=ROLLUP_INTERVAL,
+                    jitter=JOB_JITTER,
+                    database=None):
+    """Scheduler with the standard maintenance jobs registered (not started)"""
+    scheduler = JobScheduler(database)
+    scheduler.add_job("overdue_sweep", sweep_overdue, overdue_interval, jitter)
+    scheduler.add_job("fine_accrual", accrue_fines, fine_interval, jitter)
+    scheduler.add_job("reservation_expiry", expire_reservations, reservation_interval, jitter)
+    scheduler.add_job("due_reminders", send_due_reminders, reminder_interval, jitter)
+    scheduler.add_job("stats_reconcile", reconcile_stats, stats_interval, jitter)
+    scheduler.add_job("daily_rollup", roll_up_days, rollup_interval, jitter)
+    return scheduler
@@ -0,0 +1,91 @@
+"""
+Per-student fine ledger
+
+`student_balances` holds one row per student with their outstanding
+(Unpaid) total and the number of unpaid fines. MySQL triggers on `fines`
+keep it current on every insert, payment, waiver or accrual (see
+migrations.py), so looking up what a student owes is a primary-key read
+instead of a fines -> borrow_transactions aggregate. Where the table does
+not exist yet, the same numbers are computed for that one student from
+the indexed join.
+"""
+from mysql.connector import errorcode, Error
+
+# Every student's balance from scratch (seeding, nightly drift repair)
+REBUILD_BALANCES_QUERY = """
+    INSERT INTO student_balances(student_id, outstanding, unpaid_fines)
+    SELECT bt.student_id,
+           SUM(IF(f.payment_status = 'Unpaid', COALESCE(f.fine_amount, 0), 0)),
+           SUM(f.payment_status = 'Unpaid')
+    FROM fines f
+    JOIN borrow_transactions bt ON bt.transaction_id = f.transaction_id
+    GROUP BY bt.student_id
+    ON DUPLICATE KEY UPDATE outstanding = VALUES(outstanding), unpaid_fines = VALUES(unpaid_fines)
+"""
+
+LIVE_BALANCE_QUERY = """
+    SELECT COALESCE(SUM(IF(f.payment_status = 'Unpaid', f.fine_amount, 0)), 0) AS outstanding,
+           COALESCE(SUM(f.payment_status = 'Unpaid'), 0) AS unpaid_fines
+    FROM borrow_transactions bt
+    JOIN fines f ON f.transaction_id = bt.transaction_id
+    WHERE bt.student_id = %s
+"""
+
+LEDGER_QUERY = """
+    SELECT f.fine_id, f.transaction_id, b.title AS book, bt.borrow_date, bt.due_date,
+           bt.return_date, f.fine_amount, f.calculated_date, f.paid_date, f.payment_status
+    FROM borrow_transactions bt
+    JOIN fines f ON f.transaction_id = bt.transaction_id
+    LEFT JOIN books b ON b.book_id = bt.book_id
+    WHERE bt.student_id = %s
+    ORDER BY f.fine_id DESC
+"""
+
+
+def reconcile_balances(database):
+    """Recompute every balance from the fines table. Returns the affected-row count."""
+    with database.transaction() as tx:
+        tx.execute_query("UPDATE student_balances SET outstanding = 0, unpaid_fines = 0")
+        return tx.execute_query(REBUILD_BALANCES_QUERY)
+
+
+def get_balance(database, student_id):
+    """{"outstanding": amount, "unpaid_fines": count} for one student. Raises on database errors."""
+    try:
+        rows = database.fetch(
+            "SELECT outstanding, unpaid_fines FROM student_balances WHERE student_id=%s",
+            (student_id,)
+        )
+    except Error as e:
+        if e.errno != errorcode.ER_NO_SUCH_TABLE:
+            raise
+        rows = database.fetch(LIVE_BALANCE_QUERY, (student_id,))
+
+    if not rows:
+        return {"outstanding": 0, "unpaid_fines": 0}
+    return {"outstanding": rows[0]["outstanding"], "unpaid_fines": int(rows[0]["unpaid_fines"])}
+
+
+def students_owing(database, limit=None):
+    """Students with an outstanding balance, largest first"""
+    query = """
+        SELECT sb.student_id, CONCAT(s.first_name, ' ', s.last_name) AS student,
+               sb.outstanding, sb.unpaid_fines
+        FROM student_balances sb
+        JOIN students s ON s.student_id = sb.student_id
+        WHERE sb.outstanding > 0
+        ORDER BY sb.outstanding DESC, sb.student_id
+    """
+    if limit:
+        return database.fetch(query + " LIMIT %s", (limit,))
+    return database.fetch(query)
+
+
+def count_owing(database):
+    rows = database.fetch("SELECT COUNT(*) AS owing FROM student_balances WHERE outstanding > 0")
+    return rows[0]["owing"]
+
+
+def fetch_ledger(database, student_id):
+    """Every fine of one student, newest first"""
+    return database.fetch(LEDGER_QUERY, (student_id,))
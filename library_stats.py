@@ -0,0 +1,52 @@
+"""
+Summary report statistics
+
+The six headline numbers come back in one round trip: a single query of
+scalar subqueries over indexed columns, cached for STATS_TTL seconds.
+There is deliberately no counters table: a row updated by every
+circulation write would serialize the desks on its lock.
+"""
+import threading
+import time
+
+STATS_TTL = 60   # seconds a cached result is served before re-reading
+
+# stat name -> query computing it from the live tables
+STAT_QUERIES = {
+    "total_students": "SELECT COUNT(*) FROM students",
+    "total_books": "SELECT COUNT(*) FROM books",
+    "total_borrowed": "SELECT COUNT(*) FROM borrow_transactions WHERE return_date IS NULL",
+    "total_reservations": "SELECT COUNT(*) FROM reservations WHERE status = 'Active'",
+    "fines_collected": "SELECT COALESCE(SUM(fine_amount), 0) FROM fines WHERE payment_status = 'Paid'",
+    "fines_pending": "SELECT COALESCE(SUM(fine_amount), 0) FROM fines WHERE payment_status = 'Unpaid'",
+}
+
+LIVE_STATS_QUERY = "SELECT " + ",\n       ".join(
+    f"({query}) AS {name}" for name, query in STAT_QUERIES.items()
+)
+
+
+class LibraryStats:
+    def __init__(self, database, ttl=STATS_TTL):
+        self.db = database
+        self.ttl = ttl
+
+        self._cached = None
+        self._cached_at = 0
+        self._lock = threading.Lock()
+
+    def get(self, force=False):
+        """All six metrics as a dict, from the cache when fresh. Raises on database errors."""
+        with self._lock:
+            if not force and self._cached is not None \
+                    and time.monotonic() - self._cached_at < self.ttl:
+                return dict(self._cached)
+
+            rows = self.db.fetch(LIVE_STATS_QUERY)
+            self._cached = {name: rows[0][name] for name in STAT_QUERIES}
+            self._cached_at = time.monotonic()
+            return dict(self._cached)
+
+    def invalidate(self):
+        with self._lock:
+            self._cached = None
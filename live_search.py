@@ -0,0 +1,123 @@
+"""
+Debounced search-as-you-type
+
+Watches a StringVar, waits until typing pauses, runs the query on a worker
+thread and hands the rows back on the Tk thread via root.after(). Results
+of queries that were superseded by newer keystrokes are discarded.
+
+The query function runs off the UI thread, so it must not touch widgets
+or show message boxes (use db.fetch, which raises, not db.execute_query).
+"""
+import queue
+import threading
+import tkinter as tk
+
+DEBOUNCE_MS = 300
+POLL_MS = 30
+
+
+class LiveSearch:
+    def __init__(self, root, variable, query, on_results, on_clear=None, on_error=None,
+                 delay=DEBOUNCE_MS):
+        self.root = root
+        self.variable = variable
+        self.query = query              # query(term) -> result, runs on a worker thread
+        self.on_results = on_results    # on_results(term, result), Tk thread
+        self.on_clear = on_clear        # on_clear(), Tk thread, when the box is emptied
+        self.on_error = on_error        # on_error(term, exception), Tk thread
+        self.delay = delay
+
+        self._after_id = None
+        self._generation = 0
+        self._pending = None
+        self._running = False
+        self._polling = False
+        self._lock = threading.Lock()
+        self._results = queue.Queue()
+
+        variable.trace_add("write", self._on_change)
+
+    # ---------------- Tk thread ----------------
+    def _on_change(self, *args):
+        try:
+            if self._after_id:
+                self.root.after_cancel(self._after_id)
+            self._after_id = self.root.after(self.delay, self.search_now)
+        except tk.TclError:
+            pass    # window already closed
+
+    def search_now(self):
+        """Run the current term immediately (e.g. from a Search button)"""
+        if self._after_id:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+        term = self.variable.get().strip()
+
+        with self._lock:
+            self._generation += 1
+            self._pending = (self._generation, term) if term else None
+
+            if self._pending and not self._running:
+                self._running = True
+                threading.Thread(target=self._worker, name="live-search", daemon=True).start()
+
+        if not term:
+            if self.on_clear:
+                self.on_clear()
+            return
+
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_MS, self._poll)
+
+    def _poll(self):
+        try:
+            if not self.root.winfo_exists():
+                return
+        except tk.TclError:
+            return
+
+        while True:
+            try:
+                generation, term, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+            if generation != self._generation:
+                continue    # superseded by newer typing
+
+            if error is not None:
+                if self.on_error:
+                    self.on_error(term, error)
+                else:
+                    print("LIVE SEARCH ERROR:", error)
+            else:
+                self.on_results(term, result)
+
+        with self._lock:
+            busy = self._running or self._pending is not None
+
+        if busy or not self._results.empty():
+            self.root.after(POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+    # ---------------- Worker thread ----------------
+    def _worker(self):
+        while True:
+            with self._lock:
+                job, self._pending = self._pending, None
+                if job is None:
+                    self._running = False
+                    return
+
+                # Skip work already superseded before it started
+                if job[0] != self._generation:
+                    continue
+
+            generation, term = job
+            try:
+                self._results.put((generation, term, self.query(term), None))
+            except Exception as e:
+                self._results.put((generation, term, None, e))
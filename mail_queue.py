@@ -0,0 +1,219 @@
+"""
+Queued outbound email
+
+Callers enqueue a message and return immediately. A worker thread drains
+the queue through EmailSender; the queue lives in a local SQLite spool so
+unsent mail survives a crash, failed sends are retried with exponential
+backoff (a message the server permanently refused is failed at once), and
+a token bucket keeps delivery under the provider's rate limit.
+"""
+import sqlite3
+import threading
+import time
+
+from email_sender import EmailSender, FAILED, REFUSED, SENT
+
+SPOOL_PATH = "mail_spool.db"
+MAX_ATTEMPTS = 6
+RETRY_BASE_DELAY = 30         # seconds; doubles on every failed attempt
+RETRY_MAX_DELAY = 60 * 60
+EMAILS_PER_MINUTE = 20        # provider's per-minute sending limit
+EMAIL_BURST = 5
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate_per_minute` tokens, up to `burst` saved"""
+
+    def __init__(self, rate_per_minute=EMAILS_PER_MINUTE, burst=EMAIL_BURST):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until one token is available, then take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class MailQueue:
+    def __init__(self, sender=None, spool_path=SPOOL_PATH,
+                 max_attempts=MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                 bucket=None):
+        self.sender = sender or EmailSender()
+        self.bucket = bucket or TokenBucket()
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+        self._spool = sqlite3.connect(spool_path, check_same_thread=False)
+        self._spool.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                to_email TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                body TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'Pending',
+                last_error TEXT
+            )
+        """)
+        self._spool.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt)")
+        self._spool.commit()
+
+        # Counters
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.last_latency = None
+        self.total_latency = 0.0
+
+    # ---------------- Public API ----------------
+    def enqueue(self, to_email, subject, body):
+        """Spool a message for delivery; never blocks on the network"""
+        with self._lock:
+            self._spool.execute(
+                "INSERT INTO outbox(to_email, subject, body, next_attempt) VALUES (?, ?, ?, ?)",
+                (to_email, subject, body, time.time())
+            )
+            self._spool.commit()
+
+        self.start()
+        self._wake.set()
+        return True
+
+    def enqueue_many(self, messages):
+        """Spool [(to_email, subject, body), ...] in one commit. Returns how many were queued."""
+        if not messages:
+            return 0
+
+        now = time.time()
+        with self._lock:
+            self._spool.executemany(
+                "INSERT INTO outbox(to_email, subject, body, next_attempt) VALUES (?, ?, ?, ?)",
+                [(to_email, subject, body, now) for to_email, subject, body in messages]
+            )
+            self._spool.commit()
+
+        self.start()
+        self._wake.set()
+        return len(messages)
+
+    def depth(self):
+        """Messages still waiting to be sent"""
+        with self._lock:
+            return self._spool.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status='Pending'"
+            ).fetchone()[0]
+
+    def stats(self):
+        return {
+            "depth": self.depth(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "last_latency": self.last_latency,
+            "avg_latency": self.total_latency / self.sent if self.sent else None,
+        }
+
+    # ---------------- Lifecycle ----------------
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._loop, name="mail-queue", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stopping = True
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.sender.close()
+
+    # ---------------- Worker ----------------
+    def _next_message(self):
+        with self._lock:
+            return self._spool.execute("""
+                SELECT id, to_email, subject, body, attempts, next_attempt
+                FROM outbox
+                WHERE status='Pending'
+                ORDER BY next_attempt, id
+                LIMIT 1
+            """).fetchone()
+
+    def _loop(self):
+        while not self._stopping:
+            row = self._next_message()
+
+            if row is None:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            msg_id, to_email, subject, body, attempts, next_attempt = row
+            wait = next_attempt - time.time()
+            if wait > 0:
+                # Sleep until the retry is due, or until something new arrives
+                self._wake.wait(wait)
+                self._wake.clear()
+                continue
+
+            self._deliver(msg_id, to_email, subject, body, attempts)
+
+    def _deliver(self, msg_id, to_email, subject, body, attempts):
+        self.bucket.acquire()
+
+        started = time.monotonic()
+        try:
+            result = self.sender.send_email(to_email, subject, body)
+            error = None if result == SENT else f"send_email: {result}"
+        except Exception as e:
+            result, error = FAILED, str(e)
+
+        with self._lock:
+            if result == SENT:
+                self._spool.execute("DELETE FROM outbox WHERE id=?", (msg_id,))
+                self.sent += 1
+                self.last_latency = time.monotonic() - started
+                self.total_latency += self.last_latency
+
+            elif result == REFUSED or attempts + 1 >= self.max_attempts:
+                # A permanent refusal fails at once: resending would only be refused again
+                self._spool.execute(
+                    "UPDATE outbox SET status='Failed', attempts=?, last_error=? WHERE id=?",
+                    (attempts + 1, error, msg_id)
+                )
+                self.failed += 1
+                print(f"❌ Giving up on email to {to_email} after {attempts + 1} attempts")
+
+            else:
+                delay = min(self.base_delay * (2 ** attempts), self.max_delay)
+                self._spool.execute(
+                    "UPDATE outbox SET attempts=?, next_attempt=?, last_error=? WHERE id=?",
+                    (attempts + 1, time.time() + delay, error, msg_id)
+                )
+                self.retries += 1
+
+            self._spool.commit()
+
+
+# Shared outbound queue
+outbox = MailQueue()
@@ -1,13 +1,41 @@
 """ Main entry point for Library Management System """
+import multiprocessing
 import tkinter as tk
-from log_in import LoginWindow
 
 def main():
+    # Imported here, not at module level: these connect to MySQL and open the
+    # mail spool on import, and the receipt pool's worker processes re-import
+    # this module (as __mp_main__) under spawn
+    from log_in import LoginWindow
+    from jobs import build_scheduler
+    from mail_queue import outbox
+    from mysql.connector import Error
+    from database import db
+    from migrations import run_migrations
+
+    # Indexes, FULLTEXT, change tracking, job tables (no-op once applied)
+    try:
+        run_migrations(db)
+    except Error as e:
+        print("MIGRATION ERROR:", e)
+
+    # Overdue / reservation-expiry / reminder jobs run in the background
+    scheduler = build_scheduler()
+    scheduler.start()
+
+    # Deliver anything left in the mail spool from the last session
+    outbox.start()
+
     root = tk.Tk()
     app = LoginWindow(root)
     root.mainloop()
 
+    scheduler.stop()
+    outbox.stop()
+
 if __name__ == "__main__":
+    # Receipt statements render in a process pool; needed for the PyInstaller build
+    multiprocessing.freeze_support()
     main()
 
 
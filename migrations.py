@@ -0,0 +1,421 @@
+"""
+Versioned schema migrations
+
+Each migration is a numbered list of idempotent steps (indexes, columns,
+tables, triggers are only created when missing). Applied versions are
+recorded in `schema_migrations`, so a migration runs once per database;
+because MySQL DDL commits implicitly, a migration interrupted halfway is
+simply re-run and skips what already exists. A step that needs data fixed
+by hand first raises MigrationDeferred: its migration stays pending (and
+is retried on the next start) while later ones still run.
+
+Runs against MySQL (the app) or a SQLite stand-in (tests, offline work).
+"""
+from datetime import datetime
+
+from book_search import FULLTEXT_INDEX, FULLTEXT_COLUMNS
+from fine_accrual import FINE_KEY
+from ledger import REBUILD_BALANCES_QUERY
+
+# Tables with change tracking for incremental refresh: table -> primary key
+TRACKED_TABLES = {
+    "students": "student_id",
+    "books": "book_id",
+    "borrow_transactions": "transaction_id",
+    "reservations": "reservation_id",
+    "fines": "fine_id",
+}
+
+
+class MigrationDeferred(Exception):
+    """A migration cannot finish until some data is fixed by hand"""
+
+
+class MigrationRunner:
+    def __init__(self, conn, dialect="mysql"):
+        self.conn = conn
+        self.dialect = dialect
+
+    # ---------------- SQL helpers ----------------
+    def execute(self, sql, params=()):
+        """Run one statement; returns fetched rows (as tuples) for queries, else None"""
+        if self.dialect == "sqlite":
+            sql = sql.replace("%s", "?")
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchall() if cursor.description else None
+        finally:
+            cursor.close()
+
+    def has_column(self, table, column):
+        if self.dialect == "sqlite":
+            return any(row[1] == column for row in self.execute(f"PRAGMA table_info({table})"))
+
+        return bool(self.execute("""
+            SELECT 1 FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """, (table, column)))
+
+    def index_columns(self, table):
+        """{index_name: [columns in order]} for every index on `table`"""
+        if self.dialect == "sqlite":
+            return {
+                row[1]: [info[2] for info in sorted(self.execute(f"PRAGMA index_info({row[1]})"))]
+                for row in self.execute(f"PRAGMA index_list({table})")
+            }
+
+        indexes = {}
+        for name, column in self.execute("""
+            SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            ORDER BY INDEX_NAME, SEQ_IN_INDEX
+        """, (table,)):
+            indexes.setdefault(name, []).append(column)
+        return indexes
+
+    def unique_indexes(self, table):
+        """{index_name: [columns in order]} for the unique indexes (and primary key) on `table`"""
+        if self.dialect == "sqlite":
+            names = {row[1] for row in self.execute(f"PRAGMA index_list({table})") if row[2]}
+        else:
+            names = {row[0] for row in self.execute("""
+                SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND NON_UNIQUE = 0
+            """, (table,))}
+        return {name: columns for name, columns in self.index_columns(table).items() if name in names}
+
+    def has_trigger(self, name):
+        if self.dialect == "sqlite":
+            return bool(self.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name=%s", (name,)
+            ))
+
+        return bool(self.execute("""
+            SELECT 1 FROM information_schema.TRIGGERS
+            WHERE TRIGGER_SCHEMA = DATABASE() AND TRIGGER_NAME = %s
+        """, (name,)))
+
+    def create_index(self, table, name, columns, unique=False):
+        """Create the index unless one already covers `columns` as its leading
+        columns (for a unique index: unless one is already unique on exactly `columns`)"""
+        if unique:
+            existing_indexes = self.unique_indexes(table).values()
+        else:
+            existing_indexes = self.index_columns(table).values()
+
+        for existing in existing_indexes:
+            if existing[:len(columns)] == list(columns) and (not unique or len(existing) == len(columns)):
+                return
+
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        self.execute(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})")
+
+    def drop_index(self, table, name):
+        if name not in self.index_columns(table):
+            return
+        if self.dialect == "sqlite":
+            self.execute(f"DROP INDEX {name}")
+        else:
+            self.execute(f"DROP INDEX {name} ON {table}")
+
+    def add_column(self, table, column, definition):
+        if not self.has_column(table, column):
+            self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    # ---------------- Runner ----------------
+    def applied_versions(self):
+        self.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                name VARCHAR(100) NOT NULL,
+                applied_at DATETIME NOT NULL
+            )
+        """)
+        self.conn.commit()
+        return {row[0] for row in self.execute("SELECT version FROM schema_migrations")}
+
+    def run(self, migrations=None):
+        """Apply every pending migration in version order. Returns the versions applied."""
+        applied = self.applied_versions()
+        newly_applied = []
+
+        for version, name, steps in sorted(migrations or MIGRATIONS, key=lambda m: m[0]):
+            if version in applied:
+                continue
+
+            print(f"Applying migration {version}: {name}")
+            try:
+                for step in steps:
+                    step(self)
+            except MigrationDeferred as e:
+                self.conn.commit()
+                print(f"Migration {version} deferred: {e}")
+                continue
+
+            self.execute(
+                "INSERT INTO schema_migrations(version, name, applied_at) VALUES (%s, %s, %s)",
+                (version, name, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            self.conn.commit()
+            newly_applied.append(version)
+
+        return newly_applied
+
+
+def run_migrations(database):
+    """Bring the MySQL schema up to date on a dedicated connection"""
+    conn = database.connect()
+    try:
+        return MigrationRunner(conn, "mysql").run()
+    finally:
+        conn.close()
+
+
+# ======================================================================
+#                              MIGRATIONS
+# ======================================================================
+
+def hot_path_indexes(m):
+    """Columns every screen filters and joins on"""
+    m.create_index("borrow_transactions", "idx_bt_status_due", ["status", "due_date"])
+    m.create_index("borrow_transactions", "idx_bt_student", ["student_id"])
+    m.create_index("borrow_transactions", "idx_bt_book", ["book_id"])
+    m.create_index("reservations", "idx_res_book_status_date", ["book_id", "status", "reservation_date"])
+    m.create_index("fines", "idx_fines_payment_status", ["payment_status"])
+    m.create_index("fines", "idx_fines_transaction", ["transaction_id"])
+    m.create_index("librarians", "idx_librarians_username", ["username"])
+
+
+def reminder_log(m):
+    m.execute("""
+        CREATE TABLE IF NOT EXISTS reminder_log (
+            transaction_id INT NOT NULL,
+            due_date DATE NOT NULL,
+            sent_at DATETIME NOT NULL,
+            PRIMARY KEY (transaction_id, due_date)
+        )
+    """)
+
+
+def books_search_indexes(m):
+    """FULLTEXT index for search, plus a title index for the short-term
+    fallback `title LIKE 'x%' ORDER BY title` (see book_search)"""
+    m.create_index("books", "idx_books_title", ["title"])
+
+    # SQLite has no FULLTEXT; book_search falls back to its InvertedIndex without it
+    if m.dialect != "mysql":
+        return
+
+    if FULLTEXT_INDEX not in m.index_columns("books"):
+        m.execute(f"ALTER TABLE books ADD FULLTEXT INDEX {FULLTEXT_INDEX} ({', '.join(FULLTEXT_COLUMNS)})")
+
+
+def change_tracking(m):
+    """updated_at on every tracked table + a trigger-fed deletion log (see tree_sync)"""
+    m.execute("""
+        CREATE TABLE IF NOT EXISTS row_deletions (
+            table_name VARCHAR(64) NOT NULL,
+            row_id INT NOT NULL,
+            deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    m.create_index("row_deletions", "idx_row_deletions_lookup", ["table_name", "deleted_at"])
+
+    for table, key in TRACKED_TABLES.items():
+        if m.dialect == "mysql":
+            m.add_column(table, "updated_at",
+                         "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP")
+        else:
+            # SQLite can't ALTER in a CURRENT_TIMESTAMP default or ON UPDATE; use triggers
+            m.add_column(table, "updated_at", "TIMESTAMP")
+            touch = f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP WHERE {key} = NEW.{key};"
+
+            if not m.has_trigger(f"trg_{table}_touch_insert"):
+                m.execute(f"""
+                    CREATE TRIGGER trg_{table}_touch_insert AFTER INSERT ON {table}
+                    BEGIN {touch} END
+                """)
+            if not m.has_trigger(f"trg_{table}_touch_update"):
+                m.execute(f"""
+                    CREATE TRIGGER trg_{table}_touch_update AFTER UPDATE ON {table}
+                    WHEN NEW.updated_at IS OLD.updated_at
+                    BEGIN {touch} END
+                """)
+
+        m.create_index(table, f"idx_{table}_updated_at", ["updated_at"])
+
+        trigger = f"trg_{table}_log_delete"
+        if not m.has_trigger(trigger):
+            body = f"INSERT INTO row_deletions(table_name, row_id) VALUES ('{table}', OLD.{key})"
+            if m.dialect == "mysql":
+                m.execute(f"CREATE TRIGGER {trigger} AFTER DELETE ON {table} FOR EACH ROW {body}")
+            else:
+                m.execute(f"CREATE TRIGGER {trigger} AFTER DELETE ON {table} BEGIN {body}; END")
+
+
+def daily_rollups(m):
+    """Rollup tables for trend reporting (see rollups) + the date columns they scan"""
+    m.execute("""
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            day DATE NOT NULL,
+            category VARCHAR(100) NOT NULL,
+            loans INT NOT NULL DEFAULT 0,
+            returned INT NOT NULL DEFAULT 0,
+            overdue INT NOT NULL DEFAULT 0,
+            reservations INT NOT NULL DEFAULT 0,
+            fines_count INT NOT NULL DEFAULT 0,
+            fines_amount DECIMAL(12, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, category)
+        )
+    """)
+    m.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            rollup_name VARCHAR(50) PRIMARY KEY,
+            last_day DATE NOT NULL
+        )
+    """)
+
+    m.create_index("borrow_transactions", "idx_bt_borrow_date", ["borrow_date"])
+    m.create_index("borrow_transactions", "idx_bt_return_date", ["return_date"])
+    m.create_index("borrow_transactions", "idx_bt_due_date", ["due_date"])
+    m.create_index("reservations", "idx_res_reservation_date", ["reservation_date"])
+    m.create_index("fines", "idx_fines_calculated_date", ["calculated_date"])
+
+
+def unique_fine_per_transaction(m):
+    """fines.transaction_id becomes the accrual upsert key (see fine_accrual).
+
+    Loans that already have several fines are reported and the migration
+    waits until they are merged; fine accrual and returns refuse to write
+    fines until then.
+    """
+    if FINE_KEY in m.index_columns("fines"):
+        return
+
+    duplicates = m.execute("""
+        SELECT transaction_id, COUNT(*) FROM fines
+        WHERE transaction_id IS NOT NULL
+        GROUP BY transaction_id HAVING COUNT(*) > 1
+        ORDER BY transaction_id
+    """)
+    if duplicates:
+        listing = ", ".join(f"{transaction_id} ({count} fines)" for transaction_id, count in duplicates[:20])
+        raise MigrationDeferred(
+            f"{len(duplicates)} loan(s) have more than one fine, by transaction ID: {listing}. "
+            f"Merge them into one fine per loan; the unique key is created on the next start."
+        )
+
+    m.execute(f"CREATE UNIQUE INDEX {FINE_KEY} ON fines (transaction_id)")
+    m.drop_index("fines", "idx_fines_transaction")
+
+
+def student_balance_change(row, sign):
+    """Upsert adding (sign=+1) or removing (-1) one fine row's share of its student's balance"""
+    op = "" if sign > 0 else "-"
+    return f"""
+        INSERT INTO student_balances(student_id, outstanding, unpaid_fines)
+        SELECT student_id,
+               {op}IF({row}.payment_status <=> 'Unpaid', COALESCE({row}.fine_amount, 0), 0),
+               {op}({row}.payment_status <=> 'Unpaid')
+        FROM borrow_transactions WHERE transaction_id = {row}.transaction_id
+        ON DUPLICATE KEY UPDATE
+            outstanding = outstanding + VALUES(outstanding),
+            unpaid_fines = unpaid_fines + VALUES(unpaid_fines)
+    """
+
+
+def student_balances(m):
+    """Trigger-maintained outstanding balance per student (see ledger); MySQL only"""
+    if m.dialect != "mysql":
+        return
+
+    m.execute("""
+        CREATE TABLE IF NOT EXISTS student_balances (
+            student_id INT PRIMARY KEY,
+            outstanding DECIMAL(12, 2) NOT NULL DEFAULT 0,
+            unpaid_fines INT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+    m.create_index("student_balances", "idx_student_balances_outstanding", ["outstanding"])
+
+    triggers = {
+        "trg_fines_balance_insert": ("INSERT", student_balance_change("NEW", +1)),
+        "trg_fines_balance_delete": ("DELETE", student_balance_change("OLD", -1)),
+        "trg_fines_balance_update": ("UPDATE", f"""BEGIN
+            {student_balance_change("OLD", -1)};
+            {student_balance_change("NEW", +1)};
+        END"""),
+    }
+    for name, (event, body) in triggers.items():
+        if not m.has_trigger(name):
+            m.execute(f"CREATE TRIGGER {name} AFTER {event} ON fines FOR EACH ROW {body}")
+
+    m.execute(REBUILD_BALANCES_QUERY)
+
+
+# SQL twin of book_search.normalize_isbn's clean-up (no dashes or spaces, upper-case X)
+ISBN_NORMALIZED = "UPPER(REPLACE(REPLACE(TRIM(isbn), '-', ''), ' ', ''))"
+
+
+def unique_isbn(m):
+    """Scan checkout resolves books by ISBN (see checkout).
+
+    Stored ISBNs are normalized so scans match them, blanks become NULL,
+    and ISBNs shared by several books are reported (the migration waits
+    until they are fixed) before the unique index is created.
+    """
+    if m.dialect == "mysql":
+        column = m.execute("""
+            SELECT IS_NULLABLE, COLUMN_TYPE FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'books' AND COLUMN_NAME = 'isbn'
+        """)
+        if column and column[0][0] == "NO":
+            m.execute(f"ALTER TABLE books MODIFY isbn {column[0][1]} NULL")
+
+    m.execute(f"UPDATE books SET isbn = {ISBN_NORMALIZED} WHERE isbn <> {ISBN_NORMALIZED}")
+    m.execute("UPDATE books SET isbn = NULL WHERE isbn = ''")
+
+    duplicates = m.execute("""
+        SELECT isbn, COUNT(*) FROM books
+        WHERE isbn IS NOT NULL
+        GROUP BY isbn HAVING COUNT(*) > 1
+        ORDER BY isbn
+    """)
+    if duplicates:
+        listing = ", ".join(f"{isbn} ({count} books)" for isbn, count in duplicates[:20])
+        raise MigrationDeferred(
+            f"{len(duplicates)} ISBN(s) belong to more than one book: {listing}. "
+            f"Correct them in Book Management; the unique ISBN index is created on the next start."
+        )
+
+    m.create_index("books", "uq_books_isbn", ["isbn"], unique=True)
+
+
+def job_runs(m):
+    """Last run of every scheduler job, shared by all desks (see scheduler)"""
+    m.execute("""
+        CREATE TABLE IF NOT EXISTS job_runs (
+            job_name VARCHAR(50) PRIMARY KEY,
+            last_run DATETIME NULL,
+            rows_affected INT NULL,
+            duration DECIMAL(10, 3) NULL,
+            last_error VARCHAR(500) NULL
+        )
+    """)
+
+
+# (version, name, steps) — append only; never renumber a shipped migration
+MIGRATIONS = [
+    (1, "hot path indexes", [hot_path_indexes]),
+    (2, "reminder log", [reminder_log]),
+    (3, "books search indexes", [books_search_indexes]),
+    (4, "change tracking", [change_tracking]),
+    (5, "daily rollups", [daily_rollups]),
+    (6, "unique fine per transaction", [unique_fine_per_transaction]),
+    (7, "student balances", [student_balances]),
+    (8, "unique isbn", [unique_isbn]),
+    (9, "job runs", [job_runs]),
+]
@@ -0,0 +1,52 @@
+"""
+Overdue sweep - flips every late loan to 'Overdue' in one statement
+"""
+import threading
+from datetime import datetime
+
+from mysql.connector import Error
+from database import db
+
+
+class OverdueSweep:
+    def __init__(self, database=db):
+        self.db = database
+        self.last_run = None
+        self.last_count = 0
+        self._lock = threading.Lock()
+
+    def run(self, database=None):
+        """Mark all late Active loans as Overdue now. Returns rows changed."""
+        database = database or self.db
+
+        with self._lock:
+            with database.transaction() as tx:
+                count = tx.execute_query("""
+                    UPDATE borrow_transactions
+                    SET status='Overdue'
+                    WHERE status='Active' AND due_date < CURDATE()
+                """)
+
+            self.last_run = datetime.now()
+            self.last_count = count
+            print(f"Overdue sweep: {count} loan(s) marked overdue")
+            return count
+
+    def is_due(self):
+        """True if the sweep has not run yet today"""
+        return self.last_run is None or self.last_run.date() < datetime.now().date()
+
+    def run_if_due(self):
+        """Run at most once per calendar day; never raises"""
+        if not self.is_due():
+            return 0
+
+        try:
+            return self.run()
+        except Error as e:
+            print("OVERDUE SWEEP ERROR:", e)
+            return 0
+
+
+# Shared sweep instance
+overdue_sweep = OverdueSweep()
@@ -0,0 +1,271 @@
+"""
+Batch PDF receipts and statements
+
+Fines are fetched once, then rendered either as one multi-page PDF (a
+receipt per page) or as one statement per student. Every page of a file
+is drawn by the same ReceiptTemplate on a single canvas, so fonts and
+layout are set up once per document rather than once per fine. A combined
+PDF is rendered in the calling thread (the receipts dialog's worker
+thread), checking for cancellation before every page; statements are
+spread across a process pool (reportlab is pure Python, so threads would
+share one core).
+
+This module is imported by the pool's worker processes, so it must not
+import the database or Tk at module level (see main.py for the same rule).
+"""
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+RECEIPTS_DIR = os.environ.get(
+    "LIBRARY_RECEIPTS_DIR",
+    os.path.join(os.path.expanduser("~"), "Library Receipts")
+)
+RECEIPT_WORKERS = max(1, min(4, os.cpu_count() or 1))
+FETCH_CHUNK = 1000     # fine IDs per IN (...) lookup
+
+RECEIPT_QUERY = """
+    SELECT f.fine_id, f.transaction_id, f.fine_amount, f.calculated_date,
+           f.paid_date, f.payment_status, bt.student_id,
+           CONCAT(s.first_name, ' ', s.last_name) AS student,
+           b.title AS book, bt.borrow_date, bt.due_date, bt.return_date
+    FROM fines f
+    LEFT JOIN borrow_transactions bt ON bt.transaction_id = f.transaction_id
+    LEFT JOIN students s ON s.student_id = bt.student_id
+    LEFT JOIN books b ON b.book_id = bt.book_id
+"""
+
+
+class ReceiptsCancelled(Exception):
+    pass
+
+
+def fetch_receipt_rows(database, fine_ids=None, status=None):
+    """Fines to print: the given IDs, or every fine with `status` (all if None)"""
+    if fine_ids is not None:
+        fine_ids = sorted({int(f) for f in fine_ids})
+        rows = []
+        for i in range(0, len(fine_ids), FETCH_CHUNK):
+            chunk = fine_ids[i:i + FETCH_CHUNK]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            rows += database.fetch(RECEIPT_QUERY + f" WHERE f.fine_id IN ({placeholders})", chunk)
+    elif status:
+        rows = database.fetch(RECEIPT_QUERY + " WHERE f.payment_status=%s", (status,))
+    else:
+        rows = database.fetch(RECEIPT_QUERY)
+
+    return sorted(rows, key=lambda r: (r["student"] or "", r["fine_id"]))
+
+
+# ======================================================================
+#                               TEMPLATE
+# ======================================================================
+
+class ReceiptTemplate:
+    """Page layout shared by receipts and statements; one instance draws a whole document"""
+
+    PAGE_SIZE = A4
+    MARGIN = 50
+    LINE = 22
+    TITLE = "Library Management System"
+
+    # Statement table: (heading, fine key, x offset from the left margin)
+    STATEMENT_COLUMNS = [
+        ("Fine ID", "fine_id", 0),
+        ("Book", "book", 55),
+        ("Due", "due_date", 265),
+        ("Returned", "return_date", 335),
+        ("Status", "payment_status", 405),
+    ]
+
+    def __init__(self, c, generated_at):
+        self.c = c
+        self.width, self.height = self.PAGE_SIZE
+        self.generated = generated_at.strftime("%Y-%m-%d %H:%M:%S")
+        self.y = None
+
+    # ---------------- Page furniture ----------------
+    def new_page(self, heading):
+        if self.y is not None:
+            self.c.showPage()
+
+        c = self.c
+        top = self.height - self.MARGIN
+
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(self.MARGIN, top, self.TITLE)
+        c.setFont("Helvetica", 9)
+        c.drawRightString(self.width - self.MARGIN, top, f"Generated: {self.generated}")
+        c.line(self.MARGIN, top - 10, self.width - self.MARGIN, top - 10)
+
+        c.setFont("Helvetica-Bold", 13)
+        c.drawString(self.MARGIN, top - 40, heading)
+
+        c.setFont("Helvetica", 11)
+        self.y = top - 75
+
+    def text(self, label, value):
+        self.c.drawString(self.MARGIN, self.y, f"{label}:")
+        self.c.drawString(self.MARGIN + 130, self.y, str(value))
+        self.y -= self.LINE
+
+    def room_for(self, lines):
+        return self.y - lines * self.LINE >= self.MARGIN
+
+    # ---------------- Documents ----------------
+    def receipt(self, fine):
+        self.new_page("Fine Receipt")
+
+        self.text("Fine ID", fine["fine_id"])
+        self.text("Transaction ID", fine["transaction_id"])
+        self.text("Student", fine["student"] or "-")
+        self.text("Book", fine["book"] or "-")
+        self.text("Fine Amount", money(fine["fine_amount"]))
+        self.text("Calculated Date", fine["calculated_date"])
+        self.text("Paid Date", fine["paid_date"] if fine["paid_date"] else "Not Paid")
+        self.text("Status", fine["payment_status"])
+
+        self.y -= self.LINE
+        self.c.drawString(self.MARGIN, self.y, "Thank you!")
+
+    def statement(self, student, fines):
+        heading = f"Fine Statement - {student or 'Unknown student'}"
+        self.new_page(heading)
+        self.statement_header()
+
+        outstanding = 0
+        for fine in fines:
+            if not self.room_for(3):
+                self.new_page(heading + " (continued)")
+                self.statement_header()
+
+            for _, key, x in self.STATEMENT_COLUMNS:
+                value = fine[key] if fine[key] is not None else "-"
+                if key == "book":
+                    value = str(value)[:38]
+                self.c.drawString(self.MARGIN + x, self.y, str(value))
+            self.c.drawRightString(self.width - self.MARGIN, self.y, money(fine["fine_amount"]))
+            self.y -= self.LINE
+
+            if fine["payment_status"] == "Unpaid":
+                outstanding += fine["fine_amount"] or 0
+
+        self.y -= self.LINE / 2
+        self.c.setFont("Helvetica-Bold", 11)
+        self.c.drawString(self.MARGIN, self.y, "Outstanding balance")
+        self.c.drawRightString(self.width - self.MARGIN, self.y, money(outstanding))
+        self.c.setFont("Helvetica", 11)
+
+    def statement_header(self):
+        c = self.c
+        c.setFont("Helvetica-Bold", 10)
+        for title, _, x in self.STATEMENT_COLUMNS:
+            c.drawString(self.MARGIN + x, self.y, title)
+        c.drawRightString(self.width - self.MARGIN, self.y, "Amount")
+        c.line(self.MARGIN, self.y - 5, self.width - self.MARGIN, self.y - 5)
+        c.setFont("Helvetica", 10)
+        self.y -= self.LINE
+
+
+def money(amount):
+    # Standard Type 1 fonts have no peso sign
+    return f"PHP {amount or 0:,.2f}"
+
+
+# ======================================================================
+#              RENDERING (render_statement runs in worker processes)
+# ======================================================================
+
+def render_receipts(path, fines, generated_at, page_done=None):
+    c = canvas.Canvas(path, pagesize=ReceiptTemplate.PAGE_SIZE)
+    template = ReceiptTemplate(c, generated_at)
+    for fine in fines:
+        template.receipt(fine)
+        if page_done:
+            page_done()
+    c.save()
+    return path
+
+
+def render_statement(path, student, fines, generated_at):
+    c = canvas.Canvas(path, pagesize=ReceiptTemplate.PAGE_SIZE)
+    ReceiptTemplate(c, generated_at).statement(student, fines)
+    c.save()
+    return path
+
+
+def safe_filename(text):
+    return re.sub(r"[^A-Za-z0-9]+", "_", str(text or "")).strip("_") or "unknown"
+
+
+def generate_batch(fines, output_dir=RECEIPTS_DIR, per_student=False, workers=RECEIPT_WORKERS,
+                   progress=None, cancel_event=None):
+    """Render `fines` (rows from fetch_receipt_rows) into PDFs under `output_dir`.
+
+    One multi-page PDF, or one statement per student when `per_student`
+    (rendered by up to `workers` processes). progress(done, total) is
+    called as fines are rendered; setting `cancel_event` stops the batch
+    with ReceiptsCancelled: a combined PDF before its next page (the file
+    is never written), statements as soon as the running ones finish.
+    Returns the paths written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    generated_at = datetime.now()
+    stamp = generated_at.strftime("%Y%m%d_%H%M%S")
+    done = 0
+
+    def page_done(count=1):
+        nonlocal done
+        if cancel_event is not None and cancel_event.is_set():
+            raise ReceiptsCancelled()
+        done += count
+        if progress:
+            progress(done, len(fines))
+
+    if not per_student:
+        if len(fines) == 1:
+            name = f"fine_receipt_{fines[0]['fine_id']}.pdf"
+        else:
+            name = f"fine_receipts_{stamp}.pdf"
+        return [render_receipts(os.path.join(output_dir, name), fines, generated_at, page_done)]
+
+    by_student = {}
+    for fine in fines:
+        by_student.setdefault(fine["student_id"], []).append(fine)
+
+    jobs = []
+    for student_id, student_fines in by_student.items():
+        student = student_fines[0]["student"]
+        name = f"statement_{student_id}_{safe_filename(student)}_{stamp}.pdf"
+        jobs.append((os.path.join(output_dir, name), student, student_fines))
+
+    written = []
+    if len(jobs) == 1 or workers <= 1:
+        # Not worth starting processes for
+        for path, student, student_fines in jobs:
+            page_done(0)
+            written.append(render_statement(path, student, student_fines, generated_at))
+            page_done(len(student_fines))
+        return sorted(written)
+
+    # spawn everywhere: forking a process that runs Tk and the job threads is unsafe
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                               mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = {
+            pool.submit(render_statement, path, student, student_fines, generated_at): len(student_fines)
+            for path, student, student_fines in jobs
+        }
+        for future in as_completed(futures):
+            written.append(future.result())
+            page_done(futures[future])
+    finally:
+        # On cancel or error, drop the statements not started yet
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    return sorted(written)
@@ -0,0 +1,98 @@
+"""
+Due-date reminder campaign
+
+Finds every active loan due in the next few days, groups them into one
+digest email per student and hands them to the outbound mail queue, which
+paces delivery with its token-bucket rate limiter. Each page of loans is
+claimed in `reminder_log` (keyed on transaction and due date) with one
+multi-row INSERT IGNORE inside the page's transaction, and only the loans
+this run actually inserted are queued, after the commit. A rerun, a crash or a
+second desk's scheduler therefore never emails the same loan twice.
+"""
+from itertools import groupby
+from operator import itemgetter
+
+from email_utils import generate_due_digest_email
+from mail_queue import outbox
+
+REMINDER_DAYS = 2
+STUDENTS_PER_PAGE = 200     # students fetched per round trip
+
+
+def claim_due_page(database, after_student_id, days, page_size=STUDENTS_PER_PAGE):
+    """Claim the unsent loans of the next `page_size` students after `after_student_id`.
+
+    The student page is picked in a derived table so every student's loans
+    arrive together, in one round trip. Returns (last student ID on the
+    page or None, loans claimed by this call).
+    """
+    window = "bt.status='Active' AND bt.due_date BETWEEN CURDATE() AND CURDATE() + INTERVAL %s DAY"
+
+    with database.transaction() as tx:
+        rows = tx.execute_query(f"""
+            SELECT bt.transaction_id, bt.student_id, bt.due_date, b.title, s.email,
+                   CONCAT(s.first_name, ' ', s.last_name) AS student_name
+            FROM (
+                SELECT DISTINCT bt.student_id
+                FROM borrow_transactions bt
+                LEFT JOIN reminder_log rl
+                       ON rl.transaction_id = bt.transaction_id AND rl.due_date = bt.due_date
+                WHERE {window} AND rl.transaction_id IS NULL AND bt.student_id > %s
+                ORDER BY bt.student_id
+                LIMIT %s
+            ) page
+            JOIN borrow_transactions bt ON bt.student_id = page.student_id
+            JOIN students s ON s.student_id = bt.student_id
+            JOIN books b ON b.book_id = bt.book_id
+            LEFT JOIN reminder_log rl
+                   ON rl.transaction_id = bt.transaction_id AND rl.due_date = bt.due_date
+            WHERE {window} AND rl.transaction_id IS NULL
+            ORDER BY bt.student_id, bt.due_date
+        """, (days, after_student_id, page_size, days))
+
+        if not rows:
+            return None, []
+
+        # One multi-row claim; if another run got some of these loans first,
+        # undo it and claim them one at a time (rowcount 0 = already claimed)
+        tx.execute_query("SAVEPOINT claim_page")
+        if claim_loans(tx, rows) == len(rows):
+            claimed = rows
+        else:
+            tx.execute_query("ROLLBACK TO SAVEPOINT claim_page")
+            claimed = [loan for loan in rows if claim_loans(tx, [loan]) == 1]
+
+    return rows[-1]["student_id"], claimed
+
+
+def claim_loans(tx, loans):
+    """INSERT IGNORE the loans into reminder_log in one statement. Returns how many were new."""
+    return tx.execute_query(
+        "INSERT IGNORE INTO reminder_log(transaction_id, due_date, sent_at) VALUES "
+        + ", ".join(["(%s, %s, NOW())"] * len(loans)),
+        [value for loan in loans for value in (loan["transaction_id"], loan["due_date"])]
+    )
+
+
+def run_reminder_campaign(database, days=REMINDER_DAYS, queue=None):
+    """Queue one digest per student with loans due soon. Returns digests queued."""
+    queue = queue or outbox
+
+    queued = 0
+    last_student_id = 0
+
+    while True:
+        last_student_id, claimed = claim_due_page(database, last_student_id, days)
+        if last_student_id is None:
+            break
+
+        # Queued only after the claim committed; at worst a crash here skips a digest
+        messages = []
+        for student_id, loans in groupby(claimed, key=itemgetter("student_id")):
+            loans = list(loans)
+            subject, body = generate_due_digest_email(loans[0]["student_name"], loans)
+            messages.append((loans[0]["email"], subject, body))
+
+        queued += queue.enqueue_many(messages)
+
+    return queued
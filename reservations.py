@@ -2,8 +2,17 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime, timedelta
 from database import db
-from email_sender import EmailSender
+from mysql.connector import Error
+from mail_queue import outbox
+from live_search import LiveSearch
+from tree_sync import TreeSync
+from table_loader import TableLoader
+from exporter import open_export
 from email_utils import generate_reservation_email, generate_ready_email
+from checkout import CheckoutError, lock_available_book
+
+# Reservations that can still be turned into a loan
+FULFILLABLE = ("Ready", "Active")
 
 class ReservationWindow:
     def __init__(self, root, user_data, dashboard_root):
@@ -13,9 +22,6 @@ class ReservationWindow:
 
         self.librarian_id = user_data.get("librarian_id") or user_data.get("id")
 
-        # Email handler (safe even if credentials empty)
-        self.mailer = EmailSender()
-
         self.root.title("Book Reservations")
         self.root.geometry("1000x600")
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
@@ -63,7 +69,10 @@ class ReservationWindow:
                   width=18, command=self.create_reservation_dialog).pack(side=tk.LEFT, padx=5)
 
         tk.Button(control, text="🔄 Refresh", bg="#3498db", fg="white",
-                  width=12, command=self.load_reservations).pack(side=tk.LEFT, padx=5)
+                  width=12, command=self.refresh_reservations).pack(side=tk.LEFT, padx=5)
+
+        tk.Button(control, text="📤 Export", bg="#8e44ad", fg="white",
+                  width=12, command=lambda: open_export(self.root, "reservations")).pack(side=tk.LEFT, padx=5)
 
         # Search
         tk.Label(control, text="Search:", bg="#ecf0f1").pack(side=tk.LEFT, padx=10)
@@ -85,6 +94,19 @@ class ReservationWindow:
         self.tree.tag_configure("expired", background="#ffcccc")
         self.tree.tag_configure("ready", background="#fdfd96")
 
+        # Big result sets are inserted in batches between Tk events
+        self.loader = TableLoader(self.tree)
+
+        # Refresh only re-reads rows changed since the last load
+        self.sync = TreeSync(self.tree, "reservations", self.fetch_changed_reservations,
+                             self.reservation_values, self.reservation_tags, insert_at=0)
+
+        # Filter as you type (debounced, matched off the UI thread)
+        self.rows = []
+        self.live_search = LiveSearch(self.root, self.search_var, self.match_rows,
+                                      on_results=self.show_filtered,
+                                      on_clear=self.show_all_rows)
+
         # Action buttons
         actions = tk.Frame(main, bg="#ecf0f1")
         actions.pack(pady=5)
@@ -99,55 +121,85 @@ class ReservationWindow:
                   command=self.cancel_reservation).pack(side=tk.LEFT, padx=5)
 
     # ---------------- Load Reservations ----------------
+    RESERVATIONS_QUERY = """
+        SELECT reservation_id, b.title,
+               CONCAT(s.first_name,' ',s.last_name) AS student,
+               reservation_date, expires_at, r.status
+        FROM reservations r
+        JOIN books b ON r.book_id = b.book_id
+        JOIN students s ON r.student_id = s.student_id
+    """
+
+    def reservation_values(self, r):
+        return (r["reservation_id"], r["title"], r["student"],
+                r["reservation_date"], r["expires_at"], r["status"])
+
+    def reservation_tags(self, r):
+        tag = ""
+
+        # expiry itself is handled by the background scheduler
+        if r["expires_at"] and datetime.strptime(str(r["expires_at"]), "%Y-%m-%d %H:%M:%S") < datetime.now():
+            tag = "expired"
+
+        if r["status"] == "Ready":
+            tag = "ready"
+
+        return (tag,)
+
     def load_reservations(self):
         self.tree.delete(*self.tree.get_children())
 
-        query = """
-            SELECT reservation_id, b.title,
-                   CONCAT(s.first_name,' ',s.last_name) AS student,
-                   reservation_date, expires_at, r.status
-            FROM reservations r
-            JOIN books b ON r.book_id = b.book_id
-            JOIN students s ON r.student_id = s.student_id
-            ORDER BY r.reservation_id DESC
-        """
+        self.sync.start()
+        rows = db.execute_query(self.RESERVATIONS_QUERY + " ORDER BY r.reservation_id DESC") or []
+        self.rows = []
 
-        rows = db.execute_query(query)
-        now = datetime.now()
+        # Inserted in batches so the window stays responsive
+        self.loader.load(rows, self.insert_reservation)
 
-        for r in rows:
-            tag = ""
+    def insert_reservation(self, r, idx):
+        values = self.reservation_values(r)
+        tags = self.reservation_tags(r)
+        self.tree.insert("", tk.END, iid=r["reservation_id"], tags=tags, values=values)
+        self.rows.append((values, tags[0]))
 
-            # auto-expire
-            if r["expires_at"] and datetime.strptime(str(r["expires_at"]), "%Y-%m-%d %H:%M:%S") < now:
-                tag = "expired"
-                if r["status"] == "Active":
-                    db.execute_query("UPDATE reservations SET status='Cancelled' WHERE reservation_id=%s",
-                                     (r["reservation_id"],))
-                    r["status"] = "Cancelled"
+    def fetch_changed_reservations(self, since):
+        return db.fetch(self.RESERVATIONS_QUERY + " WHERE r.updated_at >= %s", (since,))
 
-            if r["status"] == "Ready":
-                tag = "ready"
+    def refresh_reservations(self):
+        """Refresh button / after an action: patch only the rows changed since the last load"""
+        if self.loader.busy or self.sync.refresh() is None:
+            return self.load_reservations()
 
-            self.tree.insert("", tk.END, tags=(tag,),
-                             values=(r["reservation_id"], r["title"], r["student"],
-                                     r["reservation_date"], r["expires_at"], r["status"]))
+        self.rows = []
+        for item in self.tree.get_children():
+            tags = self.tree.item(item, "tags")
+            self.rows.append((tuple(self.tree.item(item, "values")), tags[0] if tags else ""))
 
     # ---------------- Search ----------------
     def search(self):
-        term = self.search_var.get().strip().lower()
-        if not term:
-            return self.load_reservations()
+        """Search button: run the current term now instead of waiting for the debounce"""
+        self.live_search.search_now()
 
-        data = []
-        for item in self.tree.get_children():
-            values = self.tree.item(item)["values"]
-            if term in str(values).lower():
-                data.append(values)
+    def match_rows(self, term):
+        """Runs on the live-search worker thread, over a snapshot of the loaded rows"""
+        term = term.lower()
+        return [row for row in list(self.rows) if term in str(row[0]).lower()]
 
+    def show_filtered(self, term, rows):
+        self.loader.cancel()
         self.tree.delete(*self.tree.get_children())
-        for row in data:
-            self.tree.insert("", "end", values=row)
+
+        # Filtered view: the next Refresh does a full load
+        if term:
+            self.sync.reset()
+
+        for values, tag in rows:
+            self.tree.insert("", "end", iid=values[0], values=values, tags=(tag,))
+
+    def show_all_rows(self):
+        if self.loader.busy:
+            return  # still filling with every row
+        self.show_filtered("", self.rows)
 
     # ---------------- Create Reservation ----------------
     def create_reservation_dialog(self):
@@ -221,17 +273,17 @@ class ReservationWindow:
         """, (book_id, student_id), fetch=False)
 
         if success:
-            # Send email (safe even if config empty)
+            # Queue email (sent in the background)
             student = next(s for s in self.all_students if str(s["student_id"]) == student_id)
             book = next(b for b in self.all_books if str(b["book_id"]) == book_id)
 
             subject, body = generate_reservation_email(student["name"], book["title"])
 
-            self.mailer.send_email(student["email"], subject, body)
+            outbox.enqueue(student["email"], subject, body)
 
             messagebox.showinfo("Success", "Reservation created successfully!")
             dialog.destroy()
-            self.load_reservations()
+            self.refresh_reservations()
         else:
             messagebox.showerror("Error", "Failed to create reservation.")
 
@@ -262,9 +314,9 @@ class ReservationWindow:
         if data:
             student = data[0]
             subject, body = generate_ready_email(student["name"], student["title"])
-            self.mailer.send_email(student["email"], subject, body)
+            outbox.enqueue(student["email"], subject, body)
 
-        self.load_reservations()
+        self.refresh_reservations()
 
     def cancel_reservation(self):
         res_id = self.get_selected()
@@ -273,34 +325,49 @@ class ReservationWindow:
 
         if messagebox.askyesno("Confirm", "Cancel this reservation?"):
             db.execute_query("UPDATE reservations SET status='Cancelled' WHERE reservation_id=%s", (res_id,))
-            self.load_reservations()
+            self.refresh_reservations()
 
     def fulfill_reservation(self):
         res_id = self.get_selected()
         if not res_id:
             return
 
-        reservation = db.execute_query(
-            "SELECT student_id, book_id FROM reservations WHERE reservation_id=%s", (res_id,)
-        )
-        if not reservation:
-            messagebox.showerror("Error", "Reservation not found.")
-            return
-
-        student_id = reservation[0]["student_id"]
-        book_id = reservation[0]["book_id"]
-
         borrow_date = datetime.now().date()
         due_date = borrow_date + timedelta(days=7)
         librarian_id = self.librarian_id
 
-        db.execute_query("""
-            INSERT INTO borrow_transactions(student_id, book_id, librarian_id, borrow_date, due_date, status)
-            VALUES(%s, %s, %s, %s, %s, 'Active')
-        """, (student_id, book_id, librarian_id, borrow_date, due_date))
-
-        db.execute_query("UPDATE books SET quantity = quantity - 1 WHERE book_id = %s", (book_id,))
-        db.execute_query("UPDATE reservations SET status='Fulfilled' WHERE reservation_id=%s", (res_id,))
+        try:
+            with db.transaction() as tx:
+                reservation = tx.execute_query_one(
+                    "SELECT student_id, book_id, status FROM reservations WHERE reservation_id=%s FOR UPDATE",
+                    (res_id,)
+                )
+
+                # A double click or a second desk must not lend the same reservation twice
+                if not reservation:
+                    raise CheckoutError("Reservation not found.")
+                if reservation["status"] not in FULFILLABLE:
+                    raise CheckoutError(f"This reservation is already {reservation['status'] or 'closed'}.")
+
+                student_id = reservation["student_id"]
+                book_id = reservation["book_id"]
+                lock_available_book(tx, book_id=book_id)
+
+                tx.execute_query("""
+                    INSERT INTO borrow_transactions(student_id, book_id, librarian_id, borrow_date, due_date, status)
+                    VALUES(%s, %s, %s, %s, %s, 'Active')
+                """, (student_id, book_id, librarian_id, borrow_date, due_date))
+
+                tx.execute_query("UPDATE books SET quantity = quantity - 1 WHERE book_id = %s", (book_id,))
+                tx.execute_query("UPDATE reservations SET status='Fulfilled' WHERE reservation_id=%s", (res_id,))
+
+        except CheckoutError as e:
+            messagebox.showwarning("Cannot Fulfill", str(e))
+            self.refresh_reservations()
+            return
+        except Error as e:
+            messagebox.showerror("Database Error", f"Could not fulfill reservation:\n{e}")
+            return
 
         messagebox.showinfo("Success", "Book borrowed and reservation fulfilled!")
-        self.load_reservations()
+        self.refresh_reservations()
@@ -1,13 +1,13 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from datetime import datetime
 from database import db
-
-# Correct imports based on FINAL working email_utils.py
-from email_utils import (
-    send_gmail_reminder,
-    send_book_available_notification
-)
+from mysql.connector import Error
+from overdue import overdue_sweep
+from fine_accrual import LostBookError, charge_lost_book
+from live_search import LiveSearch
+from tree_sync import TreeSync
+from table_loader import TableLoader
+from returns import BulkReturnDialog, return_loans
 
 
 class ReturnWindow:
@@ -38,7 +38,7 @@ class ReturnWindow:
         control_frame.pack(fill="x", pady=10)
 
         tk.Button(control_frame, text="Refresh", width=12, bg="#1abc9c", fg="white",
-                  command=self.load_table).pack(side="left", padx=10)
+                  command=self.refresh_table).pack(side="left", padx=10)
 
         self.search_var = tk.StringVar()
         self.search_entry = tk.Entry(control_frame, textvariable=self.search_var, width=35)
@@ -64,6 +64,20 @@ class ReturnWindow:
 
         self.tree.tag_configure("overdue", foreground="red")
 
+        # Big result sets are inserted in batches between Tk events
+        self.loader = TableLoader(self.tree)
+
+        # Refresh only re-reads rows changed since the last load
+        self.sync = TreeSync(self.tree, "borrow_transactions", self.fetch_changed_loans,
+                             self.loan_values, self.loan_tags,
+                             matches=self.is_open_loan, insert_at=0)
+
+        # Filter as you type (debounced, matched off the UI thread)
+        self.rows = []
+        self.live_search = LiveSearch(master, self.search_var, self.match_rows,
+                                      on_results=self.show_filtered,
+                                      on_clear=self.show_all_rows)
+
         # ======== Buttons ========
         bottom_frame = tk.Frame(master, bg="#ecf0f1")
         bottom_frame.pack(fill="x", pady=15)
@@ -71,60 +85,97 @@ class ReturnWindow:
         tk.Button(bottom_frame, text="Return Selected Book", bg="#27ae60", fg="white",
                   width=20, command=self.return_book).pack(side="left", padx=20)
 
+        tk.Button(bottom_frame, text="Bulk Return", bg="#16a085", fg="white",
+                  width=20, command=self.open_bulk_return).pack(side="left", padx=20)
+
         tk.Button(bottom_frame, text="Mark as Lost", bg="#e74c3c", fg="white",
                   width=20, command=self.mark_lost).pack(side="right", padx=20)
 
         self.load_table()
 
     # ========== LOAD TABLE ==========
+    LOANS_QUERY = """
+        SELECT bt.transaction_id, 
+               CONCAT(s.first_name, ' ', s.last_name) AS student,
+               b.title, bt.borrow_date, bt.due_date, 
+               COALESCE(bt.status,'Active') AS status
+        FROM borrow_transactions bt
+        JOIN students s ON bt.student_id = s.student_id
+        JOIN books b ON bt.book_id = b.book_id
+    """
+
+    def loan_values(self, row):
+        return (
+            row["transaction_id"], row["student"], row["title"],
+            row["borrow_date"], row["due_date"], row["status"]
+        )
+
+    def loan_tags(self, row):
+        return ("overdue",) if row["status"].lower() == "overdue" else ("",)
+
+    def is_open_loan(self, row):
+        return row["status"].lower() in ("active", "overdue")
+
     def load_table(self):
         self.tree.delete(*self.tree.get_children())
 
-        query = """
-            SELECT bt.transaction_id, 
-                   CONCAT(s.first_name, ' ', s.last_name) AS student,
-                   b.title, bt.borrow_date, bt.due_date, 
-                   COALESCE(bt.status,'Active') AS status
-            FROM borrow_transactions bt
-            JOIN students s ON bt.student_id = s.student_id
-            JOIN books b ON bt.book_id = b.book_id
+        # Flip late loans once per day in a single UPDATE; the rest is a pure read
+        overdue_sweep.run_if_due()
+
+        self.sync.start()
+        data = db.execute_query(self.LOANS_QUERY + """
             WHERE LOWER(COALESCE(bt.status,'active')) IN ('active','overdue')
             ORDER BY bt.transaction_id DESC
-        """
-
-        data = db.execute_query(query)
+        """) or []
         self.rows = []
 
-        for row in data:
-            overdue = row["due_date"] < datetime.now().date()
+        # Inserted in batches so the window stays responsive
+        self.loader.load(data, self.insert_loan)
 
-            # Auto mark overdue
-            if overdue and row["status"].lower() == "active":
-                db.execute_query(
-                    "UPDATE borrow_transactions SET status='Overdue' WHERE transaction_id=%s",
-                    (row["transaction_id"],)
-                )
-                row["status"] = "Overdue"
+    def insert_loan(self, row, idx):
+        formatted_row = self.loan_values(row)
 
-            tag = "overdue" if row["status"].lower() == "overdue" else ""
+        self.tree.insert("", "end", iid=row["transaction_id"], values=formatted_row,
+                         tags=self.loan_tags(row))
+        self.rows.append(formatted_row)
 
-            formatted_row = (
-                row["transaction_id"], row["student"], row["title"],
-                row["borrow_date"], row["due_date"], row["status"]
-            )
+    def fetch_changed_loans(self, since):
+        return db.fetch(self.LOANS_QUERY + " WHERE bt.updated_at >= %s", (since,))
+
+    def refresh_table(self):
+        """Refresh button / after a return: patch only the rows changed since the last load"""
+        overdue_sweep.run_if_due()
+        if self.loader.busy or self.sync.refresh() is None:
+            return self.load_table()
 
-            self.tree.insert("", "end", values=formatted_row, tags=(tag,))
-            self.rows.append(formatted_row)
+        self.rows = [tuple(self.tree.item(item, "values")) for item in self.tree.get_children()]
 
     # ========== SEARCH ==========
     def filter_table(self):
-        term = self.search_var.get().lower()
+        """Search button: run the current term now instead of waiting for the debounce"""
+        self.live_search.search_now()
+
+    def match_rows(self, term):
+        """Runs on the live-search worker thread, over a snapshot of the loaded rows"""
+        term = term.lower()
+        return [row for row in list(self.rows) if term in str(row).lower()]
+
+    def show_filtered(self, term, rows):
+        self.loader.cancel()
         self.tree.delete(*self.tree.get_children())
 
-        for row in self.rows:
-            if term in str(row).lower():
-                tag = "overdue" if str(row[-1]).lower() == "overdue" else ""
-                self.tree.insert("", "end", values=row, tags=(tag,))
+        # Filtered view: the next Refresh does a full load
+        if term:
+            self.sync.reset()
+
+        for row in rows:
+            tag = "overdue" if str(row[-1]).lower() == "overdue" else ""
+            self.tree.insert("", "end", iid=row[0], values=row, tags=(tag,))
+
+    def show_all_rows(self):
+        if self.loader.busy:
+            return  # still filling with every row
+        self.show_filtered("", self.rows)
 
     # ============================================================
     #                    RETURN BOOK + EMAIL LOGIC
@@ -134,110 +185,41 @@ class ReturnWindow:
         if not selected:
             return messagebox.showwarning("No Selection", "Please select a book to return.")
 
-        values = self.tree.item(selected)["values"]
-        transaction_id, student_name, book_title, _, due_date, status = values
-
-        today = datetime.now().date()
-        due_date_obj = datetime.strptime(str(due_date), "%Y-%m-%d").date()
-
-        # --- Get student email ---
-        student_email = db.execute_query_one(
-            """
-            SELECT s.email 
-            FROM borrow_transactions bt
-            JOIN students s ON bt.student_id = s.student_id
-            WHERE bt.transaction_id=%s
-            """,
-            (transaction_id,)
-        )["email"]
-
-        # ============================================================
-        #                  1. LATE RETURN → FINE + EMAIL
-        # ============================================================
-        if today > due_date_obj:
-            days_late = (today - due_date_obj).days
-            fine_amount = days_late * 5
-
-            existing_fine = db.execute_query_one(
-                "SELECT fine_id FROM fines WHERE transaction_id=%s",
-                (transaction_id,)
-            )
+        transaction_id = self.tree.item(selected)["values"][0]
 
-            if not existing_fine:
-                db.execute_query("""
-                    INSERT INTO fines(transaction_id, fine_amount, calculated_date, payment_status)
-                    VALUES (%s, %s, CURDATE(), 'Unpaid')
-                """, (transaction_id, fine_amount))
-
-                # -------- SEND EMAIL REMINDER --------
-                send_gmail_reminder(student_email, student_name, book_title, due_date)
-
-                messagebox.showinfo(
-                    "Fine Added",
-                    f"Book was returned late.\nDays Late: {days_late}\nFine: ₱{fine_amount:.2f}\n\nEmail reminder sent."
-                )
-
-        # ============================================================
-        #                 2. UPDATE BORROW TRANSACTION
-        # ============================================================
-        db.execute_query("""
-            UPDATE borrow_transactions 
-            SET status='Returned', return_date=CURDATE()
-            WHERE transaction_id=%s
-        """, (transaction_id,))
-
-        # ============================================================
-        #                 3. UPDATE BOOK QUANTITY
-        # ============================================================
-        book = db.execute_query_one("""
-            SELECT b.book_id, b.quantity 
-            FROM borrow_transactions bt
-            JOIN books b ON bt.book_id = b.book_id
-            WHERE bt.transaction_id=%s
-        """, (transaction_id,))
-
-        book_id = book["book_id"]
-
-        db.execute_query(
-            "UPDATE books SET quantity = quantity + 1 WHERE book_id=%s",
-            (book_id,)
-        )
+        # Same set-based path as Bulk Return: fine, close, restock, advance the
+        # reservation queue in one transaction; emails are queued after the commit
+        try:
+            summary = return_loans(db, [str(transaction_id)])
+        except Error as e:
+            return messagebox.showerror("Database Error", f"Return failed, nothing was saved:\n{e}")
 
-        # ============================================================
-        #      4. CHECK RESERVATION QUEUE → EMAIL NEXT STUDENT
-        # ============================================================
-        next_reservation = db.execute_query_one("""
-            SELECT r.reservation_id, r.student_id, s.email, 
-                   CONCAT(s.first_name, ' ', s.last_name) AS student_name
-            FROM reservations r
-            JOIN students s ON r.student_id = s.student_id
-            WHERE r.book_id=%s AND r.status='Pending'
-            ORDER BY r.reservation_date ASC
-            LIMIT 1
-        """, (book_id,))
-
-        if next_reservation:
-            # Mark reservation as "Available"
-            db.execute_query(
-                "UPDATE reservations SET status='Available' WHERE reservation_id=%s",
-                (next_reservation["reservation_id"],)
-            )
+        if not summary["returned"]:
+            # Another desk returned it (or it was marked lost) since this list was loaded
+            self.refresh_table()
+            return messagebox.showwarning("Not Returned", "This loan is no longer open.")
 
-            # Send email
-            send_book_available_notification(
-                next_reservation["email"],
-                next_reservation["student_name"],
-                book_title
+        loan = summary["returned"][0]
+        if loan["fine"]:
+            messagebox.showinfo(
+                "Fine Added",
+                f"Book was returned late.\nDays Late: {loan['days_late']}\nFine: ₱{loan['fine']:.2f}\n\n"
+                f"The student has been emailed."
             )
 
+        for reservation in summary["ready"]:
             messagebox.showinfo(
                 "Reservation Notice",
-                f"The next student in queue has been notified:\n{next_reservation['student_name']}"
+                f"The next student in queue has been notified:\n{reservation['student']}"
             )
 
-        self.load_table()
+        self.refresh_table()
         messagebox.showinfo("Success", "Book successfully returned.")
 
+    # ========== BULK RETURN ==========
+    def open_bulk_return(self):
+        BulkReturnDialog(self.master, db, on_done=lambda count: self.refresh_table())
+
     # ========== MARK LOST ==========
     def mark_lost(self):
         selected = self.tree.selection()
@@ -249,15 +231,20 @@ class ReturnWindow:
         if not messagebox.askyesno("Confirm", "Mark this book as lost?"):
             return
 
-        db.execute_query(
-            "INSERT INTO fines(transaction_id, fine_amount, calculated_date, payment_status) VALUES(%s,300,CURDATE(),'Unpaid')",
-            (transaction_id,)
-        )
+        try:
+            with db.transaction() as tx:
+                # The lost-book fine replaces the Unpaid late fine; a settled one refuses the loss
+                charge_lost_book(tx, transaction_id)
 
-        db.execute_query("UPDATE borrow_transactions SET status='Lost' WHERE transaction_id=%s",
-                         (transaction_id,))
+                tx.execute_query("UPDATE borrow_transactions SET status='Lost' WHERE transaction_id=%s",
+                                 (transaction_id,))
+        except LostBookError as e:
+            self.refresh_table()
+            return messagebox.showwarning("Cannot Mark Lost", str(e))
+        except Error as e:
+            return messagebox.showerror("Database Error", f"Could not mark book as lost:\n{e}")
 
-        self.load_table()
+        self.refresh_table()
         messagebox.showinfo("Recorded", "Book marked as lost.")
 
     # ========== BACK ==========
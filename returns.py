@@ -0,0 +1,307 @@
+"""
+Bulk returns
+
+return_loans() checks in a whole pile of books at once. Scans are
+transaction IDs or ISBNs. Copies of a title share an ISBN, so an ISBN only
+returns loans when it matches no more open loans than were scanned;
+otherwise it is reported as ambiguous, to be scanned by transaction ID.
+The batch is written with a fixed number of statements whatever its size:
+one locking read of the loans, one INSERT ... SELECT for the late fines
+and one read of what they came to, one UPDATE closing the loans, one
+quantity UPDATE for every book, one read and one UPDATE moving the
+reservation queues on, one COMMIT. Fine and pickup emails are spooled in
+a single outbox commit afterwards.
+
+It is the only return path: the Return window's single-row return calls
+it with one transaction ID. BulkReturnDialog is the desk's return
+station: scan everything, press Return All, get a summary.
+"""
+import re
+import tkinter as tk
+from collections import Counter
+from datetime import datetime
+from tkinter import messagebox
+
+from mysql.connector import Error
+
+from book_search import normalize_isbn
+from email_utils import generate_fine_email, generate_ready_email
+from fine_accrual import FINE_PER_DAY, UPSERT_FINE, require_fine_key
+from mail_queue import outbox
+
+SCAN_SEPARATORS = re.compile(r"[,;\r\n]+")
+
+
+def parse_scans(scans):
+    """Split scans into (ISBN counts, transaction IDs, unreadable scans)"""
+    isbns = Counter()
+    transaction_ids = []
+    unreadable = []
+
+    for scan in scans:
+        scan = scan.strip()
+        if not scan:
+            continue
+
+        isbn = normalize_isbn(scan)
+        if isbn:
+            isbns[isbn] += 1
+        elif scan.isdigit():
+            if int(scan) not in transaction_ids:
+                transaction_ids.append(int(scan))
+        else:
+            unreadable.append(scan)
+
+    return isbns, transaction_ids, unreadable
+
+
+def return_loans(database, scans, notify=True):
+    """Return every loan matched by `scans` (ISBNs or transaction IDs) in one transaction.
+
+    Returns a summary dict: "returned" (loan rows, with days_late and the
+    Unpaid fine actually recorded), "fines_total", "ready" (reservations moved to Ready), "unmatched"
+    (scans with no open loan), "ambiguous" (ISBNs on loan to more students
+    than were scanned; nothing returned for them) and "emails" (messages
+    queued). Raises a database Error with nothing saved.
+    """
+    isbns, transaction_ids, unmatched = parse_scans(scans)
+    summary = {"returned": [], "fines_total": 0, "ready": [], "unmatched": unmatched,
+               "ambiguous": [], "emails": 0}
+    if not isbns and not transaction_ids:
+        return summary
+
+    today = datetime.now().date()
+    conditions = []
+    params = []
+    if isbns:
+        conditions.append(f"b.isbn IN ({', '.join(['%s'] * len(isbns))})")
+        params += list(isbns)
+    if transaction_ids:
+        conditions.append(f"bt.transaction_id IN ({', '.join(['%s'] * len(transaction_ids))})")
+        params += transaction_ids
+
+    with database.transaction() as tx:
+        candidates = tx.execute_query(f"""
+            SELECT bt.transaction_id, bt.book_id, b.isbn, b.title, bt.due_date, s.email,
+                   CONCAT(s.first_name, ' ', s.last_name) AS student
+            FROM borrow_transactions bt
+            JOIN books b ON b.book_id = bt.book_id
+            JOIN students s ON s.student_id = bt.student_id
+            WHERE bt.return_date IS NULL AND NOT (bt.status <=> 'Lost')
+              AND ({' OR '.join(conditions)})
+            ORDER BY bt.due_date, bt.transaction_id
+            FOR UPDATE
+        """, params)
+
+        # Transaction IDs name their loan
+        by_id = {loan["transaction_id"]: loan for loan in candidates}
+        picked = {}
+        for transaction_id in transaction_ids:
+            if transaction_id in by_id:
+                picked[transaction_id] = by_id[transaction_id]
+            else:
+                unmatched.append(str(transaction_id))
+
+        # An ISBN names a title, not a copy: never guess whose copy came back
+        for isbn, count in isbns.items():
+            open_loans = [loan for loan in candidates
+                          if loan["isbn"] == isbn and loan["transaction_id"] not in picked]
+            if len(open_loans) > count:
+                summary["ambiguous"].append(isbn)
+                continue
+            for loan in open_loans:
+                picked[loan["transaction_id"]] = loan
+            unmatched += [isbn] * (count - len(open_loans))
+
+        if not picked:
+            return summary
+
+        loans = sorted(picked.values(), key=lambda loan: loan["transaction_id"])
+        ids = [loan["transaction_id"] for loan in loans]
+        placeholders = ", ".join(["%s"] * len(ids))
+
+        for loan in loans:
+            due_date = loan["due_date"]
+            if isinstance(due_date, datetime):
+                due_date = due_date.date()
+            loan["days_late"] = max(0, (today - due_date).days)
+
+        # 1. Late fines at their final amount
+        if any(loan["days_late"] for loan in loans):
+            require_fine_key(tx)
+        tx.execute_query(f"""
+            INSERT INTO fines(transaction_id, fine_amount, calculated_date, payment_status)
+            SELECT transaction_id, DATEDIFF(CURDATE(), due_date) * %s, CURDATE(), 'Unpaid'
+            FROM borrow_transactions
+            WHERE transaction_id IN ({placeholders}) AND due_date < CURDATE()
+        """ + UPSERT_FINE, [FINE_PER_DAY] + ids)
+
+        unpaid = {f["transaction_id"]: f["fine_amount"] for f in tx.execute_query(f"""
+            SELECT transaction_id, fine_amount FROM fines
+            WHERE transaction_id IN ({placeholders}) AND payment_status='Unpaid'
+        """, ids)}
+
+        # 2. Close the loans
+        tx.execute_query(f"""
+            UPDATE borrow_transactions
+            SET status='Returned', return_date=CURDATE()
+            WHERE transaction_id IN ({placeholders})
+        """, ids)
+
+        # 3. Restock every book in one statement
+        copies = Counter(loan["book_id"] for loan in loans)
+        book_ids = sorted(copies)
+        book_placeholders = ", ".join(["%s"] * len(book_ids))
+        cases = " ".join(["WHEN %s THEN %s"] * len(book_ids))
+        tx.execute_query(
+            f"UPDATE books SET quantity = quantity + CASE book_id {cases} END "
+            f"WHERE book_id IN ({book_placeholders})",
+            [value for book_id in book_ids for value in (book_id, copies[book_id])] + book_ids
+        )
+
+        # 4. Next in each queue: one Ready reservation per copy returned
+        ready = []
+        waiting = Counter(copies)
+        for r in tx.execute_query(f"""
+            SELECT r.reservation_id, r.book_id, b.title, s.email,
+                   CONCAT(s.first_name, ' ', s.last_name) AS student
+            FROM reservations r
+            JOIN students s ON s.student_id = r.student_id
+            JOIN books b ON b.book_id = r.book_id
+            WHERE r.book_id IN ({book_placeholders}) AND r.status='Active'
+            ORDER BY r.book_id, r.reservation_date ASC
+            FOR UPDATE
+        """, book_ids):
+            if waiting[r["book_id"]] > 0:
+                waiting[r["book_id"]] -= 1
+                ready.append(r)
+
+        if ready:
+            ready_placeholders = ", ".join(["%s"] * len(ready))
+            tx.execute_query(
+                f"UPDATE reservations SET status='Ready' WHERE reservation_id IN ({ready_placeholders})",
+                [r["reservation_id"] for r in ready]
+            )
+
+    for loan in loans:
+        # What is actually owed: a fine already paid or waived was left unchanged
+        loan["fine"] = unpaid.get(loan["transaction_id"], 0) if loan["days_late"] else 0
+
+    summary["returned"] = loans
+    summary["fines_total"] = sum(loan["fine"] for loan in loans)
+    summary["ready"] = ready
+
+    # ---------------- Emails only after the commit ----------------
+    if notify:
+        messages = []
+        for loan in loans:
+            if loan["fine"] and loan["email"]:
+                subject, body = generate_fine_email(loan["student"], loan["title"],
+                                                    loan["days_late"], loan["fine"])
+                messages.append((loan["email"], subject, body))
+        for r in ready:
+            if r["email"]:
+                subject, body = generate_ready_email(r["student"], r["title"])
+                messages.append((r["email"], subject, body))
+
+        try:
+            summary["emails"] = outbox.enqueue_many(messages)
+        except Exception as e:
+            # The returns are committed; a spool failure only loses the notices
+            print("EMAIL QUEUE ERROR:", e)
+
+    return summary
+
+
+class BulkReturnDialog:
+    """Scan any number of ISBNs / transaction IDs, then return them all at once"""
+
+    def __init__(self, parent, database, on_done=None):
+        self.db = database
+        self.on_done = on_done
+        self.scans = []
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("Bulk Return")
+        self.window.geometry("520x460")
+        self.window.configure(bg="#ecf0f1")
+        self.window.transient(parent)
+        self.window.grab_set()
+
+        form = tk.Frame(self.window, bg="#ecf0f1", padx=20, pady=15)
+        form.pack(fill=tk.BOTH, expand=True)
+
+        tk.Label(form, text="ISBN / Transaction ID", bg="#ecf0f1",
+                 font=("Arial", 10, "bold")).grid(row=0, column=0, sticky="w")
+        self.scan_var = tk.StringVar()
+        scan_entry = tk.Entry(form, textvariable=self.scan_var, width=25, font=("Consolas", 12))
+        scan_entry.grid(row=0, column=1, sticky="we", padx=5)
+        scan_entry.bind("<Return>", lambda e: self.add_scan())
+        tk.Button(form, text="Add", width=8, command=self.add_scan).grid(row=0, column=2, sticky="w")
+
+        self.count_label = tk.Label(form, text="0 scanned", bg="#ecf0f1", anchor="w")
+        self.count_label.grid(row=1, column=0, columnspan=3, sticky="w", pady=(5, 0))
+
+        self.scan_list = tk.Listbox(form, height=14, selectmode=tk.EXTENDED, font=("Consolas", 10))
+        self.scan_list.grid(row=2, column=0, columnspan=3, sticky="nsew", pady=10)
+        form.grid_rowconfigure(2, weight=1)
+        form.grid_columnconfigure(1, weight=1)
+
+        buttons = tk.Frame(form, bg="#ecf0f1")
+        buttons.grid(row=3, column=0, columnspan=3, sticky="ew")
+        tk.Button(buttons, text="Remove Selected", command=self.remove_selected).pack(side=tk.LEFT)
+        tk.Button(buttons, text="Return All", bg="#27ae60", fg="white", width=15,
+                  command=self.submit).pack(side=tk.RIGHT)
+
+        scan_entry.focus_set()
+
+    def add_scan(self):
+        # A pasted list (one per line or comma separated) adds every entry
+        for scan in SCAN_SEPARATORS.split(self.scan_var.get()):
+            scan = scan.strip()
+            if scan:
+                self.scans.append(scan)
+                self.scan_list.insert(tk.END, scan)
+        self.scan_var.set("")
+        self.count_label.config(text=f"{len(self.scans)} scanned")
+
+    def remove_selected(self):
+        for index in reversed(self.scan_list.curselection()):
+            self.scan_list.delete(index)
+            del self.scans[index]
+        self.count_label.config(text=f"{len(self.scans)} scanned")
+
+    def submit(self):
+        self.add_scan()
+        if not self.scans:
+            return messagebox.showwarning("Nothing Scanned", "Scan at least one book.", parent=self.window)
+
+        try:
+            summary = return_loans(self.db, self.scans)
+        except Error as e:
+            return messagebox.showerror("Database Error", f"Return failed, nothing was saved:\n{e}",
+                                        parent=self.window)
+
+        returned = summary["returned"]
+        late = [loan for loan in returned if loan["fine"]]
+        lines = [f"Books returned: {len(returned)}"]
+        if late:
+            lines.append(f"Late returns: {len(late)}  (fines ₱{summary['fines_total']:.2f})")
+        if summary["ready"]:
+            lines.append(f"Reservations ready for pickup: {len(summary['ready'])}")
+        if summary["emails"]:
+            lines.append(f"Emails queued: {summary['emails']}")
+        if summary["unmatched"]:
+            lines.append("\nNo open loan for:\n" + "\n".join(summary["unmatched"][:20]))
+            if len(summary["unmatched"]) > 20:
+                lines.append(f"... and {len(summary['unmatched']) - 20} more")
+        if summary["ambiguous"]:
+            lines.append("\nOn loan to several students, scan the transaction ID instead:\n"
+                         + "\n".join(summary["ambiguous"][:20]))
+            if len(summary["ambiguous"]) > 20:
+                lines.append(f"... and {len(summary['ambiguous']) - 20} more")
+
+        self.window.destroy()
+        messagebox.showinfo("Bulk Return", "\n".join(lines))
+        if self.on_done:
+            self.on_done(len(returned))
@@ -0,0 +1,171 @@
+"""
+Daily rollups for trend reporting
+
+A nightly job folds every finished day into `daily_rollup`, one row per
+(day, book category): loans made, books returned, loans overdue at the end
+of the day, new reservations, and fines finalized (count and amount). Only
+days after `rollup_state.last_day` are processed, a chunk of days per
+transaction, so an interrupted run resumes where it stopped. The first
+run goes back at most ROLLUP_BACKFILL_DAYS. Trend queries read the rollup
+table only, never the raw transactions.
+
+Each chunk is aggregated with plain SELECTs (consistent, non-locking
+reads) and the results written with multi-row upserts, so a rollup never
+holds shared locks on the circulation tables.
+
+A fine keeps accruing while its book is out (see fine_accrual), so fines
+are counted on the day their amount became final: the loan's return date,
+or the day a lost book's fine was charged. Fines still accruing are not
+in the rollup yet.
+"""
+from datetime import date, timedelta
+
+ROLLUP_NAME = "daily"
+ROLLUP_CHUNK_DAYS = 31       # days per transaction (and per recursive CTE)
+ROLLUP_BACKFILL_DAYS = 366   # history a first run rolls up
+UNCATEGORIZED = "Uncategorized"
+
+TREND_METRICS = ("loans", "returned", "overdue", "reservations", "fines_count", "fines_amount")
+
+# (rollup columns, query) - each query aggregates days in [start, end) and
+# returns (day, category, *columns); its %s are (start, end) pairs
+ROLLUP_QUERIES = [
+    (("loans",), f"""
+    SELECT DATE(bt.borrow_date), COALESCE(b.category, '{UNCATEGORIZED}'), COUNT(*)
+    FROM borrow_transactions bt
+    LEFT JOIN books b ON b.book_id = bt.book_id
+    WHERE bt.borrow_date >= %s AND bt.borrow_date < %s
+    GROUP BY 1, 2
+    """),
+    (("returned",), f"""
+    SELECT DATE(bt.return_date), COALESCE(b.category, '{UNCATEGORIZED}'), COUNT(*)
+    FROM borrow_transactions bt
+    LEFT JOIN books b ON b.book_id = bt.book_id
+    WHERE bt.return_date >= %s AND bt.return_date < %s
+    GROUP BY 1, 2
+    """),
+    # Loans past due and still out at the end of each day (lost books excluded).
+    # Only loans still out at some point of the chunk are joined to its days:
+    # open ones or returned after its start (idx_bt_return_date), due before its end.
+    (("overdue",), f"""
+    WITH RECURSIVE days(day) AS (
+        SELECT CAST(%s AS DATE)
+        UNION ALL
+        SELECT day + INTERVAL 1 DAY FROM days WHERE day + INTERVAL 1 DAY < %s
+    )
+    SELECT d.day, COALESCE(b.category, '{UNCATEGORIZED}'), COUNT(*)
+    FROM days d
+    JOIN borrow_transactions bt
+      ON bt.due_date < d.day
+     AND bt.borrow_date <= d.day
+     AND (bt.return_date IS NULL OR bt.return_date > d.day)
+    LEFT JOIN books b ON b.book_id = bt.book_id
+    WHERE (bt.return_date IS NULL OR bt.return_date > %s)
+      AND bt.due_date < %s
+      AND NOT (bt.status <=> 'Lost')
+    GROUP BY 1, 2
+    """),
+    (("reservations",), f"""
+    SELECT DATE(r.reservation_date), COALESCE(b.category, '{UNCATEGORIZED}'), COUNT(*)
+    FROM reservations r
+    LEFT JOIN books b ON b.book_id = r.book_id
+    WHERE r.reservation_date >= %s AND r.reservation_date < %s
+    GROUP BY 1, 2
+    """),
+    # Fines at their final amount: late returns on their return day, lost books on the charge day
+    (("fines_count", "fines_amount"), f"""
+    SELECT final.day, COALESCE(b.category, '{UNCATEGORIZED}'),
+           COUNT(*), COALESCE(SUM(final.fine_amount), 0)
+    FROM (
+        SELECT DATE(bt.return_date) AS day, bt.book_id, f.fine_amount
+        FROM borrow_transactions bt
+        JOIN fines f ON f.transaction_id = bt.transaction_id
+        WHERE bt.return_date >= %s AND bt.return_date < %s
+        UNION ALL
+        SELECT DATE(f.calculated_date), bt.book_id, f.fine_amount
+        FROM fines f
+        JOIN borrow_transactions bt ON bt.transaction_id = f.transaction_id
+        WHERE f.calculated_date >= %s AND f.calculated_date < %s
+          AND bt.status = 'Lost' AND bt.return_date IS NULL
+    ) final
+    LEFT JOIN books b ON b.book_id = final.book_id
+    GROUP BY 1, 2
+    """),
+]
+
+
+def last_rolled_day(database):
+    rows = database.fetch("SELECT last_day FROM rollup_state WHERE rollup_name=%s", (ROLLUP_NAME,))
+    return rows[0]["last_day"] if rows else None
+
+
+def first_pending_day(database, until=None):
+    """Day the next run starts from: after the watermark, or the first loan
+    ever but no more than ROLLUP_BACKFILL_DAYS back"""
+    last_day = last_rolled_day(database)
+    if last_day is not None:
+        return last_day + timedelta(days=1)
+
+    rows = database.fetch("SELECT DATE(MIN(borrow_date)) AS first_day FROM borrow_transactions")
+    first_day = rows[0]["first_day"] if rows else None
+    if first_day is None:
+        return None
+    return max(first_day, (until or date.today()) - timedelta(days=ROLLUP_BACKFILL_DAYS))
+
+
+def roll_up_range(tx, start, end):
+    """Recompute the rollup for days in [start, end) inside transaction `tx`"""
+    tx.execute_query("DELETE FROM daily_rollup WHERE day >= %s AND day < %s", (start, end))
+
+    for columns, query in ROLLUP_QUERIES:
+        rows = tx.execute_query(query, (start, end) * (query.count("%s") // 2))
+        if not rows:
+            continue
+
+        values = [tuple(row.values()) for row in rows]
+        names = ", ".join(columns)
+        row_placeholders = "(" + ", ".join(["%s"] * (len(columns) + 2)) + ")"
+        updates = ", ".join(f"{column} = VALUES({column})" for column in columns)
+        tx.execute_query(
+            f"INSERT INTO daily_rollup(day, category, {names}) "
+            f"VALUES {', '.join([row_placeholders] * len(values))} "
+            f"ON DUPLICATE KEY UPDATE {updates}",
+            [value for row in values for value in row]
+        )
+
+
+def run_rollups(database, until=None):
+    """Roll up every finished day not yet processed. Returns the number of days rolled up."""
+    end = until or date.today()     # exclusive: today is not over yet
+    start = first_pending_day(database, end)
+    if start is None or start >= end:
+        return 0
+
+    day = start
+    while day < end:
+        chunk_end = min(day + timedelta(days=ROLLUP_CHUNK_DAYS), end)
+
+        # Rollup rows and the watermark move together
+        with database.transaction() as tx:
+            roll_up_range(tx, day, chunk_end)
+            tx.execute_query("""
+                INSERT INTO rollup_state(rollup_name, last_day) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE last_day = VALUES(last_day)
+            """, (ROLLUP_NAME, chunk_end - timedelta(days=1)))
+
+        day = chunk_end
+
+    return (end - start).days
+
+
+def fetch_trend(database, start, end, by="day"):
+    """Totals per day (or per category) for days in [start, end], from the rollups only"""
+    group = "category" if by == "category" else "day"
+    totals = ", ".join(f"SUM({metric}) AS {metric}" for metric in TREND_METRICS)
+    return database.fetch(f"""
+        SELECT {group} AS label, {totals}
+        FROM daily_rollup
+        WHERE day >= %s AND day <= %s
+        GROUP BY {group}
+        ORDER BY {group}
+    """, (start, end))
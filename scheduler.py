@@ -0,0 +1,238 @@
+"""
+In-process background job scheduler
+
+Jobs run one at a time on a single daemon thread, against the scheduler's
+own Database instance so they never compete with the UI for a connection.
+
+Every desk runs a scheduler, so each run takes a MySQL named lock
+(GET_LOCK('job:<name>', 0)) first and is skipped if another desk holds
+it. Holding the lock, the scheduler reads the job's last run from
+`job_runs` and only runs it if a full interval has passed since, on any
+desk; it then records the run's time, rows affected and duration there.
+A job overdue at startup therefore runs within JOB_JITTER-ish seconds of
+launch, however briefly the desks stay open, and never runs twice in one
+interval.
+"""
+import random
+import threading
+import time
+from datetime import datetime
+
+from mysql.connector import errorcode, Error
+
+from database import Database
+
+JOB_LOCK_PREFIX = "job:"
+
+
+class Job:
+    def __init__(self, name, func, interval, jitter=0):
+        self.name = name
+        self.func = func              # func(database) -> rows affected
+        self.interval = interval      # seconds between runs
+        self.jitter = jitter          # random extra delay, seconds
+
+        # Check soon after launch (job_runs says whether it is due); jitter
+        # keeps desks opening together from all asking at once
+        self.next_run = time.monotonic() + random.uniform(0, jitter)
+        self.forced = False     # run_now: run even if it ran within the interval
+        self.runs = 0
+        self.last_run = None
+        self.last_duration = None
+        self.last_rows = None
+        self.last_error = None
+
+    def schedule_next(self, delay=None):
+        """Next check after `delay` seconds (default: a full interval), plus jitter"""
+        delay = self.interval if delay is None else delay
+        self.next_run = time.monotonic() + delay + random.uniform(0, self.jitter)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "runs": self.runs,
+            "last_run": self.last_run,
+            "last_duration": self.last_duration,
+            "last_rows": self.last_rows,
+            "last_error": self.last_error,
+        }
+
+
+class JobScheduler:
+    def __init__(self, database=None):
+        self.db = database
+        self.jobs = {}
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def add_job(self, name, func, interval, jitter=0):
+        with self._lock:
+            self.jobs[name] = Job(name, func, interval, jitter)
+        self._wake.set()
+
+    def run_now(self, name):
+        """Ask the worker to run a job as soon as it is free"""
+        with self._lock:
+            self.jobs[name].next_run = time.monotonic()
+            self.jobs[name].forced = True
+        self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            return [job.stats() for job in self.jobs.values()]
+
+    # ---------------- Lifecycle ----------------
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+
+        if self.db is None:
+            # Dedicated connections, separate from the UI pool: one holds the
+            # job's named lock while the job itself runs on the other
+            self.db = Database(pool_size=2, warm_up=False)
+
+        self._stopping = False
+        self._thread = threading.Thread(target=self._loop, name="job-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stopping = True
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self.db is not None:
+            self.db.pool.close_all()
+
+    # ---------------- Worker ----------------
+    def _loop(self):
+        while not self._stopping:
+            with self._lock:
+                now = time.monotonic()
+                due = [job for job in self.jobs.values() if job.next_run <= now]
+                upcoming = [job.next_run for job in self.jobs.values()]
+
+            for job in due:
+                if self._stopping:
+                    return
+                self._run_job(job)
+
+            if due:
+                continue
+
+            wait = min(upcoming) - time.monotonic() if upcoming else None
+            self._wake.wait(None if wait is None else max(wait, 0))
+            self._wake.clear()
+
+    def _run_job(self, job):
+        started = time.monotonic()
+        delay = None
+
+        try:
+            with self.db.pooled_connection() as conn:
+                if not self._acquire(conn, job.name):
+                    print(f"Job {job.name}: skipped, running on another desk")
+                    return
+
+                try:
+                    now, age = self._last_run(conn, job.name)
+                    forced, job.forced = job.forced, False
+                    if not forced and age is not None and age < job.interval:
+                        # Ran recently (here or on another desk): wait out the interval
+                        delay = job.interval - age
+                        return
+
+                    job.last_run = now
+                    try:
+                        job.last_rows = job.func(self.db)
+                        job.last_error = None
+                    except Exception as e:
+                        job.last_rows = None
+                        job.last_error = str(e)
+                        print(f"JOB ERROR [{job.name}]:", e)
+
+                    job.runs += 1
+                    job.last_duration = time.monotonic() - started
+                    self._record_run(conn, job)
+                finally:
+                    self._release(conn, job.name)
+
+            print(f"Job {job.name}: {job.last_rows} row(s) in {job.last_duration:.2f}s")
+
+        except Error as e:
+            # Could not reach the database for the lock; try again next interval
+            job.last_error = str(e)
+            print(f"JOB LOCK ERROR [{job.name}]:", e)
+
+        finally:
+            with self._lock:
+                job.schedule_next(delay)
+
+    @staticmethod
+    def _last_run(conn, name):
+        """(database time now, seconds since the job last succeeded on any desk, or None)"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT NOW(), (SELECT TIMESTAMPDIFF(SECOND, last_run, NOW())
+                               FROM job_runs WHERE job_name = %s)
+            """, (name,))
+            return cursor.fetchone()
+        except Error as e:
+            # Not migrated yet: every check runs the job, as before job_runs existed
+            if e.errno != errorcode.ER_NO_SUCH_TABLE:
+                raise
+            cursor.execute("SELECT NOW(), NULL")
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.commit()    # end the read snapshot so the next check sees other desks' runs
+
+    @staticmethod
+    def _record_run(conn, job):
+        """Save the run in job_runs; a failed run keeps the last successful run time"""
+        cursor = conn.cursor()
+        try:
+            if job.last_error is None:
+                cursor.execute("""
+                    INSERT INTO job_runs(job_name, last_run, rows_affected, duration, last_error)
+                    VALUES (%s, %s, %s, %s, NULL)
+                    ON DUPLICATE KEY UPDATE
+                        last_run = VALUES(last_run), rows_affected = VALUES(rows_affected),
+                        duration = VALUES(duration), last_error = NULL
+                """, (job.name, job.last_run, job.last_rows, job.last_duration))
+            else:
+                cursor.execute("""
+                    INSERT INTO job_runs(job_name, duration, last_error) VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE duration = VALUES(duration), last_error = VALUES(last_error)
+                """, (job.name, job.last_duration, job.last_error[:500]))
+            conn.commit()
+        except Error as e:
+            print(f"JOB RECORD ERROR [{job.name}]:", e)
+            conn.rollback()
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _acquire(conn, name):
+        """Non-blocking named lock shared by every desk on this server"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, 0)", (JOB_LOCK_PREFIX + name,))
+            return cursor.fetchone()[0] == 1
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _release(conn, name):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (JOB_LOCK_PREFIX + name,))
+            cursor.fetchall()
+        except Error as e:
+            # Lost connection: the server frees the lock with the session
+            print(f"JOB UNLOCK ERROR [{name}]:", e)
+        finally:
+            cursor.close()
@@ -5,6 +5,10 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from database import db
 from validators import validate_student_fields
+from live_search import LiveSearch
+from tree_sync import TreeSync
+from table_loader import TableLoader
+from exporter import open_export
 
 class StudentManagementWindow:
     def __init__(self, root, user_data, dashboard_root):
@@ -136,9 +140,21 @@ class StudentManagementWindow:
             fg='white',
             cursor='hand2',
             width=15,
-            command=self.load_students
+            command=self.refresh_students
         )
         refresh_btn.pack(side=tk.LEFT, padx=5)
+
+        export_btn = tk.Button(
+            button_frame,
+            text="Export",
+            font=('Arial', 10, 'bold'),
+            bg='#8e44ad',
+            fg='white',
+            cursor='hand2',
+            width=15,
+            command=lambda: open_export(self.root, "students")
+        )
+        export_btn.pack(side=tk.LEFT, padx=5)
         
         # Search frame
         search_frame = tk.Frame(content_frame, bg='#ecf0f1')
@@ -151,7 +167,9 @@ class StudentManagementWindow:
             bg='#ecf0f1'
         ).pack(side=tk.LEFT, padx=5)
         
-        self.search_entry = ttk.Entry(search_frame, font=('Arial', 10), width=30)
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(search_frame, font=('Arial', 10), width=30,
+                                      textvariable=self.search_var)
         self.search_entry.pack(side=tk.LEFT, padx=5)
         
         search_btn = tk.Button(
@@ -225,50 +243,87 @@ class StudentManagementWindow:
         )
         self.status_label.pack(side=tk.LEFT)
         
+        # Big result sets are inserted in batches between Tk events
+        self.loader = TableLoader(self.tree, self.status_label)
+        
+        # Refresh only re-reads rows changed since the last load
+        self.sync = TreeSync(self.tree, "students", self.fetch_changed_students, self.student_values)
+        
+        # Search as you type (debounced, queried off the UI thread)
+        self.live_search = LiveSearch(
+            self.root, self.search_var,
+            query=self.query_students,
+            on_results=self.show_search_results,
+            on_clear=self.load_students,
+            on_error=self.show_search_error
+        )
+        
         # Load students
         self.load_students()
     
+    def student_values(self, student):
+        return (
+            student['student_id'],
+            student['first_name'],
+            student['last_name'],
+            student['email'],
+            student['phone'] or 'N/A',
+            student['registration_date']
+        )
+
     def load_students(self):
         """Load students from database"""
         # Clear existing items
         for item in self.tree.get_children():
             self.tree.delete(item)
         
+        self.sync.start()
         query = "SELECT student_id, first_name, last_name, email, phone, registration_date FROM students ORDER BY student_id"
         students = db.execute_query(query)
         
         if students:
-            for idx, student in enumerate(students):
-                tag = 'evenrow' if idx % 2 == 0 else 'oddrow'
-                self.tree.insert(
-                    '',
-                    tk.END,
-                    values=(
-                        student['student_id'],
-                        student['first_name'],
-                        student['last_name'],
-                        student['email'],
-                        student['phone'] or 'N/A',
-                        student['registration_date']
-                    ),
-                    tags=(tag,)
-                )
-            self.status_label.config(text=f"Loaded {len(students)} students")
+            # Inserted in batches so the window stays responsive
+            self.loader.load(
+                students,
+                self.insert_student,
+                on_done=lambda count: self.status_label.config(text=f"Loaded {count} students")
+            )
         else:
+            self.loader.cancel()
             self.status_label.config(text="No students found in database")
+
+    def insert_student(self, student, idx):
+        tag = 'evenrow' if idx % 2 == 0 else 'oddrow'
+        self.tree.insert(
+            '',
+            tk.END,
+            iid=student['student_id'],
+            values=self.student_values(student),
+            tags=(tag,)
+        )
+
+    def fetch_changed_students(self, since):
+        return db.fetch("""
+            SELECT student_id, first_name, last_name, email, phone, registration_date
+            FROM students
+            WHERE updated_at >= %s
+        """, (since,))
+
+    def refresh_students(self):
+        """Refresh button: patch only the rows changed since the last load"""
+        changes = None if self.loader.busy else self.sync.refresh()
+        if changes is None:
+            return self.load_students()
+
+        updated, added, removed = changes
+        self.status_label.config(text=f"Refreshed: {updated} updated, {added} added, {removed} removed")
     
     def search_students(self):
-        """Search students by name or email"""
-        search_term = self.search_entry.get().strip()
-        
-        if not search_term:
-            self.load_students()
-            return
-        
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
+        """Search students by name or email (skips the typing debounce)"""
+        self.live_search.search_now()
+
+    def query_students(self, search_term):
+        """Runs on the live-search worker thread"""
         query = """
             SELECT student_id, first_name, last_name, email, phone, registration_date 
             FROM students 
@@ -276,27 +331,27 @@ class StudentManagementWindow:
             ORDER BY student_id
         """
         search_pattern = f"%{search_term}%"
-        students = db.execute_query(query, (search_pattern, search_pattern, search_pattern))
+        return db.fetch(query, (search_pattern, search_pattern, search_pattern))
+
+    def show_search_results(self, search_term, students):
+        """Display live-search results (Tk thread)"""
+        # Clear existing items
+        self.loader.cancel()
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+
+        # Filtered view: the next Refresh does a full load
+        self.sync.reset()
         
         if students:
             for idx, student in enumerate(students):
-                tag = 'evenrow' if idx % 2 == 0 else 'oddrow'
-                self.tree.insert(
-                    '',
-                    tk.END,
-                    values=(
-                        student['student_id'],
-                        student['first_name'],
-                        student['last_name'],
-                        student['email'],
-                        student['phone'] or 'N/A',
-                        student['registration_date']
-                    ),
-                    tags=(tag,)
-                )
+                self.insert_student(student, idx)
             self.status_label.config(text=f"Found {len(students)} students matching '{search_term}'")
         else:
             self.status_label.config(text=f"No students found matching '{search_term}'")
+
+    def show_search_error(self, search_term, error):
+        self.status_label.config(text=f"Search failed: {error}")
     
     def add_student_dialog(self):
         """Open dialog to add a new student"""
@@ -357,7 +412,7 @@ class StudentManagementWindow:
             if db.execute_query(query, values, fetch=False):
                 messagebox.showinfo("Success", "Student added successfully!")
                 dialog.destroy()
-                self.load_students()
+                self.refresh_students()
             else:
                 messagebox.showerror("Error", "Failed to add student")
         
@@ -443,7 +498,7 @@ class StudentManagementWindow:
             if db.execute_query(query, values, fetch=False):
                 messagebox.showinfo("Success", "Student updated successfully!")
                 dialog.destroy()
-                self.load_students()
+                self.refresh_students()
             else:
                 messagebox.showerror("Error", "Failed to update student")
 
@@ -482,7 +537,7 @@ class StudentManagementWindow:
             query = "DELETE FROM students WHERE student_id = %s"
             if db.execute_query(query, (student_id,), fetch=False):
                 messagebox.showinfo("Success", "Student deleted successfully!")
-                self.load_students()
+                self.refresh_students()
             else:
                 messagebox.showerror("Error", "Failed to delete student")
 
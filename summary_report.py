@@ -1,7 +1,15 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+from datetime import date, datetime, timedelta
 from database import db
+from library_stats import LibraryStats
+from ledger import count_owing
+from rollups import fetch_trend, last_rolled_day
 
+TREND_DAYS = 30   # default trend range, ending yesterday
+
+# Shared across windows so reopening the report within the TTL is free
+report_stats = LibraryStats(db)
 
 class SummaryReportWindow:
     def __init__(self, root, user_data, dashboard_root):
@@ -10,7 +18,7 @@ class SummaryReportWindow:
         self.dashboard_root = dashboard_root
 
         self.root.title("Summary Report")
-        self.root.geometry("1000x600")
+        self.root.geometry("1200x650")
         self.root.config(bg="#ecf0f1")
 
         self.create_widgets()
@@ -54,92 +62,160 @@ class SummaryReportWindow:
         )
         user_label.pack(side=tk.RIGHT, padx=20)
 
+        # Refresh button (skips the cache)
+        refresh_btn = tk.Button(
+            top_bar,
+            text="Refresh",
+            font=("Arial", 11, "bold"),
+            bg="#2c3e50",
+            fg="white",
+            cursor="hand2",
+            width=10,
+            command=lambda: self.show_metrics(force=True)
+        )
+        refresh_btn.pack(side=tk.RIGHT, padx=10)
+
         # Main content frame
         content_frame = tk.Frame(self.root, bg="#ecf0f1")
         content_frame.pack(fill=tk.BOTH, expand=True, padx=40, pady=30)
 
         # White panel
         report_panel = tk.Frame(content_frame, bg="white", bd=2, relief="groove")
-        report_panel.pack(fill=tk.BOTH, expand=True)
+        report_panel.pack(side=tk.LEFT, fill=tk.Y)
 
-        # Fetch data
-        data = self.get_report_data()
+        self.value_labels = {}
+        self.report_panel = report_panel
+        self.show_metrics()
 
-        # Grid layout for summary metrics
-        metrics = [
-            ("Total Students", data["total_students"]),
-            ("Total Books", data["total_books"]),
-            ("Currently Borrowed", data["total_borrowed"]),
-            ("Active Reservations", data["total_reservations"]),
-            ("Fines Collected", f"₱ {data['fines_collected']:.2f}"),
-            ("Fines Pending", f"₱ {data['fines_pending']:.2f}")
-        ]
+        # Trends panel (reads the daily rollups only)
+        trend_panel = tk.Frame(content_frame, bg="white", bd=2, relief="groove")
+        trend_panel.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(20, 0))
 
-        for i, (label, value) in enumerate(metrics):
-            tk.Label(report_panel, text=label, font=("Arial", 14), bg="white", anchor="w").grid(
-                row=i, column=0, padx=30, pady=15, sticky="w"
-            )
-            tk.Label(report_panel, text=value, font=("Arial", 14, "bold"), bg="white", anchor="e").grid(
-                row=i, column=1, padx=30, pady=15, sticky="e"
-            )
+        controls = tk.Frame(trend_panel, bg="white")
+        controls.pack(fill=tk.X, padx=10, pady=10)
 
-    def get_report_data(self):
-        conn = db.get_connection() if hasattr(db, "get_connection") else db.connection
+        tk.Label(controls, text="Trends", font=("Arial", 14, "bold"), bg="white").pack(side=tk.LEFT)
 
-        if conn is None:
-            print("ERROR: Database connection failed in Summary Report")
-            return {
-                "total_students": 0,
-                "total_books": 0,
-                "total_borrowed": 0,
-                "total_reservations": 0,
-                "fines_collected": 0,
-                "fines_pending": 0
-            }
+        yesterday = date.today() - timedelta(days=1)
+        self.trend_from = tk.StringVar(value=str(yesterday - timedelta(days=TREND_DAYS - 1)))
+        self.trend_to = tk.StringVar(value=str(yesterday))
+        self.trend_group = tk.StringVar(value="Day")
 
-        cursor = conn.cursor()
+        tk.Label(controls, text="From", bg="white").pack(side=tk.LEFT, padx=(20, 5))
+        tk.Entry(controls, textvariable=self.trend_from, width=11).pack(side=tk.LEFT)
+        tk.Label(controls, text="To", bg="white").pack(side=tk.LEFT, padx=(10, 5))
+        tk.Entry(controls, textvariable=self.trend_to, width=11).pack(side=tk.LEFT)
+        tk.Label(controls, text="By", bg="white").pack(side=tk.LEFT, padx=(10, 5))
+        ttk.Combobox(controls, textvariable=self.trend_group, values=("Day", "Category"),
+                     state="readonly", width=9).pack(side=tk.LEFT)
+        tk.Button(controls, text="Show", bg="#2c3e50", fg="white", cursor="hand2",
+                  command=self.show_trends).pack(side=tk.LEFT, padx=10)
 
-        try:
-            cursor.execute("SELECT COUNT(*) FROM students")
-            total_students = cursor.fetchone()[0]
+        columns = ("label", "loans", "returned", "overdue", "reservations", "fines_count", "fines_amount")
+        headings = ("Day", "Loans", "Returned", "Overdue", "Reservations", "Fines", "Fine Amount")
 
-            cursor.execute("SELECT COUNT(*) FROM books")
-            total_books = cursor.fetchone()[0]
+        table = tk.Frame(trend_panel, bg="white")
+        table.pack(fill=tk.BOTH, expand=True, padx=10)
 
-            cursor.execute("SELECT COUNT(*) FROM borrow_transactions WHERE return_date IS NULL")
-            total_borrowed = cursor.fetchone()[0]
+        self.trend_tree = ttk.Treeview(table, columns=columns, show="headings")
+        for col, heading in zip(columns, headings):
+            self.trend_tree.heading(col, text=heading)
+            self.trend_tree.column(col, width=90, anchor="center")
 
-            cursor.execute("SELECT COUNT(*) FROM reservations WHERE status = 'Pending'")
-            total_reservations = cursor.fetchone()[0]
+        vsb = ttk.Scrollbar(table, orient="vertical", command=self.trend_tree.yview)
+        self.trend_tree.configure(yscrollcommand=vsb.set)
+        vsb.pack(side=tk.RIGHT, fill=tk.Y)
+        self.trend_tree.pack(fill=tk.BOTH, expand=True)
 
-            cursor.execute("SELECT COALESCE(SUM(fine_amount), 0) FROM fines WHERE payment_status = 'Paid'")
-            fines_collected = cursor.fetchone()[0]
+        self.trend_status = tk.Label(trend_panel, text="", font=("Arial", 10), bg="white", fg="#7f8c8d")
+        self.trend_status.pack(anchor="w", padx=10, pady=5)
 
-            cursor.execute("SELECT COALESCE(SUM(fine_amount), 0) FROM fines WHERE payment_status = 'Unpaid'")
-            fines_pending = cursor.fetchone()[0]
+        self.show_trends()
 
-            return {
-                "total_students": total_students,
-                "total_books": total_books,
-                "total_borrowed": total_borrowed,
-                "total_reservations": total_reservations,
-                "fines_collected": fines_collected,
-                "fines_pending": fines_pending
-            }
+    def show_metrics(self, force=False):
+        data = self.get_report_data(force)
 
+        # Grid layout for summary metrics
+        metrics = [
+            ("total_students", "Total Students", data["total_students"]),
+            ("total_books", "Total Books", data["total_books"]),
+            ("total_borrowed", "Currently Borrowed", data["total_borrowed"]),
+            ("total_reservations", "Active Reservations", data["total_reservations"]),
+            ("fines_collected", "Fines Collected", f"₱ {data['fines_collected']:.2f}"),
+            ("fines_pending", "Fines Pending", f"₱ {data['fines_pending']:.2f}"),
+            ("students_owing", "Students With Fines", data["students_owing"])
+        ]
+
+        for i, (key, label, value) in enumerate(metrics):
+            if key in self.value_labels:
+                self.value_labels[key].config(text=value)
+                continue
+
+            tk.Label(self.report_panel, text=label, font=("Arial", 14), bg="white", anchor="w").grid(
+                row=i, column=0, padx=30, pady=15, sticky="w"
+            )
+            value_label = tk.Label(self.report_panel, text=value, font=("Arial", 14, "bold"), bg="white", anchor="e")
+            value_label.grid(row=i, column=1, padx=30, pady=15, sticky="e")
+            self.value_labels[key] = value_label
+
+    def get_report_data(self, force=False):
+        empty = {
+            "total_students": 0,
+            "total_books": 0,
+            "total_borrowed": 0,
+            "total_reservations": 0,
+            "fines_collected": 0,
+            "fines_pending": 0,
+            "students_owing": 0
+        }
+
+        # One round trip (a single live query), cached
+        try:
+            data = report_stats.get(force)
         except Exception as e:
             print("SUMMARY REPORT ERROR:", e)
-            return {
-                "total_students": 0,
-                "total_books": 0,
-                "total_borrowed": 0,
-                "total_reservations": 0,
-                "fines_collected": 0,
-                "fines_pending": 0
-            }
-
-        finally:
-            cursor.close()
+            return empty
+
+        # Index range count over the per-student balances
+        try:
+            data["students_owing"] = count_owing(db)
+        except Exception as e:
+            print("SUMMARY REPORT ERROR:", e)
+            data["students_owing"] = 0
+
+        return data
+
+    def show_trends(self):
+        try:
+            start = datetime.strptime(self.trend_from.get().strip(), "%Y-%m-%d").date()
+            end = datetime.strptime(self.trend_to.get().strip(), "%Y-%m-%d").date()
+        except ValueError:
+            return messagebox.showwarning("Invalid Date", "Dates must be in YYYY-MM-DD format.")
+
+        if start > end:
+            return messagebox.showwarning("Invalid Range", "'From' must not be after 'To'.")
+
+        by = self.trend_group.get().lower()
+        try:
+            rows = fetch_trend(db, start, end, by)
+            rolled_through = last_rolled_day(db)
+        except Exception as e:
+            print("TREND REPORT ERROR:", e)
+            self.trend_status.config(text="Trends unavailable.")
+            return
+
+        self.trend_tree.heading("label", text=self.trend_group.get())
+        self.trend_tree.delete(*self.trend_tree.get_children())
+        for row in rows:
+            self.trend_tree.insert("", "end", values=(
+                row["label"], row["loans"], row["returned"], row["overdue"],
+                row["reservations"], row["fines_count"], f"₱ {row['fines_amount']:.2f}"
+            ))
+
+        if rolled_through is None:
+            self.trend_status.config(text="No days rolled up yet; trends appear after the nightly job runs.")
+        else:
+            self.trend_status.config(text=f"Rolled up through {rolled_through}")
 
     def back_to_dashboard(self):
         self.root.destroy()
@@ -0,0 +1,88 @@
+"""
+Chunked Treeview population
+
+Inserting tens of thousands of rows in one loop freezes Tk. TableLoader
+inserts rows in short time-bounded batches scheduled with after(), so the
+window keeps repainting and responding between batches. Starting a new
+load cancels the one in flight.
+"""
+import time
+import tkinter as tk
+
+BATCH_BUDGET_MS = 20     # max time spent inserting before yielding to Tk
+
+
+class TableLoader:
+    def __init__(self, tree, status_label=None, budget_ms=BATCH_BUDGET_MS):
+        self.tree = tree
+        self.status_label = status_label
+        self.budget = budget_ms / 1000.0
+
+        self.count = 0
+        self._rows = None
+        self._after_id = None
+
+    @property
+    def busy(self):
+        return self._rows is not None
+
+    def load(self, rows, insert, on_done=None, total=None):
+        """Feed `rows` to insert(row, index) in batches; on_done(count) when finished.
+
+        The first batch runs immediately, so small tables appear at once.
+        """
+        self.cancel()
+
+        if total is None and hasattr(rows, "__len__"):
+            total = len(rows)
+
+        self._rows = iter(rows)
+        self._insert = insert
+        self._on_done = on_done
+        self._total = total
+        self.count = 0
+
+        self._step()
+
+    def cancel(self):
+        if self._after_id is not None:
+            try:
+                self.tree.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        self._rows = None
+
+    def _step(self):
+        self._after_id = None
+        if self._rows is None:
+            return
+
+        deadline = time.perf_counter() + self.budget
+
+        try:
+            for row in self._rows:
+                self._insert(row, self.count)
+                self.count += 1
+
+                if time.perf_counter() >= deadline:
+                    self._show_progress()
+                    self._after_id = self.tree.after(1, self._step)
+                    return
+        except tk.TclError:
+            # Window closed mid-load
+            self._rows = None
+            return
+
+        self._rows = None
+        if self._on_done:
+            self._on_done(self.count)
+
+    def _show_progress(self):
+        if self.status_label is None:
+            return
+
+        text = f"Loading... {self.count}"
+        if self._total:
+            text += f" of {self._total}"
+        self.status_label.config(text=text)
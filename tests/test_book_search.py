@@ -0,0 +1,94 @@
+"""InvertedIndex, and BookSearch falling back to it without the FULLTEXT index"""
+import pytest
+from mysql.connector import errorcode, Error
+
+from book_search import BookSearch, InvertedIndex
+
+BOOKS = [
+    {"book_id": 1, "isbn": "9780441172719", "title": "Dune", "author": "Frank Herbert",
+     "publisher": "Ace", "category": "Science Fiction"},
+    {"book_id": 2, "isbn": "9780441478125", "title": "The Left Hand of Darkness",
+     "author": "Ursula K. Le Guin", "publisher": "Ace", "category": "Science Fiction"},
+    {"book_id": 3, "isbn": "9780547928227", "title": "The Hobbit", "author": "J. R. R. Tolkien",
+     "publisher": "Houghton Mifflin", "category": "Fantasy"},
+    {"book_id": 4, "isbn": None, "title": "Frankenstein", "author": "Mary Shelley",
+     "publisher": "Lackington", "category": "Horror"},
+]
+
+
+def ids(result):
+    rows, _ = result
+    return [row["book_id"] for row in rows]
+
+
+@pytest.fixture
+def index():
+    return InvertedIndex.from_rows(BOOKS, page_size=2)
+
+
+def test_prefix_terms_must_all_match(index):
+    assert ids(index.search("hob")) == [3]
+    assert ids(index.search("science left")) == [2]
+    assert ids(index.search("science hobbit")) == []
+
+
+def test_title_outranks_author(index):
+    # "frank" is Frankenstein's title (weight 3) but only Dune's author (weight 2)
+    assert ids(index.search("frank")) == [4, 1]
+
+
+def test_isbn_lookup(index):
+    assert ids(index.search("978-0-441-17271-9")) == [1]
+    assert ids(index.search("9780441172719", page=1)) == []
+
+
+def test_pages(index):
+    # "f": Frank, Fiction, Fantasy, Frankenstein - every book, two per page
+    first = index.search("f")
+    second = index.search("f", page=1)
+
+    assert first[1] is True and second[1] is False
+    assert sorted(ids(first) + ids(second)) == [1, 2, 3, 4]
+    assert index.search("f", page=2) == ([], False)
+
+
+def test_updates_and_removals(index):
+    index.add(dict(BOOKS[2], title="The Silmarillion"))
+    assert ids(index.search("hobbit")) == []
+    assert ids(index.search("silmar")) == [3]
+
+    index.remove(3)
+    assert ids(index.search("tolkien")) == []
+    assert ids(index.search("9780547928227")) == []
+
+
+class FakeDatabase:
+    def __init__(self, fulltext_error=errorcode.ER_FT_MATCHING_KEY_NOT_FOUND):
+        self.fulltext_error = fulltext_error
+        self.queries = []
+
+    def fetch(self, query, params=None):
+        self.queries.append(query)
+        if "MATCH(" in query:
+            raise Error(msg="Can't find FULLTEXT index matching the column list", errno=self.fulltext_error)
+        if "isbn=%s" in query:
+            return [dict(b) for b in BOOKS if b["isbn"] == params[0]]
+        return [dict(b) for b in BOOKS]
+
+
+def test_falls_back_to_an_inverted_index_without_fulltext():
+    db = FakeDatabase()
+    search = BookSearch(db)
+
+    assert ids(search.search("dune")) == [1]
+    assert ids(search.search("tolkien")) == [3]
+
+    # The books were read once and the index reused for the second search
+    assert sum(q.strip() == "SELECT * FROM books" for q in db.queries) == 1
+
+
+def test_other_database_errors_still_raise():
+    search = BookSearch(FakeDatabase(fulltext_error=errorcode.ER_LOCK_WAIT_TIMEOUT))
+
+    with pytest.raises(Error):
+        search.search("dune")
@@ -0,0 +1,140 @@
+"""ConnectionPool with fake connections (no MySQL server needed)"""
+import threading
+import time
+
+import pytest
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+from connection_pool import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.in_transaction = False
+        self.closed = False
+        self.rolled_back = False
+        self.ping_fails = False
+        self.rollback_fails = False
+
+    def ping(self, reconnect=False):
+        if self.ping_fails:
+            raise Error("server has gone away")
+
+    def rollback(self):
+        if self.rollback_fails:
+            raise Error("lost connection")
+        self.rolled_back = True
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeServer:
+    def __init__(self):
+        self.opened = []
+        self.refuse = False
+
+    def connect(self):
+        if self.refuse:
+            raise Error("can't connect")
+        conn = FakeConnection(len(self.opened) + 1)
+        self.opened.append(conn)
+        return conn
+
+
+@pytest.fixture
+def server():
+    return FakeServer()
+
+
+def test_reuses_checked_in_connections(server):
+    pool = ConnectionPool(server.connect, size=2, timeout=0.1)
+
+    conn = pool.checkout()
+    pool.checkin(conn)
+
+    assert pool.checkout() is conn
+    assert len(server.opened) == 1
+
+
+def test_checkout_times_out_when_exhausted(server):
+    pool = ConnectionPool(server.connect, size=2, timeout=0.2)
+    pool.checkout()
+    pool.checkout()
+
+    started = time.monotonic()
+    with pytest.raises(PoolError):
+        pool.checkout()
+
+    assert time.monotonic() - started >= 0.2
+    assert len(server.opened) == 2
+
+
+def test_checkout_waits_for_a_checkin(server):
+    pool = ConnectionPool(server.connect, size=1, timeout=5)
+    conn = pool.checkout()
+
+    threading.Timer(0.1, pool.checkin, args=(conn,)).start()
+
+    assert pool.checkout() is conn
+
+
+def test_discard_closes_and_frees_the_slot(server):
+    pool = ConnectionPool(server.connect, size=1, timeout=0.1)
+    broken = pool.checkout()
+
+    pool.discard(broken)
+    replacement = pool.checkout()
+
+    assert broken.closed
+    assert replacement is not broken
+    assert len(server.opened) == 2
+
+
+def test_checkin_rolls_back_an_open_transaction(server):
+    pool = ConnectionPool(server.connect, size=1, timeout=0.1)
+    conn = pool.checkout()
+    conn.in_transaction = True
+
+    pool.checkin(conn)
+
+    assert conn.rolled_back
+    assert pool.checkout() is conn
+
+
+def test_checkin_discards_a_connection_that_cannot_roll_back(server):
+    pool = ConnectionPool(server.connect, size=1, timeout=0.1)
+    conn = pool.checkout()
+    conn.in_transaction = True
+    conn.rollback_fails = True
+
+    pool.checkin(conn)
+
+    assert conn.closed
+    assert pool.checkout() is not conn
+
+
+def test_idle_connection_failing_ping_is_replaced(server):
+    pool = ConnectionPool(server.connect, size=1, timeout=0.1, idle_check=0)
+    conn = pool.checkout()
+    pool.checkin(conn)
+    conn.ping_fails = True
+
+    fresh = pool.checkout()
+
+    assert conn.closed
+    assert fresh is not conn
+
+
+def test_failed_connect_frees_the_slot(server):
+    pool = ConnectionPool(server.connect, size=1, timeout=0.1)
+
+    server.refuse = True
+    with pytest.raises(Error):
+        pool.checkout()
+
+    server.refuse = False
+    assert pool.checkout() is server.opened[0]
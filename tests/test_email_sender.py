@@ -0,0 +1,140 @@
+"""EmailSender against a stand-in SMTP server on localhost"""
+import json
+import socketserver
+import threading
+
+import pytest
+
+from email_sender import EmailSender, FAILED, REFUSED, SENT
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 stand-in ready")
+
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line[:4].upper()
+
+            if command in ("EHLO", "HELO"):
+                self.reply("250 stand-in")
+            elif command == "RCPT":
+                address = line.split(":", 1)[1].strip(" <>")
+                self.reply(server.rcpt_replies.get(address, "250 OK"))
+            elif command == "DATA":
+                self.reply("354 go ahead")
+                lines = []
+                while True:
+                    data = self.rfile.readline().decode()
+                    if data.rstrip("\r\n") == ".":
+                        break
+                    lines.append(data)
+                server.messages.append("".join(lines))
+                self.reply("250 queued")
+                if server.drop_after_message:
+                    return
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                # MAIL, RSET, NOOP
+                self.reply("250 OK")
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.connections = 0
+        self.messages = []
+        self.rcpt_replies = {}          # address -> reply line
+        self.drop_after_message = False
+
+
+@pytest.fixture
+def smtp():
+    server = SMTPStandIn()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sender(smtp, tmp_path):
+    credentials = tmp_path / "credentials.json"
+    credentials.write_text(json.dumps({"email": "desk@library.test", "password": ""}))
+
+    sender = EmailSender(host="127.0.0.1", port=smtp.server_address[1], use_tls=False,
+                         login_required=False, credentials_path=str(credentials))
+    yield sender
+    sender.close()
+
+
+def test_sends_over_one_reused_session(smtp, sender):
+    assert sender.send_email("a@library.test", "Hello", "First") == SENT
+    assert sender.send_email("b@library.test", "Hello", "Second") == SENT
+
+    assert smtp.connections == 1
+    assert len(smtp.messages) == 2
+    assert "First" in smtp.messages[0] and "Second" in smtp.messages[1]
+
+
+def test_permanent_refusal_keeps_the_session(smtp, sender):
+    smtp.rcpt_replies["gone@library.test"] = "550 no such mailbox"
+
+    assert sender.send_email("gone@library.test", "Hello", "Body") == REFUSED
+    assert sender.send_email("a@library.test", "Hello", "Body") == SENT
+
+    assert smtp.connections == 1
+    assert len(smtp.messages) == 1
+
+
+def test_temporary_refusal_is_worth_retrying(smtp, sender):
+    smtp.rcpt_replies["busy@library.test"] = "450 mailbox busy, try later"
+
+    assert sender.send_email("busy@library.test", "Hello", "Body") == FAILED
+    assert smtp.messages == []
+
+
+def test_reconnects_after_the_server_drops_the_session(smtp, sender):
+    smtp.drop_after_message = True
+
+    assert sender.send_email("a@library.test", "Hello", "First") == SENT
+    assert sender.send_email("b@library.test", "Hello", "Second") == SENT
+
+    assert smtp.connections == 2
+    assert len(smtp.messages) == 2      # nothing delivered twice
+
+
+def test_send_many_reports_each_message(smtp, sender):
+    smtp.rcpt_replies["gone@library.test"] = "550 no such mailbox"
+
+    results = sender.send_many([
+        ("a@library.test", "Hello", "One"),
+        ("gone@library.test", "Hello", "Two"),
+        ("b@library.test", "Hello", "Three"),
+    ])
+
+    assert results == [SENT, REFUSED, SENT]
+    assert smtp.connections == 1
+
+
+def test_missing_credentials_fail_without_connecting(smtp, tmp_path):
+    sender = EmailSender(host="127.0.0.1", port=smtp.server_address[1], use_tls=False,
+                         credentials_path=str(tmp_path / "missing.json"))
+
+    assert sender.send_email("a@library.test", "Hello", "Body") == FAILED
+    assert smtp.connections == 0
@@ -0,0 +1,150 @@
+"""MailQueue retry/backoff and the TokenBucket rate limiter, with a fake sender"""
+import threading
+import time
+
+import pytest
+
+from email_sender import FAILED, REFUSED, SENT
+from mail_queue import MailQueue, TokenBucket
+
+
+class FakeSender:
+    """Replays `results` (the last one repeats); an Exception in the list is raised"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    def send_email(self, to_email, subject, body):
+        self.calls.append((time.monotonic(), to_email))
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def close(self):
+        pass
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("timed out")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(sender, **options):
+        options.setdefault("bucket", TokenBucket(rate_per_minute=60000, burst=100))
+        queue = MailQueue(sender, spool_path=str(tmp_path / f"spool{len(queues)}.db"), **options)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.stop()
+
+
+def spooled(queue):
+    return queue._spool.execute("SELECT status, attempts FROM outbox").fetchall()
+
+
+def test_sent_message_leaves_the_spool(make_queue):
+    sender = FakeSender(SENT)
+    queue = make_queue(sender)
+
+    queue.enqueue("a@library.test", "Hello", "Body")
+    wait_for(lambda: queue.sent == 1)
+
+    assert queue.depth() == 0
+    assert spooled(queue) == []
+    assert [to for _, to in sender.calls] == ["a@library.test"]
+
+
+def test_failures_are_retried_with_exponential_backoff(make_queue):
+    sender = FakeSender(FAILED, ConnectionError("reset"), SENT)
+    queue = make_queue(sender, base_delay=0.1)
+
+    queue.enqueue("a@library.test", "Hello", "Body")
+    wait_for(lambda: queue.sent == 1)
+
+    times = [at for at, _ in sender.calls]
+    assert len(times) == 3
+    assert times[1] - times[0] >= 0.1     # base_delay
+    assert times[2] - times[1] >= 0.2     # doubled
+    assert queue.retries == 2
+
+
+def test_gives_up_after_max_attempts(make_queue):
+    sender = FakeSender(FAILED)
+    queue = make_queue(sender, max_attempts=3, base_delay=0.01)
+
+    queue.enqueue("a@library.test", "Hello", "Body")
+    wait_for(lambda: queue.failed == 1)
+
+    assert len(sender.calls) == 3
+    assert spooled(queue) == [("Failed", 3)]
+    assert queue.depth() == 0
+
+
+def test_permanent_refusal_fails_without_retrying(make_queue):
+    sender = FakeSender(REFUSED)
+    queue = make_queue(sender, base_delay=0.01)
+
+    queue.enqueue("gone@library.test", "Hello", "Body")
+    wait_for(lambda: queue.failed == 1)
+    time.sleep(0.1)
+
+    assert len(sender.calls) == 1
+    assert spooled(queue) == [("Failed", 1)]
+
+
+def test_backoff_is_capped(make_queue):
+    sender = FakeSender(FAILED, FAILED, FAILED, SENT)
+    queue = make_queue(sender, base_delay=0.05, max_delay=0.05)
+
+    queue.enqueue("a@library.test", "Hello", "Body")
+    wait_for(lambda: queue.sent == 1)
+
+    times = [at for at, _ in sender.calls]
+    assert times[3] - times[2] < 0.2      # not 0.05 * 2**2
+
+
+def test_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate_per_minute=600, burst=3)    # one token every 0.1s
+
+    started = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - started < 0.05
+
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.09
+
+
+def test_bucket_never_saves_more_than_its_burst():
+    bucket = TokenBucket(rate_per_minute=6000, burst=2)
+    time.sleep(0.1)     # long enough to earn 10 tokens
+
+    started = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - started >= 0.009
+
+
+def test_bucket_is_shared_safely_between_threads():
+    bucket = TokenBucket(rate_per_minute=1200, burst=1)   # one token every 0.05s
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=bucket.acquire) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # One from the burst, four more at the refill rate
+    assert time.monotonic() - started >= 0.19
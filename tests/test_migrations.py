@@ -0,0 +1,137 @@
+"""MigrationRunner against the SQLite stand-in"""
+import sqlite3
+
+import pytest
+
+from migrations import MIGRATIONS, MigrationRunner
+
+BASE_SCHEMA = """
+    CREATE TABLE students (
+        student_id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT, email TEXT
+    );
+    CREATE TABLE librarians (librarian_id INTEGER PRIMARY KEY, username TEXT);
+    CREATE TABLE books (
+        book_id INTEGER PRIMARY KEY, isbn TEXT, title TEXT, author TEXT, publisher TEXT,
+        category TEXT, quantity INTEGER
+    );
+    CREATE TABLE borrow_transactions (
+        transaction_id INTEGER PRIMARY KEY, student_id INTEGER, book_id INTEGER,
+        librarian_id INTEGER, borrow_date DATE, due_date DATE, return_date DATE, status TEXT
+    );
+    CREATE TABLE reservations (
+        reservation_id INTEGER PRIMARY KEY, book_id INTEGER, student_id INTEGER,
+        reservation_date DATETIME, expires_at DATETIME, status TEXT
+    );
+    CREATE TABLE fines (
+        fine_id INTEGER PRIMARY KEY, transaction_id INTEGER, fine_amount DECIMAL(10, 2),
+        calculated_date DATE, paid_date DATE, payment_status TEXT
+    );
+"""
+
+ALL_VERSIONS = sorted(version for version, _, _ in MIGRATIONS)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(BASE_SCHEMA)
+    yield conn
+    conn.close()
+
+
+def applied(conn):
+    return sorted(row[0] for row in conn.execute("SELECT version FROM schema_migrations"))
+
+
+def test_applies_every_migration_once(conn):
+    assert MigrationRunner(conn, "sqlite").run() == ALL_VERSIONS
+    assert MigrationRunner(conn, "sqlite").run() == []
+    assert applied(conn) == ALL_VERSIONS
+
+
+def test_steps_are_idempotent_when_rerun(conn):
+    runner = MigrationRunner(conn, "sqlite")
+    runner.run()
+    indexes = runner.index_columns("borrow_transactions")
+
+    # As if every migration had been interrupted before it was recorded
+    conn.execute("DELETE FROM schema_migrations")
+    conn.commit()
+
+    assert runner.run() == ALL_VERSIONS
+    assert runner.index_columns("borrow_transactions") == indexes
+
+
+def test_change_tracking_touches_updated_at(conn):
+    MigrationRunner(conn, "sqlite").run()
+    conn.execute("INSERT INTO books(book_id, title) VALUES (1, 'Dune')")
+    assert conn.execute("SELECT updated_at FROM books").fetchone()[0] is not None
+
+    # Backdated explicitly (left alone by the trigger), so a same-second bump still shows
+    conn.execute("UPDATE books SET updated_at = '2000-01-01 00:00:00'")
+    assert conn.execute("SELECT updated_at FROM books").fetchone()[0] == "2000-01-01 00:00:00"
+
+    conn.execute("UPDATE books SET title = 'Dune Messiah' WHERE book_id = 1")
+    assert conn.execute("SELECT updated_at FROM books").fetchone()[0] > "2000-01-01 00:00:00"
+
+
+def test_change_tracking_logs_deletes(conn):
+    MigrationRunner(conn, "sqlite").run()
+    conn.execute("INSERT INTO books(book_id, title) VALUES (1, 'Dune')")
+    conn.execute("DELETE FROM books WHERE book_id = 1")
+
+    assert conn.execute("SELECT row_id FROM row_deletions WHERE table_name = 'books'").fetchall() == [(1,)]
+
+
+def test_isbns_are_normalized_and_made_unique(conn):
+    conn.executemany("INSERT INTO books(book_id, isbn, title) VALUES (?, ?, ?)", [
+        (1, "978-0-306-40615-7", "A"),
+        (2, "", "B"),
+        (3, "", "C"),
+        (4, "030640615x", "D"),
+    ])
+    # A plain index on isbn must not stand in for the unique one
+    conn.execute("CREATE INDEX idx_books_isbn ON books (isbn)")
+
+    runner = MigrationRunner(conn, "sqlite")
+    assert runner.run() == ALL_VERSIONS
+
+    assert conn.execute("SELECT book_id, isbn FROM books ORDER BY book_id").fetchall() == [
+        (1, "9780306406157"), (2, None), (3, None), (4, "030640615X"),
+    ]
+    assert runner.unique_indexes("books")["uq_books_isbn"] == ["isbn"]
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO books(book_id, isbn) VALUES (5, '9780306406157')")
+
+
+def test_duplicate_isbns_defer_only_their_migration(conn):
+    conn.executemany("INSERT INTO books(book_id, isbn, title) VALUES (?, ?, ?)", [
+        (1, "978-0-306-40615-7", "A"),
+        (2, "9780306406157", "A (copy)"),
+    ])
+
+    runner = MigrationRunner(conn, "sqlite")
+    # Only the unique ISBN migration waits; the others still run
+    assert runner.run() == [v for v in ALL_VERSIONS if v != 8]
+    assert "uq_books_isbn" not in runner.index_columns("books")
+
+    # Fixed by hand: the deferred migrations go through on the next start
+    conn.execute("UPDATE books SET isbn = '0306406152' WHERE book_id = 2")
+    conn.commit()
+    assert runner.run() == [8]
+    assert applied(conn) == ALL_VERSIONS
+
+
+def test_duplicate_fines_defer_the_unique_fine_key(conn):
+    conn.executemany("INSERT INTO fines(fine_id, transaction_id, fine_amount) VALUES (?, ?, ?)", [
+        (1, 10, 5), (2, 10, 10), (3, 11, 5),
+    ])
+
+    runner = MigrationRunner(conn, "sqlite")
+    assert runner.run() == [v for v in ALL_VERSIONS if v != 6]
+    assert "uq_fines_transaction" not in runner.index_columns("fines")
+
+    conn.execute("DELETE FROM fines WHERE fine_id = 1")
+    conn.commit()
+    assert runner.run() == [6]
+    assert runner.unique_indexes("fines")["uq_fines_transaction"] == ["transaction_id"]
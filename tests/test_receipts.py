@@ -0,0 +1,61 @@
+"""Batch receipts and statements; the statement pool starts its workers with spawn"""
+import os
+import threading
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from receipts import ReceiptsCancelled, generate_batch
+
+
+def fine(fine_id, student_id):
+    return {"fine_id": fine_id, "transaction_id": 100 + fine_id, "fine_amount": Decimal("15.00"),
+            "calculated_date": date(2026, 1, 10), "paid_date": None, "payment_status": "Unpaid",
+            "student_id": student_id, "student": f"Student {student_id}", "book": f"Book {fine_id}",
+            "borrow_date": date(2026, 1, 1), "due_date": date(2026, 1, 8), "return_date": None}
+
+
+def test_one_combined_pdf(tmp_path):
+    progress = []
+    paths = generate_batch([fine(1, 10), fine(2, 11)], str(tmp_path), progress=lambda *p: progress.append(p))
+
+    assert len(paths) == 1 and os.path.getsize(paths[0]) > 0
+    assert progress[-1] == (2, 2)
+
+
+def test_statements_render_in_worker_processes(tmp_path):
+    fines = [fine(1, 10), fine(2, 10), fine(3, 11), fine(4, 12)]
+    progress = []
+
+    paths = generate_batch(fines, str(tmp_path), per_student=True, workers=2,
+                           progress=lambda *p: progress.append(p))
+
+    assert [os.path.basename(p).split("_")[1] for p in paths] == ["10", "11", "12"]
+    assert all(os.path.getsize(p) > 0 for p in paths)
+    assert progress[-1] == (4, 4)
+
+
+def test_cancel_stops_a_combined_pdf_without_writing_it(tmp_path):
+    cancel = threading.Event()
+
+    def progress(done, total):
+        if done == 2:
+            cancel.set()
+
+    with pytest.raises(ReceiptsCancelled):
+        generate_batch([fine(i, 10) for i in range(1, 6)], str(tmp_path),
+                       progress=progress, cancel_event=cancel)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_cancel_stops_the_statement_pool(tmp_path):
+    cancel = threading.Event()
+    cancel.set()
+
+    with pytest.raises(ReceiptsCancelled):
+        generate_batch([fine(i, i) for i in range(1, 30)], str(tmp_path), per_student=True,
+                       workers=2, cancel_event=cancel)
+
+    assert len(os.listdir(tmp_path)) < 29
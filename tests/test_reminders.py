@@ -0,0 +1,102 @@
+"""Reminder claims against a fake transaction that keeps reminder_log in memory"""
+from contextlib import contextmanager
+from datetime import date
+
+from reminders import claim_due_page, run_reminder_campaign
+
+DUE = date(2026, 1, 10)
+
+
+class FakeTransaction:
+    def __init__(self, db):
+        self.db = db
+        self.savepoint = None
+
+    def execute_query(self, query, params=None):
+        self.db.statements.append(query.split()[0])
+
+        if query.lstrip().startswith("SELECT"):
+            # The page: loans not yet in the log (as read when the page is picked)
+            rows = [loan for loan in self.db.loans if loan["transaction_id"] not in self.db.log]
+            self.db.log |= self.db.claimed_meanwhile     # another desk commits now
+            return [dict(loan) for loan in rows]
+
+        if query.startswith("SAVEPOINT"):
+            self.savepoint = set(self.db.log)
+            return 0
+        if query.startswith("ROLLBACK TO SAVEPOINT"):
+            self.db.log = self.savepoint
+            return 0
+
+        # INSERT IGNORE INTO reminder_log ... VALUES (%s, %s, NOW()), ...
+        inserted = 0
+        for transaction_id in params[::2]:
+            if transaction_id not in self.db.log:
+                self.db.log.add(transaction_id)
+                inserted += 1
+        return inserted
+
+
+class FakeDatabase:
+    def __init__(self, loans, claimed_meanwhile=()):
+        self.loans = loans
+        self.log = set()
+        self.claimed_meanwhile = set(claimed_meanwhile)
+        self.statements = []
+
+    @contextmanager
+    def transaction(self):
+        yield FakeTransaction(self)
+
+
+class FakeQueue:
+    def __init__(self):
+        self.messages = []
+
+    def enqueue_many(self, messages):
+        self.messages += messages
+        return len(messages)
+
+
+def loan(transaction_id, student_id):
+    return {"transaction_id": transaction_id, "student_id": student_id, "due_date": DUE,
+            "title": f"Book {transaction_id}", "email": f"s{student_id}@library.test",
+            "student_name": f"Student {student_id}"}
+
+
+def test_claims_a_page_in_one_statement():
+    db = FakeDatabase([loan(1, 10), loan(2, 10), loan(3, 11)])
+
+    last_student_id, claimed = claim_due_page(db, 0, 2)
+
+    assert last_student_id == 11
+    assert [l["transaction_id"] for l in claimed] == [1, 2, 3]
+    assert db.statements == ["SELECT", "SAVEPOINT", "INSERT"]
+    assert db.log == {1, 2, 3}
+
+
+def test_loans_claimed_by_another_run_are_left_out():
+    db = FakeDatabase([loan(1, 10), loan(2, 10), loan(3, 11)], claimed_meanwhile={2})
+
+    _, claimed = claim_due_page(db, 0, 2)
+
+    assert [l["transaction_id"] for l in claimed] == [1, 3]
+    assert db.log == {1, 2, 3}
+
+
+def test_empty_page_ends_the_campaign():
+    db = FakeDatabase([])
+
+    assert claim_due_page(db, 0, 2) == (None, [])
+    assert db.statements == ["SELECT"]
+
+
+def test_campaign_queues_one_digest_per_student():
+    db = FakeDatabase([loan(1, 10), loan(2, 10), loan(3, 11)])
+    queue = FakeQueue()
+
+    assert run_reminder_campaign(db, 2, queue) == 2
+    assert [to for to, _, _ in queue.messages] == ["s10@library.test", "s11@library.test"]
+
+    # A rerun finds everything claimed and sends nothing
+    assert run_reminder_campaign(db, 2, queue) == 0
@@ -0,0 +1,111 @@
+"""
+Incremental Treeview refresh
+
+Each tracked table carries an `updated_at` column (bumped by MySQL on every
+write) and deletes are logged to `row_deletions` by a trigger; both come
+from the change-tracking migration. A TreeSync remembers the database time
+of its last load and on refresh fetches only rows changed or deleted since
+then, patching the Treeview items in place by their stable iid (the row's
+primary key).
+
+`updated_at` is stamped when a row is written, not when its transaction
+commits, so the watermark trails the database clock by WATERMARK_MARGIN
+(longer than any write transaction). A row committed late is then still
+picked up by the next refresh; re-applying rows seen before is harmless.
+
+If reading the changes fails (say the tracking columns or triggers are
+missing), nothing is patched, the watermark is dropped and refresh()
+returns None, so the window falls back to a full load.
+"""
+from mysql.connector import Error
+
+from database import db
+from migrations import TRACKED_TABLES
+
+WATERMARK_MARGIN = 60   # seconds
+
+def database_now(margin=WATERMARK_MARGIN):
+    """Database clock minus `margin`, or None if it cannot be read. Never shows a dialog."""
+    try:
+        return db.fetch("SELECT NOW() - INTERVAL %s SECOND AS now", (margin,))[0]["now"]
+    except Error as e:
+        print("TREE SYNC ERROR:", e)
+        return None
+
+
+class TreeSync:
+    def __init__(self, tree, table, fetch_changed, row_values, row_tags=None,
+                 matches=None, insert_at="end"):
+        self.tree = tree
+        self.table = table
+        self.key = TRACKED_TABLES[table]
+        self.fetch_changed = fetch_changed   # fetch_changed(since) -> rows with updated_at >= since; raises on error
+        self.row_values = row_values         # row -> tuple of column values
+        self.row_tags = row_tags             # row -> tuple of tags
+        self.matches = matches               # row -> bool, does the row belong in this view?
+        self.insert_at = insert_at           # where new rows go: "end" or 0
+        self.watermark = None
+
+    def start(self):
+        """Call right before a full load; changes made during the load are re-fetched"""
+        self.watermark = database_now()
+
+    def reset(self):
+        self.watermark = None
+
+    def refresh(self):
+        """Apply changes since the last load/refresh. Returns (updated, inserted, deleted),
+        or None if there is no watermark yet (or the changes could not be read) and the
+        caller should do a full load."""
+        if self.watermark is None:
+            return None
+
+        since = self.watermark
+        now = database_now()
+        if now is None:
+            return None
+
+        # Read everything first, so a failed read patches nothing
+        try:
+            # `>=` because TIMESTAMP is per-second; the margin covers late commits
+            changed = self.fetch_changed(since)
+            gone = db.fetch(
+                "SELECT row_id FROM row_deletions WHERE table_name=%s AND deleted_at >= %s",
+                (self.table, since)
+            )
+        except Error as e:
+            print(f"TREE SYNC ERROR [{self.table}]:", e)
+            self.reset()
+            return None
+
+        updated = inserted = deleted = 0
+
+        for row in changed:
+            iid = str(row[self.key])
+            exists = self.tree.exists(iid)
+
+            if self.matches and not self.matches(row):
+                if exists:
+                    self.tree.delete(iid)
+                    deleted += 1
+                continue
+
+            options = {"values": self.row_values(row)}
+            if self.row_tags:
+                options["tags"] = self.row_tags(row)
+
+            if exists:
+                self.tree.item(iid, **options)
+                updated += 1
+            else:
+                self.tree.insert("", self.insert_at, iid=iid, **options)
+                inserted += 1
+
+        for row in gone:
+            iid = str(row["row_id"])
+            if self.tree.exists(iid):
+                self.tree.delete(iid)
+                deleted += 1
+
+        self.watermark = now
+        return updated, inserted, deleted